@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Multi-Version Design Benchmark
+
+Times generating the SDTM datasets and the M11 document body for every
+StudyVersion of an amended study from one shared UsdmIndex, against
+indexing each version on its own, and checks that both give every
+version the same output. Amendment snapshots reuse object ids across
+versions[], so a lookup that resolves ids over the whole document would
+leak one version's cells, criteria, elements or organizations into
+another; this is the --all-designs case.
+
+The study is the Sanofi reference with N-1 amended copies of its
+version appended. Each copy keeps every id but drops study cells and
+rewrites criterion text, element names and organization names.
+
+Usage:
+    python benchmarks/bench_all_designs.py --versions 4
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from usdm_utils import UsdmIndex  # noqa: E402
+from sdtm_trial_design_generator import as_context, generate_all  # noqa: E402
+from m11_document_generator import build_m11_document  # noqa: E402
+
+SANOFI = REPO_ROOT / "examples" / "outputs" / "Sanofi_NCT03637764_Oncology_USDM_v4.json"
+
+
+def amended_study(num_versions: int) -> dict:
+    """Sanofi plus amended snapshots of its version that share every id."""
+    data = json.loads(SANOFI.read_text())
+    original = data["study"]["versions"][0]
+    for n in range(1, num_versions):
+        version = copy.deepcopy(original)
+        version["versionIdentifier"] = str(n + 1)
+        design = version["studyDesigns"][0]
+        design["studyCells"] = design["studyCells"][:max(1, len(design["studyCells"]) - 10 * n)]
+        for item in version.get("eligibilityCriterionItems", []):
+            item["text"] = f"AMENDMENT {n}: {item.get('text', '')}"
+        for element in design.get("elements", []):
+            element["name"] = f"AMENDMENT {n} {element['name']}"
+            element["label"] = f"AMENDMENT {n} {element.get('label') or ''}"
+        for org in version.get("organizations", []):
+            org["name"] = f"AMENDMENT {n} {org['name']}"
+        data["study"]["versions"].append(version)
+    return data
+
+
+def version_outputs(index: UsdmIndex, version_index: int) -> tuple[dict, str]:
+    """(domain -> rows, M11 body XML) for the first design of one version."""
+    datasets = generate_all(as_context(index, version_index, 0), dataframe=False)
+    rows = {domain: list(table.rows()) for domain, table in datasets.items()}
+    body = build_m11_document(index, version_index, 0).element.xml
+    return rows, body
+
+
+def shared_index(data: dict) -> list:
+    index = UsdmIndex(data)
+    return [version_outputs(index, v) for v in range(len(data["study"]["versions"]))]
+
+
+def per_version(data: dict) -> list:
+    outputs = []
+    for version in data["study"]["versions"]:
+        single = dict(data, study=dict(data["study"], versions=[version]))
+        outputs.append(version_outputs(UsdmIndex(single), 0))
+    return outputs
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and check multi-version generation")
+    parser.add_argument("--versions", type=int, default=3, help="Study versions (at least 2)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    data = amended_study(max(2, args.versions))
+    shared, separate = shared_index(data), per_version(data)
+    for n, (got, expected) in enumerate(zip(shared, separate)):
+        if got != expected:
+            raise SystemExit(f"MISMATCH in versions[{n}] between the shared and per-version index")
+
+    t_shared = best_of(lambda: shared_index(data), args.repeat)
+    t_separate = best_of(lambda: per_version(data), args.repeat)
+    print(f"{len(data['study']['versions'])} versions sharing ids: outputs match")
+    print(f"  per-version index {t_separate * 1000:8.2f} ms")
+    print(f"  shared index      {t_shared * 1000:8.2f} ms   ({t_separate / t_shared:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
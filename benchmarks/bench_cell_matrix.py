@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Arm x Epoch Cell Index Benchmark
+
+Times the (armId, epochId) -> cells lookup used by generate_ta and
+add_trial_design on a synthetic design, comparing the precomputed
+build_cell_matrix() index against the original per-pair scan of
+design.studyCells.
+
+Usage:
+    python benchmarks/bench_cell_matrix.py --arms 50 --epochs 20
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from usdm_utils import build_cell_matrix  # noqa: E402
+
+
+def synthetic_design(num_arms: int, num_epochs: int, elements_per_cell: int = 2) -> dict:
+    """Build a design with one StudyCell per (arm, epoch) pair."""
+    arms = [{"id": f"StudyArm_{a}", "name": f"ARM {a}"} for a in range(num_arms)]
+    epochs = [{"id": f"StudyEpoch_{e}", "name": f"EPOCH {e}"} for e in range(num_epochs)]
+    elements = []
+    cells = []
+    for a in range(num_arms):
+        for e in range(num_epochs):
+            elem_ids = []
+            for k in range(elements_per_cell):
+                elem_id = f"StudyElement_{a}_{e}_{k}"
+                elements.append({"id": elem_id, "name": f"EL{a}.{e}.{k}"})
+                elem_ids.append(elem_id)
+            cells.append({
+                "id": f"StudyCell_{a}_{e}",
+                "armId": f"StudyArm_{a}",
+                "epochId": f"StudyEpoch_{e}",
+                "elementIds": elem_ids,
+            })
+    return {"arms": arms, "epochs": epochs, "elements": elements, "studyCells": cells}
+
+
+def scan_pairs(design: dict) -> list[str]:
+    """Original approach: rescan every cell for every (arm, epoch) pair."""
+    cells = design["studyCells"]
+    out = []
+    for arm in design["arms"]:
+        for epoch in design["epochs"]:
+            matching = [
+                c for c in cells
+                if c.get("armId") == arm["id"] and c.get("epochId") == epoch["id"]
+            ]
+            for cell in matching:
+                out.extend(cell.get("elementIds", []))
+    return out
+
+
+def indexed_pairs(design: dict) -> list[str]:
+    """Precomputed (armId, epochId) -> cells matrix."""
+    matrix = build_cell_matrix(design["studyCells"])
+    out = []
+    for arm in design["arms"]:
+        for epoch in design["epochs"]:
+            for cell in matrix.get((arm["id"], epoch["id"]), []):
+                out.extend(cell.get("elementIds", []))
+    return out
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the arm x epoch cell index")
+    parser.add_argument("--arms", type=int, default=50)
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    design = synthetic_design(args.arms, args.epochs)
+    if scan_pairs(design) != indexed_pairs(design):
+        raise SystemExit("MISMATCH between scanned and indexed cell lookup")
+
+    t_scan = best_of(lambda: scan_pairs(design), args.repeat)
+    t_index = best_of(lambda: indexed_pairs(design), args.repeat)
+    print(f"{args.arms} arms x {args.epochs} epochs ({len(design['studyCells'])} cells)")
+    print(f"  per-pair scan   {t_scan * 1000:8.2f} ms")
+    print(f"  cell matrix     {t_index * 1000:8.2f} ms   ({t_scan / t_index:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
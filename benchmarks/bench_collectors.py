@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Collector Regression Benchmark
+
+Compares the iterative collect_ids/collect_references in usdm_validator
+against the original recursive, dict-merging implementations on:
+  - the Sanofi reference study (replicated N times)
+  - a synthetic nested tree deeper than Python's recursion limit
+
+Usage:
+    python benchmarks/bench_collectors.py --copies 8 --depth 5000
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from usdm_validator import collect_ids, collect_references  # noqa: E402
+
+SANOFI = REPO_ROOT / "examples" / "outputs" / "Sanofi_NCT03637764_Oncology_USDM_v4.json"
+
+
+def legacy_collect_ids(obj: Any, path: str = "") -> dict[str, str]:
+    """Original recursive implementation (copies ids once per ancestor)."""
+    ids = {}
+    if isinstance(obj, dict):
+        if "id" in obj and obj["id"] is not None:
+            ids[obj["id"]] = path
+        for key, value in obj.items():
+            ids.update(legacy_collect_ids(value, f"{path}.{key}"))
+    elif isinstance(obj, list):
+        for i, item in enumerate(obj):
+            ids.update(legacy_collect_ids(item, f"{path}[{i}]"))
+    return ids
+
+
+def legacy_collect_references(obj: Any, path: str = "") -> list[tuple[str, str]]:
+    """Original recursive implementation (extends refs once per ancestor)."""
+    refs = []
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if key.endswith("Id") and key != "id" and isinstance(value, str):
+                refs.append((value, f"{path}.{key}"))
+            elif key.endswith("Ids") and isinstance(value, list):
+                for i, ref_id in enumerate(value):
+                    if isinstance(ref_id, str):
+                        refs.append((ref_id, f"{path}.{key}[{i}]"))
+            else:
+                refs.extend(legacy_collect_references(value, f"{path}.{key}"))
+    elif isinstance(obj, list):
+        for i, item in enumerate(obj):
+            refs.extend(legacy_collect_references(item, f"{path}[{i}]"))
+    return refs
+
+
+def replicate_study(data: dict, copies: int) -> dict:
+    """Repeat the study version `copies` times to enlarge the document."""
+    data = copy.deepcopy(data)
+    versions = data["study"]["versions"]
+    data["study"]["versions"] = [copy.deepcopy(versions[0]) for _ in range(copies)]
+    return data
+
+
+def deep_tree(depth: int) -> dict:
+    """Build a chain of nested objects `depth` levels deep."""
+    root = node = {"id": "Node_0", "instanceType": "Activity", "childIds": []}
+    for i in range(1, depth):
+        child = {"id": f"Node_{i}", "instanceType": "Activity", "previousId": f"Node_{i - 1}"}
+        node["child"] = child
+        node = child
+    return root
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(name: str, data: Any, repeat: int):
+    new_ids = collect_ids(data, "root")
+    new_refs = collect_references(data, "root")
+    print(f"{name}: {len(new_ids)} ids, {len(new_refs)} references")
+
+    t_ids = best_of(lambda: collect_ids(data, "root"), repeat)
+    t_refs = best_of(lambda: collect_references(data, "root"), repeat)
+    try:
+        old_ids = legacy_collect_ids(data, "root")
+        old_refs = legacy_collect_references(data, "root")
+    except RecursionError:
+        print(f"  iterative  ids {t_ids * 1000:8.1f} ms   refs {t_refs * 1000:8.1f} ms")
+        print("  legacy     RecursionError")
+        return
+
+    if old_ids != new_ids or old_refs != new_refs:
+        raise SystemExit(f"  MISMATCH between legacy and iterative collectors on {name}")
+
+    l_ids = best_of(lambda: legacy_collect_ids(data, "root"), repeat)
+    l_refs = best_of(lambda: legacy_collect_references(data, "root"), repeat)
+    print(f"  iterative  ids {t_ids * 1000:8.1f} ms   refs {t_refs * 1000:8.1f} ms")
+    print(f"  legacy     ids {l_ids * 1000:8.1f} ms   refs {l_refs * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark USDM id/reference collectors")
+    parser.add_argument("--copies", type=int, default=8, help="Study versions in the enlarged document")
+    parser.add_argument("--depth", type=int, default=5000, help="Nesting depth of the synthetic tree")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    with open(SANOFI) as f:
+        sanofi = json.load(f)
+
+    bench("Sanofi x1", sanofi, args.repeat)
+    bench(f"Sanofi x{args.copies}", replicate_study(sanofi, args.copies), args.repeat)
+    bench(f"Nested depth {args.depth}", deep_tree(args.depth), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
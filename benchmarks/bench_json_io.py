@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+JSON Backend Benchmark
+
+Times parse and serialize of a USDM document with every installed JSON
+backend in usdm_utils (orjson, ujson, stdlib json), including the
+memory-mapped read path.
+
+Usage:
+    python benchmarks/bench_json_io.py
+    python benchmarks/bench_json_io.py --input study.json --repeat 10
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+import usdm_utils  # noqa: E402
+from usdm_utils import json_dumps, json_loads, read_json, select_json_backend  # noqa: E402
+
+SANOFI = REPO_ROOT / "examples" / "outputs" / "Sanofi_NCT03637764_Oncology_USDM_v4.json"
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark USDM JSON backends")
+    parser.add_argument("--input", "-i", default=str(SANOFI), help="USDM JSON file to parse")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    raw = Path(args.input).read_bytes()
+    print(f"{args.input} ({len(raw) / 1e6:.2f} MB)")
+    print(f"{'backend':<8} {'loads':>9} {'read':>9} {'read+mmap':>10} {'dumps':>9} {'dumps(2)':>9}")
+
+    reference = None
+    for name, module in usdm_utils._JSON_BACKENDS.items():
+        if module is None:
+            print(f"{name:<8} not installed")
+            continue
+        select_json_backend(name)
+        data = json_loads(raw)
+        if reference is None:
+            reference = data
+        elif data != reference:
+            raise SystemExit(f"MISMATCH: {name} parsed a different document")
+
+        timings = [
+            best_of(lambda: json_loads(raw), args.repeat),
+            best_of(lambda: read_json(args.input), args.repeat),
+            best_of(lambda: read_json(args.input, use_mmap=True), args.repeat),
+            best_of(lambda: json_dumps(data), args.repeat),
+            best_of(lambda: json_dumps(data, indent=2), args.repeat),
+        ]
+        print(f"{name:<8} " + " ".join(
+            f"{t * 1000:{w}.1f}ms" for t, w in zip(timings, (7, 7, 8, 7, 7))
+        ))
+
+    select_json_backend()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+USDM Benchmark Harness
+
+Times every public entry point (load, index, validate_study, each SDTM
+generate_* function, generate_all, write_datasets, the M11 document
+build, serial and with two section workers, and its Schedule of
+Activities table) on synthetic studies from
+synthetic_study.py, records peak memory with tracemalloc, and compares
+the results against a stored baseline.
+
+Any entry point slower or hungrier than its baseline by more than the
+tolerance is reported as a REGRESSION and the run exits with status 1.
+Baselines are machine-specific: regenerate them on the machine that runs
+the comparison with --update-baseline.
+
+Usage:
+    python benchmarks/run_benchmarks.py                      # compare to baseline
+    python benchmarks/run_benchmarks.py --sizes small,large --entries validate_study,index
+    python benchmarks/run_benchmarks.py --update-baseline
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic_study import SIZES, make_study  # noqa: E402
+from usdm_utils import UsdmIndex, read_json, write_json  # noqa: E402
+from usdm_validator import validate_study  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# Differences below this many seconds are treated as timer noise
+MIN_TIME_DELTA = 0.005
+
+
+def entry_points(input_path: str) -> dict:
+    """name -> zero-argument callable for every benchmarked entry point."""
+    data = read_json(input_path)
+    points = {
+        "load": lambda: read_json(input_path),
+        "index": lambda: UsdmIndex(data),
+        "validate_study": lambda: validate_study(data),
+    }
+    try:
+        import sdtm_trial_design_generator as sdtm
+    except ImportError as exc:
+        print(f"  (skipping SDTM entry points: {exc})")
+    else:
+        for domain, func in sdtm.GENERATORS.items():
+            points[f"generate_{domain}"] = (lambda f: lambda: f(data))(func)
+        points["generate_all"] = lambda: sdtm.generate_all(data)
+        sdtm_dir = os.path.join(os.path.dirname(input_path), "sdtm")
+        points["write_datasets"] = lambda: sdtm.write_datasets(data, sdtm_dir)
+    try:
+        import m11_document_generator as m11
+    except ImportError as exc:
+        print(f"  (skipping M11 entry points: {exc})")
+    else:
+        points["build_m11_document"] = lambda: m11.build_m11_document(data)
+        # --section-jobs 2: includes starting the pool; peak memory is the
+        # parent's, which holds the fragments until they are spliced
+        points["build_m11_section_jobs"] = lambda: m11.build_m11_document(data, jobs=2)
+        # The Schedule of Activities table alone: its activity x encounter
+        # grid is the largest table in the document
+        design = data["study"]["versions"][0]["studyDesigns"][0]
+        points["add_schedule_of_activities"] = lambda: m11.add_schedule_of_activities(m11.Document(), design)
+    return points
+
+
+def measure(func, repeat: int) -> dict:
+    """Best wall time over `repeat` runs plus peak traced memory of one run."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": round(best, 6), "peak_kb": round(peak / 1024, 1)}
+
+
+def compare(results: dict, baseline: dict, time_tol: float, mem_tol: float) -> list[str]:
+    """Return a description of every regression against `baseline`."""
+    regressions = []
+    for size, entries in results.items():
+        for name, current in entries.items():
+            base = baseline.get(size, {}).get(name)
+            if not base:
+                continue
+            t_now, t_base = current["seconds"], base["seconds"]
+            if t_now > t_base * (1 + time_tol) and t_now - t_base > MIN_TIME_DELTA:
+                regressions.append(
+                    f"{size}/{name}: time {t_now * 1000:.1f} ms vs baseline "
+                    f"{t_base * 1000:.1f} ms (+{(t_now / t_base - 1) * 100:.0f}%)"
+                )
+            m_now, m_base = current["peak_kb"], base["peak_kb"]
+            if m_base and m_now > m_base * (1 + mem_tol):
+                regressions.append(
+                    f"{size}/{name}: peak memory {m_now:.0f} KB vs baseline "
+                    f"{m_base:.0f} KB (+{(m_now / m_base - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark USDM scripts on synthetic studies")
+    parser.add_argument("--sizes", default="small,medium",
+                        help=f"Comma-separated presets from: {', '.join(SIZES)}")
+    parser.add_argument("--entries",
+                        help="Comma-separated entry points to run (default: all available)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON path")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Merge these results into the baseline instead of comparing")
+    parser.add_argument("--time-tolerance", type=float, default=0.5,
+                        help="Allowed slowdown vs. baseline (0.5 = 50%%)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25,
+                        help="Allowed peak memory growth vs. baseline (0.25 = 25%%)")
+    parser.add_argument("--output", "-o", help="Optional: save these results as JSON")
+    args = parser.parse_args()
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    selected = {e.strip() for e in args.entries.split(",")} if args.entries else None
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            input_path = os.path.join(tmp, f"{size}.json")
+            write_json(make_study(**SIZES[size]), input_path, indent=None)
+            print(f"{size} ({SIZES[size]}, {os.path.getsize(input_path) / 1e6:.2f} MB)")
+            results[size] = {}
+            for name, func in entry_points(input_path).items():
+                if selected is not None and name not in selected:
+                    continue
+                stats = measure(func, args.repeat)
+                results[size][name] = stats
+                print(f"  {name:<28} {stats['seconds'] * 1000:9.2f} ms {stats['peak_kb']:11.0f} KB peak")
+
+    if args.output:
+        write_json(results, args.output)
+
+    if args.update_baseline:
+        baseline = read_json(args.baseline) if os.path.exists(args.baseline) else {}
+        for size, entries in results.items():
+            baseline.setdefault(size, {}).update(entries)
+        write_json(baseline, args.baseline)
+        print(f"\nBaseline saved to: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+
+    regressions = compare(results, read_json(args.baseline),
+                          args.time_tolerance, args.memory_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} REGRESSION(S) against {args.baseline}:")
+        for line in regressions:
+            print(f"  ✗ REGRESSION {line}")
+        sys.exit(1)
+    print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Synthetic USDM v4.0.0 Study Generator
+
+Builds structurally valid USDM v4.0.0 study definitions of arbitrary size
+for benchmarking. Every object carries id/instanceType/extensionAttributes,
+ordered lists use previousId/nextId, and every *Id/*Ids reference resolves,
+so the validator reports no errors on the output.
+
+Usage:
+    python benchmarks/synthetic_study.py --arms 8 --epochs 6 --encounters 40 \
+        --activities 120 --criteria 60 --timelines 4 --amendments 3 \
+        --output synthetic_study.json
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "scripts"))
+
+from usdm_utils import write_json  # noqa: E402
+
+# Named presets used by run_benchmarks.py
+SIZES = {
+    "small": dict(arms=2, epochs=3, encounters=10, activities=20,
+                  criteria=15, timelines=1, amendments=0),
+    "medium": dict(arms=8, epochs=6, encounters=40, activities=120,
+                   criteria=60, timelines=4, amendments=3),
+    "large": dict(arms=50, epochs=20, encounters=150, activities=400,
+                  criteria=200, timelines=10, amendments=10),
+}
+
+
+class _Ids:
+    """Sequential ids per class name, e.g. Code_1, Code_2, ..."""
+
+    def __init__(self):
+        self.counters: dict[str, int] = {}
+
+    def __call__(self, prefix: str) -> str:
+        n = self.counters.get(prefix, 0) + 1
+        self.counters[prefix] = n
+        return f"{prefix}_{n}"
+
+
+def _code(ids: _Ids, code: str, decode: str) -> dict:
+    return {
+        "id": ids("Code"),
+        "extensionAttributes": [],
+        "code": code,
+        "codeSystem": "http://www.cdisc.org",
+        "codeSystemVersion": "2024-09-27",
+        "decode": decode,
+        "instanceType": "Code",
+    }
+
+
+def _alias_code(ids: _Ids, code: str, decode: str) -> dict:
+    return {
+        "id": ids("AliasCode"),
+        "extensionAttributes": [],
+        "standardCode": _code(ids, code, decode),
+        "standardCodeAliases": [],
+        "instanceType": "AliasCode",
+    }
+
+
+def _named(ids: _Ids, instance_type: str, name: str, **fields) -> dict:
+    obj = {
+        "id": ids(instance_type),
+        "extensionAttributes": [],
+        "name": name,
+        "label": name.title(),
+        "description": f"Synthetic {instance_type} {name}",
+    }
+    obj.update(fields)
+    obj.setdefault("notes", [])
+    obj["instanceType"] = instance_type
+    return obj
+
+
+def _link(items: list[dict]) -> list[dict]:
+    """Chain items with previousId/nextId in list order."""
+    for i, item in enumerate(items):
+        item["previousId"] = items[i - 1]["id"] if i > 0 else None
+        item["nextId"] = items[i + 1]["id"] if i + 1 < len(items) else None
+    return items
+
+
+def make_study(
+    arms: int = 2,
+    epochs: int = 3,
+    encounters: int = 10,
+    activities: int = 20,
+    criteria: int = 15,
+    timelines: int = 1,
+    amendments: int = 0,
+) -> dict:
+    """Build a synthetic USDM v4.0.0 document of the requested size.
+
+    Args:
+        arms, epochs: Design matrix size (one element per arm x epoch cell)
+        encounters: Encounters, spread evenly across epochs
+        activities: Activities scheduled across the encounters
+        criteria: Eligibility criteria (1/3 inclusion, 2/3 exclusion)
+        timelines: Schedule timelines; the first is the main timeline and
+                   the others are sub-timelines referenced from activities
+        amendments: StudyAmendment objects on the version
+    """
+    ids = _Ids()
+    timelines = max(timelines, 1)
+    epochs = max(epochs, 1)
+
+    # Organizations and identifiers
+    sponsor = _named(ids, "Organization", "SYNTHETIC PHARMA",
+                     identifier="SYN", identifierScheme="DUNS",
+                     type=_code(ids, "C70793", "Clinical Study Sponsor"),
+                     legalAddress=None, managedSites=[])
+    registry = _named(ids, "Organization", "CLINICALTRIALS.GOV",
+                      identifier="CT-GOV", identifierScheme="USGOV",
+                      type=_code(ids, "C93453", "Study Registry"),
+                      legalAddress=None, managedSites=[])
+    identifiers = [
+        {"id": ids("StudyIdentifier"), "extensionAttributes": [], "text": "SYN-0001",
+         "scopeId": sponsor["id"], "instanceType": "StudyIdentifier"},
+        {"id": ids("StudyIdentifier"), "extensionAttributes": [], "text": "NCT00000001",
+         "scopeId": registry["id"], "instanceType": "StudyIdentifier"},
+    ]
+    titles = [
+        {"id": ids("StudyTitle"), "extensionAttributes": [],
+         "text": "A Synthetic Study for Benchmarking", "instanceType": "StudyTitle",
+         "type": _code(ids, "C207615", "Brief Study Title")},
+        {"id": ids("StudyTitle"), "extensionAttributes": [],
+         "text": "A Randomized Synthetic Study of USDM Processing Performance",
+         "instanceType": "StudyTitle",
+         "type": _code(ids, "C207616", "Official Study Title")},
+    ]
+
+    # Interventions
+    interventions = [
+        _named(ids, "StudyIntervention", f"DRUG {i + 1}",
+               role=_code(ids, "C41161", "Experimental Intervention"),
+               type=_code(ids, "C1909", "Drug"),
+               administrations=[], codes=[], productDesignation=None,
+               minimumResponseDuration=None)
+        for i in range(max(arms // 2, 1))
+    ]
+
+    # Design matrix
+    epoch_objs = _link([
+        _named(ids, "StudyEpoch", f"EPOCH {e + 1}", type=_code(ids, "C101526", "Treatment Epoch"))
+        for e in range(epochs)
+    ])
+    arm_objs = [
+        _named(ids, "StudyArm", f"ARM {a + 1}",
+               type=_code(ids, "C174266", "Investigational Arm"),
+               dataOriginDescription="", dataOriginType=_code(ids, "C188866", "Data Generated Within Study"),
+               populationIds=[])
+        for a in range(arms)
+    ]
+    element_objs = []
+    cells = []
+    for arm in arm_objs:
+        for epoch in epoch_objs:
+            elem = _named(ids, "StudyElement", f"{arm['name']} {epoch['name']}",
+                          transitionStartRule=None, transitionEndRule=None,
+                          studyInterventionIds=[interventions[0]["id"]])
+            element_objs.append(elem)
+            cells.append({"id": ids("StudyCell"), "extensionAttributes": [],
+                          "armId": arm["id"], "epochId": epoch["id"],
+                          "elementIds": [elem["id"]], "instanceType": "StudyCell"})
+
+    # Encounters (spread over epochs) and activities
+    encounter_objs = _link([
+        _named(ids, "Encounter", f"VISIT {n + 1}",
+               type=_code(ids, "C25716", "Visit"), scheduledAtId=None,
+               environmentalSettings=[_code(ids, "C211570", "Clinic")],
+               contactModes=[_code(ids, "C175574", "In Person")],
+               transitionStartRule=None, transitionEndRule=None)
+        for n in range(encounters)
+    ])
+    activity_objs = _link([
+        _named(ids, "Activity", f"ASSESSMENT {n + 1}",
+               childIds=[], definedProcedures=[], biomedicalConceptIds=[],
+               bcCategoryIds=[], bcSurrogateIds=[], timelineId=None)
+        for n in range(activities)
+    ])
+
+    # Schedule timelines: main timeline visits every encounter; each
+    # sub-timeline is attached to one activity
+    timeline_objs = []
+    for t in range(timelines):
+        timeline_objs.append(_named(
+            ids, "ScheduleTimeline", "MAIN TIMELINE" if t == 0 else f"SUB TIMELINE {t}",
+            mainTimeline=t == 0, entryCondition="", entryId=None, exits=[],
+            timings=[], instances=[], plannedDuration=None,
+        ))
+    main = timeline_objs[0]
+    for n, enc in enumerate(encounter_objs):
+        epoch = epoch_objs[min(n * epochs // max(encounters, 1), epochs - 1)]
+        scheduled = [a["id"] for k, a in enumerate(activity_objs) if (k + n) % 3 == 0]
+        main["instances"].append({
+            "id": ids("ScheduledActivityInstance"), "extensionAttributes": [],
+            "name": f"SAI {n + 1}", "label": "", "description": "",
+            "defaultConditionId": None, "epochId": epoch["id"],
+            "instanceType": "ScheduledActivityInstance", "timelineId": None,
+            "timelineExitId": None, "activityIds": scheduled, "encounterId": enc["id"],
+        })
+    for t, sub in enumerate(timeline_objs[1:], 1):
+        if activity_objs:
+            activity_objs[(t * 7) % len(activity_objs)]["timelineId"] = sub["id"]
+        for k in range(3):
+            sub["instances"].append({
+                "id": ids("ScheduledActivityInstance"), "extensionAttributes": [],
+                "name": f"SUB {t}.{k + 1}", "label": "", "description": "",
+                "defaultConditionId": None, "epochId": None,
+                "instanceType": "ScheduledActivityInstance", "timelineId": None,
+                "timelineExitId": None,
+                "activityIds": [a["id"] for a in activity_objs[k::max(len(activity_objs) // 4, 1)]],
+                "encounterId": None,
+            })
+    for timeline in timeline_objs:
+        instances = timeline["instances"]
+        for i, inst in enumerate(instances[:-1]):
+            inst["defaultConditionId"] = instances[i + 1]["id"]
+        timeline["entryId"] = instances[0]["id"] if instances else None
+
+    # Eligibility
+    criterion_items = []
+    criterion_objs = []
+    for n in range(criteria):
+        inclusion = n < criteria // 3
+        item = _named(ids, "EligibilityCriterionItem", f"ITEM {n + 1}",
+                      text=f"<p>Participant {'has' if inclusion else 'does not have'} "
+                           f"condition {n + 1} at <usdm:tag name=\"visit\"/> screening.</p>",
+                      dictionaryId=None)
+        criterion_items.append(item)
+        criterion_objs.append(_named(
+            ids, "EligibilityCriterion", f"{'INC' if inclusion else 'EXC'} {n + 1}",
+            category=_code(ids, "C25532" if inclusion else "C25370",
+                           "Inclusion Criteria" if inclusion else "Exclusion Criteria"),
+            identifier=str(n + 1), criterionItemId=item["id"], contextId=None,
+        ))
+    _link(criterion_objs)
+
+    objectives = [
+        _named(ids, "Objective", f"OBJECTIVE {n + 1}",
+               text=f"To evaluate synthetic outcome {n + 1}", dictionaryId=None,
+               level=_code(ids, "C85826" if n == 0 else "C85827",
+                           "Primary Objective" if n == 0 else "Secondary Objective"),
+               endpoints=[_named(ids, "Endpoint", f"ENDPOINT {n + 1}",
+                                 text=f"Synthetic endpoint {n + 1}", dictionaryId=None,
+                                 purpose="Efficacy",
+                                 level=_code(ids, "C94496", "Primary Endpoint"))])
+        for n in range(3)
+    ]
+
+    design = _named(
+        ids, "InterventionalStudyDesign", "SYNTHETIC DESIGN",
+        studyType=_code(ids, "C98388", "Interventional Study"),
+        studyPhase=_alias_code(ids, "C15601", "Phase II Trial"),
+        therapeuticAreas=[], characteristics=[],
+        encounters=encounter_objs, activities=activity_objs, arms=arm_objs,
+        studyCells=cells, rationale="Synthetic", epochs=epoch_objs, elements=element_objs,
+        estimands=[], indications=[_named(ids, "Indication", "SYNTHETIC DISEASE",
+                                          codes=[], isRareDisease=False)],
+        studyInterventionIds=[iv["id"] for iv in interventions], objectives=objectives,
+        population=_named(ids, "StudyDesignPopulation", "POPULATION",
+                          includesHealthySubjects=False, criterionIds=[],
+                          plannedEnrollmentNumber={"id": ids("Range"), "extensionAttributes": [],
+                                                   "minValue": None,
+                                                   "maxValue": {"id": ids("Quantity"),
+                                                                "extensionAttributes": [],
+                                                                "value": 100 * arms, "unit": None,
+                                                                "instanceType": "Quantity"},
+                                                   "isApproximate": False,
+                                                   "instanceType": "Range"},
+                          cohorts=[]),
+        scheduleTimelines=timeline_objs, biospecimenRetentions=[], documentVersionIds=[],
+        eligibilityCriteria=criterion_objs, analysisPopulations=[],
+        subTypes=[], model=_code(ids, "C82639", "Parallel Study"),
+        intentTypes=[_code(ids, "C49656", "Treatment Study")],
+        blindingSchema=_alias_code(ids, "C15228", "Double Blind Study"),
+    )
+
+    amendment_objs = [
+        _named(ids, "StudyAmendment", f"AMENDMENT {n + 1}", number=str(n + 1),
+               summary=f"Synthetic amendment {n + 1}",
+               primaryReason={"id": ids("StudyAmendmentReason"), "extensionAttributes": [],
+                              "code": _code(ids, "C207612", "Regulatory Agency Request To Amend"),
+                              "otherReason": None, "instanceType": "StudyAmendmentReason"},
+               secondaryReasons=[], changes=[], impacts=[], geographicScopes=[],
+               enrollments=[], dateValues=[], previousId=None)
+        for n in range(amendments)
+    ]
+    for n, amendment in enumerate(amendment_objs[1:], 1):
+        amendment["previousId"] = amendment_objs[n - 1]["id"]
+
+    version = {
+        "id": ids("StudyVersion"), "extensionAttributes": [], "versionIdentifier": "1.0",
+        "rationale": "Synthetic", "documentVersionIds": [], "dateValues": [],
+        "amendments": amendment_objs, "businessTherapeuticAreas": [],
+        "studyIdentifiers": identifiers, "referenceIdentifiers": [],
+        "studyDesigns": [design], "titles": titles,
+        "eligibilityCriterionItems": criterion_items, "narrativeContentItems": [],
+        "abbreviations": [], "roles": [], "organizations": [sponsor, registry],
+        "studyInterventions": interventions, "administrableProducts": [],
+        "medicalDevices": [], "productOrganizationRoles": [], "biomedicalConcepts": [],
+        "bcCategories": [], "bcSurrogates": [], "dictionaries": [], "conditions": [],
+        "notes": [], "instanceType": "StudyVersion",
+    }
+    return {
+        "study": {"id": ids("Study"), "extensionAttributes": [], "name": "SYNTHETIC",
+                  "description": None, "label": None, "versions": [version],
+                  "documentedBy": [], "instanceType": "Study"},
+        "usdmVersion": "4.0.0",
+        "systemName": "Synthetic USDM Generator",
+        "systemVersion": "1.0",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic USDM v4.0.0 study")
+    parser.add_argument("--size", choices=sorted(SIZES), help="Start from a named preset")
+    for field in SIZES["small"]:
+        parser.add_argument(f"--{field}", type=int, help=f"Number of {field}")
+    parser.add_argument("--output", "-o", required=True, help="Output JSON path")
+    args = parser.parse_args()
+
+    params = dict(SIZES[args.size or "small"])
+    params.update({k: v for k, v in vars(args).items() if k in params and v is not None})
+    write_json(make_study(**params), args.output)
+    print(f"  ✓ Synthetic study ({params}) saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,51 +9,226 @@ Usage:
     python m11_document_generator.py \
         --input study_definition.json \
         --output protocol_m11.docx
+
+    # Batch mode: every *.json in a directory (or a glob), in parallel
+    python m11_document_generator.py \
+        --input studies/ --output output/m11/ --jobs 8
 """
 
-import json
 import argparse
+import copy
+import functools
+import io
+import os
+import sys
+import weakref
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Union
 
 try:
     from docx import Document
     from docx.shared import Inches, Pt, RGBColor
     from docx.enum.text import WD_ALIGN_PARAGRAPH
     from docx.enum.table import WD_TABLE_ALIGNMENT
+    from docx.enum.style import WD_STYLE_TYPE
+    from docx.table import Table, _Cell
+    from docx.opc.exceptions import PackageNotFoundError
+    from docx.opc.oxml import serialize_part_xml
+    from docx.oxml import parse_xml
 except ImportError:
     print("ERROR: python-docx is required. Install with: pip install python-docx")
     raise
 
 from usdm_utils import (
+    UsdmIndex,
+    split_index,
+    load_usdm_file,
+    write_json,
+    GENERATOR_SKIP_SECTIONS,
+    profiled,
+    profile_stage,
+    profiling,
+    is_batch_input,
+    expand_inputs,
+    batch_output_names,
+    run_batch,
+    write_batch_summary,
     get_version_and_design,
+    list_design_pairs,
+    design_label,
+    aggregate_profiles,
+    build_cell_matrix,
+    build_activity_matrix,
     sort_linked_list,
     get_study_title,
     get_study_id,
     get_sponsor_info,
     get_registry_id,
-    get_criterion_text,
+    resolve_criteria_text,
     get_enrollment_number,
 )
+from usdm_cache import ResultCache, resolve_cache_dir, file_digest
+
+TOOL = "m11_document_generator"
+
+
+def load_usdm(path: str, stream: bool = False) -> dict:
+    """Load USDM JSON.
+
+    With `stream`, sections this generator never reads (narrative content,
+    biomedical concepts, ...) are skipped while parsing; see
+    usdm_utils.load_usdm_file.
+    """
+    return load_usdm_file(path, GENERATOR_SKIP_SECTIONS if stream else ())
+
 
+def table_cells(table: Table) -> list[list[_Cell]]:
+    """Cells of a table without merged cells, row by row.
 
-def load_usdm(path: str) -> dict:
-    """Load USDM JSON."""
-    with open(path) as f:
-        return json.load(f)
+    Walks the table XML once. python-docx's table.cell(i, j) rebuilds
+    the whole cell grid on every call, so filling an R x C table through
+    it costs O((R*C)^2); fill tables through this grid instead.
+    """
+    return [[_Cell(tc, table) for tc in tr.tc_lst] for tr in table._tbl.tr_lst]
+
+
+def fill_cells(cells: list[_Cell], text: str, alignment=None):
+    """Set the same text (and paragraph alignment) in many new, empty cells.
+
+    Only the first cell goes through the python-docx setters; the others
+    get a copy of its paragraph XML, which is far cheaper when a table
+    has thousands of identical cells (the SoA ticks).
+    """
+    if not cells:
+        return
+    first = cells[0]
+    first.text = text
+    if alignment is not None:
+        first.paragraphs[0].alignment = alignment
+    paragraph = first._tc.p_lst[0]
+    for cell in cells[1:]:
+        tc = cell._tc
+        tc.replace(tc.p_lst[0], copy.deepcopy(paragraph))
+
+
+# Named styles the section builders apply: (name, type)
+M11_STYLES = [
+    ("Title", WD_STYLE_TYPE.PARAGRAPH),
+    ("Heading 1", WD_STYLE_TYPE.PARAGRAPH),
+    ("Heading 2", WD_STYLE_TYPE.PARAGRAPH),
+    ("Heading 3", WD_STYLE_TYPE.PARAGRAPH),
+    ("List Bullet", WD_STYLE_TYPE.PARAGRAPH),
+    ("Intense Quote", WD_STYLE_TYPE.PARAGRAPH),
+    ("Table Grid", WD_STYLE_TYPE.TABLE),
+]
+
+# Document part -> {(style name, type): style ID}, shared by every
+# document made from the same template
+_style_ids: "weakref.WeakKeyDictionary[object, dict]" = weakref.WeakKeyDictionary()
+
+
+def style_id(part, name: str, style_type: WD_STYLE_TYPE) -> Optional[str]:
+    """Style ID for a style name in a document part, resolved once.
+
+    python-docx resolves the name on every assignment by scanning all of
+    the document's styles (a few milliseconds per styled paragraph);
+    the result is cached per document, or per template (see M11Template).
+    """
+    ids = _style_ids.setdefault(part, {})
+    key = (name, style_type)
+    if key not in ids:
+        ids[key] = part.get_style_id(name, style_type)
+    return ids[key]
 
 
-def add_title_page(doc: Document, version: dict, design: dict):
+def styled_paragraph(doc: Document, text: str, style: str):
+    """doc.add_paragraph(text, style=style) with the style ID cached (see style_id)."""
+    paragraph = doc.add_paragraph(text)
+    paragraph._p.style = style_id(doc.part, style, WD_STYLE_TYPE.PARAGRAPH)
+    return paragraph
+
+
+def heading(doc: Document, text: str, level: int = 1):
+    """doc.add_heading(text, level) with the style ID cached (see style_id)."""
+    return styled_paragraph(doc, text, "Title" if level == 0 else f"Heading {level}")
+
+
+def style_table(table: Table, style: str):
+    """table.style = style with the style ID cached (see style_id)."""
+    table._tbl.tblStyle_val = style_id(table.part, style, WD_STYLE_TYPE.TABLE)
+
+
+class M11Template:
+    """A compiled base document that M11 documents are created from.
+
+    The base is python-docx's default template with the M11 base style
+    (Arial 10pt Normal text), or a pre-styled .docx given as `path`,
+    whose styles, numbering and page setup are used as they are and
+    whose body content is dropped. It is saved to an in-memory package
+    once, and the style IDs of M11_STYLES are resolved once; documents
+    made by new_document() share them (see style_id).
+
+    Raises:
+        ValueError if `path` is not a .docx package or lacks one of
+        M11_STYLES.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        try:
+            doc = Document(path)
+        except (PackageNotFoundError, zipfile.BadZipFile, KeyError) as exc:
+            raise ValueError(f"Template {path} is not a readable .docx package ({exc})") from exc
+        if path is None:
+            font = doc.styles["Normal"].font
+            font.name = "Arial"
+            font.size = Pt(10)
+        body = doc.element.body
+        del body[:-1 if body.sectPr is not None else len(body)]
+        if body.sectPr is None:
+            # w:sectPr is optional, but sections, tables and the section
+            # splitter all need one; use python-docx's default page setup
+            body.append(copy.deepcopy(Document().element.body.sectPr))
+
+        self.style_ids: dict = {}
+        for name, style_type in M11_STYLES:
+            try:
+                self.style_ids[name, style_type] = doc.part.get_style_id(name, style_type)
+            except (KeyError, ValueError) as exc:
+                raise ValueError(f"Template {path} lacks the '{name}' style M11 documents use") from exc
+
+        package = io.BytesIO()
+        doc.save(package)
+        self._package = package.getvalue()
+
+    def new_document(self) -> Document:
+        """A fresh, empty document from the template."""
+        doc = Document(io.BytesIO(self._package))
+        _style_ids[doc.part] = self.style_ids
+        return doc
+
+
+@functools.lru_cache(maxsize=None)
+def load_template(path: Optional[str] = None) -> M11Template:
+    """The compiled M11 template for a base .docx (default: built in), once per process."""
+    return M11Template(path)
+
+
+@profiled()
+def add_title_page(doc: Document, version: dict, design: dict, index: Optional[UsdmIndex] = None):
     """Generate the M11 Title Page."""
-    sponsor = get_sponsor_info(version)
+    sponsor = get_sponsor_info(version, index)
     phase = design.get("studyPhase", {}).get("standardCode", {}).get("decode", "TBD")
     title = get_study_title(version, "Official")
     version_id = version.get("versionIdentifier", "1.0")
 
-    doc.add_heading("CLINICAL STUDY PROTOCOL", level=0)
+    heading(doc, "CLINICAL STUDY PROTOCOL", level=0)
     doc.add_paragraph("")
 
     # Protocol metadata table
-    registry_id = get_registry_id(version)
+    registry_id = get_registry_id(version, index)
     fields = [
         ("Protocol Title", title),
         ("Protocol Identifier", sponsor["protocol_number"]),
@@ -64,11 +239,9 @@ def add_title_page(doc: Document, version: dict, design: dict):
     ]
 
     table = doc.add_table(rows=len(fields), cols=2)
-    table.style = "Table Grid"
+    style_table(table, "Table Grid")
 
-    for i, (label, value) in enumerate(fields):
-        cell_label = table.cell(i, 0)
-        cell_value = table.cell(i, 1)
+    for (label, value), (cell_label, cell_value) in zip(fields, table_cells(table)):
         cell_label.text = label
         cell_value.text = str(value) if value else "TBD"
         for paragraph in cell_label.paragraphs:
@@ -78,11 +251,12 @@ def add_title_page(doc: Document, version: dict, design: dict):
     doc.add_page_break()
 
 
-def add_synopsis(doc: Document, version: dict, design: dict):
+@profiled()
+def add_synopsis(doc: Document, version: dict, design: dict, index: Optional[UsdmIndex] = None):
     """Generate the Protocol Synopsis section."""
-    doc.add_heading("Protocol Synopsis", level=1)
+    heading(doc, "Protocol Synopsis", level=1)
 
-    sponsor = get_sponsor_info(version)
+    sponsor = get_sponsor_info(version, index)
     title = get_study_title(version, "Official")
     phase = design.get("studyPhase", {}).get("standardCode", {}).get("decode", "TBD")
 
@@ -119,12 +293,12 @@ def add_synopsis(doc: Document, version: dict, design: dict):
     ]
 
     table = doc.add_table(rows=len(synopsis_items), cols=2)
-    table.style = "Table Grid"
+    style_table(table, "Table Grid")
 
-    for i, (label, value) in enumerate(synopsis_items):
-        table.cell(i, 0).text = label
-        table.cell(i, 1).text = value if value else "TBD"
-        for paragraph in table.cell(i, 0).paragraphs:
+    for (label, value), (cell_label, cell_value) in zip(synopsis_items, table_cells(table)):
+        cell_label.text = label
+        cell_value.text = value if value else "TBD"
+        for paragraph in cell_label.paragraphs:
             for run in paragraph.runs:
                 run.bold = True
 
@@ -132,37 +306,40 @@ def add_synopsis(doc: Document, version: dict, design: dict):
 
     # Arms summary
     if arms:
-        doc.add_heading("Treatment Arms", level=3)
+        heading(doc, "Treatment Arms", level=3)
         for arm in arms:
             arm_type = arm.get("type", arm.get("armType", {}))
             type_text = arm_type.get("decode", "") if isinstance(arm_type, dict) else ""
             arm_label = arm.get("label", arm.get("name", "TBD"))
             arm_desc = arm.get("description", "")
-            doc.add_paragraph(
+            styled_paragraph(
+                doc,
                 f"{arm_label} ({type_text}): {arm_desc}",
-                style="List Bullet"
+                "List Bullet",
             )
 
     # Indications
     indications = design.get("indications", [])
     if indications:
-        doc.add_heading("Indication(s)", level=3)
+        heading(doc, "Indication(s)", level=3)
         for ind in indications:
-            doc.add_paragraph(
+            styled_paragraph(
+                doc,
                 f"{ind.get('label', ind.get('name', ''))}: {ind.get('description', '')}",
-                style="List Bullet"
+                "List Bullet",
             )
 
     doc.add_page_break()
 
 
-def add_trial_design(doc: Document, design: dict):
+@profiled()
+def add_trial_design(doc: Document, design: dict, index: Optional[UsdmIndex] = None):
     """Generate Section 1: Trial Design."""
-    doc.add_heading("1. Introduction", level=1)
-    doc.add_heading("1.1 Trial Design", level=2)
+    heading(doc, "1. Introduction", level=1)
+    heading(doc, "1.1 Trial Design", level=2)
 
     arms = design.get("arms", design.get("studyArms", []))
-    epochs = sort_linked_list(design.get("epochs", design.get("studyEpochs", [])))
+    epochs = sort_linked_list(design.get("epochs", design.get("studyEpochs", [])), index)
 
     if arms and epochs:
         doc.add_paragraph(
@@ -170,40 +347,43 @@ def add_trial_design(doc: Document, design: dict):
         )
 
         table = doc.add_table(rows=len(arms) + 1, cols=len(epochs) + 1)
-        table.style = "Table Grid"
+        style_table(table, "Table Grid")
+        cells = table_cells(table)
 
         # Header row
-        table.cell(0, 0).text = "Arm \\ Epoch"
+        cells[0][0].text = "Arm \\ Epoch"
         for j, epoch in enumerate(epochs):
-            table.cell(0, j + 1).text = epoch.get("label", epoch.get("name", ""))
+            cells[0][j + 1].text = epoch.get("label", epoch.get("name", ""))
 
         # Data rows
-        cells = design.get("studyCells", [])
-        elements = {e["id"]: e for e in design.get("elements", design.get("studyElements", []))}
+        design_elements = design.get("elements", design.get("studyElements", []))
+        if index is not None:
+            cell_matrix = index.cell_matrix(design)
+            elements = index.id_map(design_elements)
+        else:
+            cell_matrix = build_cell_matrix(design.get("studyCells", []))
+            elements = {e["id"]: e for e in design_elements}
 
         for i, arm in enumerate(arms):
-            table.cell(i + 1, 0).text = arm.get("label", arm.get("name", ""))
+            cells[i + 1][0].text = arm.get("label", arm.get("name", ""))
             for j, epoch in enumerate(epochs):
-                matching = [
-                    c for c in cells
-                    if c.get("armId") == arm["id"] and c.get("epochId") == epoch["id"]
-                ]
                 elem_names = []
-                for cell in matching:
+                for cell in cell_matrix.get((arm["id"], epoch["id"]), []):
                     for eid in cell.get("elementIds", []):
                         elem = elements.get(eid, {})
                         elem_names.append(elem.get("label", elem.get("name", "")))
-                table.cell(i + 1, j + 1).text = "\n".join(elem_names)
+                cells[i + 1][j + 1].text = "\n".join(elem_names)
 
     doc.add_paragraph("")
 
 
+@profiled()
 def add_objectives_endpoints(doc: Document, design: dict):
     """Generate Section 2: Objectives and Endpoints.
 
     In v4.0.0, endpoints are embedded in each Objective, not a separate array.
     """
-    doc.add_heading("2. Trial Objectives and Endpoints", level=1)
+    heading(doc, "2. Trial Objectives and Endpoints", level=1)
 
     objectives = design.get("objectives", [])
 
@@ -215,7 +395,7 @@ def add_objectives_endpoints(doc: Document, design: dict):
         if not level_objs:
             continue
 
-        doc.add_heading(f"2.x {level_name} Objective(s)", level=2)
+        heading(doc, f"2.x {level_name} Objective(s)", level=2)
 
         for obj in level_objs:
             text = obj.get("text", "")
@@ -226,44 +406,48 @@ def add_objectives_endpoints(doc: Document, design: dict):
             if endpoints:
                 doc.add_paragraph("Associated Endpoint(s):")
                 for ep in endpoints:
-                    doc.add_paragraph(ep.get("text", ""), style="List Bullet")
+                    styled_paragraph(doc, ep.get("text", ""), "List Bullet")
             doc.add_paragraph("")
 
 
-def add_eligibility(doc: Document, version: dict, design: dict):
+@profiled()
+def add_eligibility(doc: Document, version: dict, design: dict, index: Optional[UsdmIndex] = None):
     """Generate Section 4: Trial Population / Eligibility.
 
     In v4.0.0, criterion text is resolved via criterionItemId.
     """
-    doc.add_heading("4. Trial Population", level=1)
+    heading(doc, "4. Trial Population", level=1)
 
-    criteria = design.get("eligibilityCriteria", [])
+    criteria = sort_linked_list(design.get("eligibilityCriteria", []), index)
     criterion_items = version.get("eligibilityCriterionItems", [])
 
     inclusion = [c for c in criteria if "inclusion" in c.get("category", {}).get("decode", "").lower()]
     exclusion = [c for c in criteria if "exclusion" in c.get("category", {}).get("decode", "").lower()]
 
-    doc.add_heading("4.1 Inclusion Criteria", level=2)
+    # Resolve all criterion texts via criterionItemId in one pass
+    inclusion_texts = resolve_criteria_text(inclusion, criterion_items, index)
+    exclusion_texts = resolve_criteria_text(exclusion, criterion_items, index)
+
+    heading(doc, "4.1 Inclusion Criteria", level=2)
     doc.add_paragraph("Subjects must meet ALL of the following criteria to be eligible:")
-    for i, c in enumerate(inclusion, 1):
-        text = get_criterion_text(c, criterion_items)
+    for i, text in enumerate(inclusion_texts, 1):
         doc.add_paragraph(f"{i}. {text}")
 
     doc.add_paragraph("")
-    doc.add_heading("4.2 Exclusion Criteria", level=2)
+    heading(doc, "4.2 Exclusion Criteria", level=2)
     doc.add_paragraph("Subjects meeting ANY of the following criteria are excluded:")
-    for i, c in enumerate(exclusion, 1):
-        text = get_criterion_text(c, criterion_items)
+    for i, text in enumerate(exclusion_texts, 1):
         doc.add_paragraph(f"{i}. {text}")
 
 
+@profiled()
 def add_interventions(doc: Document, version: dict, design: dict):
     """Generate Section 5: Trial Interventions.
 
     In v4.0.0, studyInterventions are at the version level, referenced
     from design via studyInterventionIds[].
     """
-    doc.add_heading("5. Trial Intervention(s)", level=1)
+    heading(doc, "5. Trial Intervention(s)", level=1)
 
     # Get interventions from version level
     all_interventions = version.get("studyInterventions", [])
@@ -271,6 +455,7 @@ def add_interventions(doc: Document, version: dict, design: dict):
 
     # Filter to those referenced by design, or use all if no IDs specified
     if intv_ids:
+        intv_ids = set(intv_ids)
         interventions = [iv for iv in all_interventions if iv.get("id") in intv_ids]
     else:
         interventions = all_interventions
@@ -280,27 +465,35 @@ def add_interventions(doc: Document, version: dict, design: dict):
         return
 
     table = doc.add_table(rows=len(interventions) + 1, cols=3)
-    table.style = "Table Grid"
+    style_table(table, "Table Grid")
+
+    cells = table_cells(table)
 
     headers = ["Intervention", "Role", "Description"]
-    for j, h in enumerate(headers):
-        table.cell(0, j).text = h
-        for p in table.cell(0, j).paragraphs:
+    for cell, h in zip(cells[0], headers):
+        cell.text = h
+        for p in cell.paragraphs:
             for run in p.runs:
                 run.bold = True
 
-    for i, intv in enumerate(interventions, 1):
-        table.cell(i, 0).text = intv.get("label", intv.get("name", ""))
-        table.cell(i, 1).text = intv.get("role", {}).get("decode", "")
-        table.cell(i, 2).text = intv.get("description", "")
+    for row, intv in zip(cells[1:], interventions):
+        row[0].text = intv.get("label", intv.get("name", ""))
+        row[1].text = intv.get("role", {}).get("decode", "")
+        row[2].text = intv.get("description", "")
+
 
+@profiled()
+def add_schedule_of_activities(doc: Document, design: dict, index: Optional[UsdmIndex] = None):
+    """Generate Section 6: Schedule of Activities.
 
-def add_schedule_of_activities(doc: Document, design: dict):
-    """Generate Section 6: Schedule of Activities."""
-    doc.add_heading("6. Schedule of Activities", level=1)
+    An activity is ticked at every encounter where a scheduled activity
+    instance places it, including instances of sub-timelines (see
+    usdm_utils.build_activity_matrix).
+    """
+    heading(doc, "6. Schedule of Activities", level=1)
 
-    encounters = sort_linked_list(design.get("encounters", []))
-    activities = sort_linked_list(design.get("activities", []))
+    encounters = sort_linked_list(design.get("encounters", []), index)
+    activities = sort_linked_list(design.get("activities", []), index)
 
     if not encounters or not activities:
         doc.add_paragraph("Schedule of Activities to be defined.")
@@ -313,65 +506,509 @@ def add_schedule_of_activities(doc: Document, design: dict):
 
     # SoA table: rows = activities, columns = encounters
     table = doc.add_table(rows=len(activities) + 1, cols=len(encounters) + 1)
-    table.style = "Table Grid"
+    style_table(table, "Table Grid")
+    cells = table_cells(table)
 
     # Header
-    table.cell(0, 0).text = "Assessment"
-    for j, enc in enumerate(encounters):
-        cell = table.cell(0, j + 1)
+    cells[0][0].text = "Assessment"
+    for cell, enc in zip(cells[0][1:], encounters):
         cell.text = enc.get("label", enc.get("name", ""))
         for p in cell.paragraphs:
             for run in p.runs:
                 run.font.size = Pt(8)
 
-    # Activity rows
-    for i, act in enumerate(activities, 1):
-        table.cell(i, 0).text = act.get("label", act.get("name", ""))
+    # Activity rows with their ticks
+    if index is not None:
+        scheduled = index.activity_matrix(design)
+    else:
+        scheduled = build_activity_matrix(design)
+    encounter_ids = [enc["id"] for enc in encounters]
+    ticks = []
+    for row, act in zip(cells[1:], activities):
+        row[0].text = act.get("label", act.get("name", ""))
+        act_id = act["id"]
+        ticks.extend(cell for cell, enc_id in zip(row[1:], encounter_ids) if (act_id, enc_id) in scheduled)
+    fill_cells(ticks, "X", WD_ALIGN_PARAGRAPH.CENTER)
 
     doc.add_paragraph("")
-    doc.add_paragraph(
+    styled_paragraph(
+        doc,
         "Note: Detailed timing and windows are defined in the full protocol.",
-        style="Intense Quote"
+        "Intense Quote",
     )
 
 
-def generate_m11(input_path: str, output_path: str):
-    """Main generation function."""
-    data = load_usdm(input_path)
-    version, design = get_version_and_design(data)
+def new_m11_document(template: Optional[str] = None) -> Document:
+    """Blank document from the compiled M11 template (see load_template)."""
+    return load_template(template).new_document()
+
 
-    doc = Document()
+# The M11 sections in document order, each called as
+# build(doc, version, design, index)
+M11_SECTIONS: list[Callable[[Document, dict, dict, UsdmIndex], None]] = [
+    lambda doc, version, design, index: add_title_page(doc, version, design, index),
+    lambda doc, version, design, index: add_synopsis(doc, version, design, index),
+    lambda doc, version, design, index: add_trial_design(doc, design, index),
+    lambda doc, version, design, index: add_objectives_endpoints(doc, design),
+    lambda doc, version, design, index: add_eligibility(doc, version, design, index),
+    lambda doc, version, design, index: add_interventions(doc, version, design),
+    lambda doc, version, design, index: add_schedule_of_activities(doc, design, index),
+]
 
-    # Set default font
-    style = doc.styles["Normal"]
-    font = style.font
-    font.name = "Arial"
-    font.size = Pt(10)
 
-    # Build document
-    add_title_page(doc, version, design)
-    add_synopsis(doc, version, design)
-    add_trial_design(doc, design)
-    add_objectives_endpoints(doc, design)
-    add_eligibility(doc, version, design)
-    add_interventions(doc, version, design)
-    add_schedule_of_activities(doc, design)
+def m11_sections(
+    data: Union[dict, UsdmIndex], version_index: int = 0, design_index: int = 0
+) -> list[Callable[[Document], None]]:
+    """The M11 section builders for one study design, in document order.
+
+    Each entry adds one section to the document it is called with.
+    """
+    data, index = split_index(data)
+    if index is None:
+        index = UsdmIndex(data)
+    version, design = get_version_and_design(data, version_index, design_index)
+    return [functools.partial(build, version=version, design=design, index=index)
+            for build in M11_SECTIONS]
 
-    # Save
-    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-    doc.save(output_path)
-    print(f"  ✓ M11 protocol document saved to: {output_path}")
+
+def split_document_xml(doc: Document) -> tuple[bytes, bytes, bytes]:
+    """Split doc's word/document.xml into (prefix through <w:body>, body content, rest).
+
+    The body content is everything before the final section properties.
+    """
+    xml = serialize_part_xml(doc.element)
+    empty = xml.find(b"<w:body/>")
+    if empty >= 0:  # an empty body serializes self-closed
+        return xml[:empty] + b"<w:body>", b"", b"</w:body>" + xml[empty + len(b"<w:body/>"):]
+    start = xml.index(b"<w:body>") + len(b"<w:body>")
+    end = xml.rindex(b"<w:sectPr" if doc.element.body.sectPr is not None else b"</w:body>")
+    return xml[:start], xml[start:end], xml[end:]
+
+
+# Section worker state: the version and design being rendered, an index
+# of the version alone, and the template path
+_section_worker: dict = {}
+
+
+def _init_section_worker(version: dict, design: dict, template: Optional[str]):
+    # Every per-version lookup the sections make (organizations, criterion
+    # items, linked lists, cell and activity matrices) stays inside the
+    # version, so indexing it alone is enough
+    _section_worker["args"] = (version, design, UsdmIndex(version))
+    _section_worker["template"] = template
+
+
+def _render_section(position: int) -> bytes:
+    """Build one section in a blank document; returns its body content XML."""
+    doc = new_m11_document(_section_worker["template"])
+    rel_ids = set(doc.part.rels)
+    M11_SECTIONS[position](doc, *_section_worker["args"])
+    if set(doc.part.rels) != rel_ids:
+        raise RuntimeError("A section added a package part or relationship; "
+                           "sections rendered in parallel may only add body content")
+    return split_document_xml(doc)[1]
+
+
+def render_m11_sections(
+    data: Union[dict, UsdmIndex], version_index: int = 0, design_index: int = 0,
+    jobs: Optional[int] = None, template: Optional[str] = None,
+) -> Iterator[bytes]:
+    """Build every M11 section as an independent fragment across a process pool.
+
+    Workers receive only the selected version and design, index that
+    version once, and render the sections they are given into a blank
+    document (see new_m11_document). The fragments, the body content
+    XML of each section, are yielded in document order as they become
+    available, so a caller that writes them out holds only the ones
+    finished ahead of their turn. `jobs` is the number of worker
+    processes (default: one per section, up to the CPU count).
+    `template` is the base .docx the fragments are built in (see
+    load_template).
+    """
+    data, _index = split_index(data)
+    version, design = get_version_and_design(data, version_index, design_index)
+    jobs = min(jobs or os.cpu_count() or 1, len(M11_SECTIONS))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_section_worker,
+                             initargs=(version, design, template)) as pool:
+        yield from pool.map(_render_section, range(len(M11_SECTIONS)))
+
+
+def splice_sections(doc: Document, fragments: Iterable[bytes]) -> Document:
+    """Return `doc` with rendered section fragments appended to its body, in order.
+
+    The spliced document.xml is parsed whole and replaces the part's
+    element; moving large subtrees between lxml trees one element at a
+    time is far slower. Use the returned Document, not `doc`.
+    """
+    head, content, tail = split_document_xml(doc)
+    doc.part._element = parse_xml(head + content + b"".join(fragments) + tail)
+    return doc.part.document
+
+
+@profiled()
+def build_m11_document(
+    data: Union[dict, UsdmIndex], version_index: int = 0, design_index: int = 0,
+    jobs: Optional[int] = 1, template: Optional[str] = None,
+) -> Document:
+    """Build the M11 document for a USDM dict or a prebuilt UsdmIndex.
+
+    Covers the first StudyDesign of the first StudyVersion unless
+    `version_index`/`design_index` select another one. With `jobs`
+    other than 1, the sections are rendered in parallel (see
+    render_m11_sections) and spliced in document order. `template` is a
+    pre-styled base .docx to start from (see load_template).
+    """
+    doc = new_m11_document(template)
+    if jobs != 1:
+        with profile_stage("render_sections"):
+            fragments = list(render_m11_sections(data, version_index, design_index, jobs, template))
+        return splice_sections(doc, fragments)
+    for add_section in m11_sections(data, version_index, design_index):
+        add_section(doc)
+    return doc
+
+
+class StreamingDocxWriter:
+    """Write a .docx whose body is emitted section by section.
+
+    The document's other parts (styles, numbering, settings, ...) are
+    written from `doc` when the writer is opened. After each section is
+    added to `doc`, flush() serializes the new body content into the
+    package's word/document.xml stream and drops it from `doc`. Peak
+    memory is therefore bounded by the largest section rather than the
+    whole document. The parts and the document.xml bytes are the same
+    as doc.save() would write.
+
+    Sections may only add body content. Anything that adds a package
+    part or relationship, such as an image or a hyperlink, is detected
+    at close() and rejected.
+
+        with StreamingDocxWriter(doc, "protocol.docx") as writer:
+            for add_section in sections:
+                add_section(doc)
+                writer.flush()
+    """
+
+    def __init__(self, doc: Document, path: str):
+        self.doc = doc
+        self.path = path
+        self._body = doc.element.body
+        self._sect_pr = self._body.sectPr  # stays last; python-docx reads page width from it
+        self._rel_ids = set(doc.part.rels)
+
+        # Every other part comes from the document as it is now, with an
+        # empty body; word/document.xml is streamed in their original order
+        skeleton = io.BytesIO()
+        doc.save(skeleton)
+        self._skeleton = zipfile.ZipFile(skeleton)
+        names = self._skeleton.namelist()
+        position = names.index("word/document.xml")
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        for name in names[:position]:
+            self._zip.writestr(name, self._skeleton.read(name))
+        self._remaining = names[position + 1:]
+
+        self._stream = self._zip.open("word/document.xml", "w")
+        head, _content, _tail = split_document_xml(doc)
+        self._stream.write(head)
+
+    def write(self, content: bytes):
+        """Write body content serialized elsewhere, e.g. by render_m11_sections."""
+        self._stream.write(content)
+
+    def flush(self):
+        """Write the body content added since the last flush and release it."""
+        with profile_stage("write_section"):
+            _head, content, _tail = split_document_xml(self.doc)
+            self.write(content)
+            # A slice delete frees the elements without creating a proxy per child
+            del self._body[:-1 if self._sect_pr is not None else len(self._body)]
+
+    def close(self):
+        _head, content, tail = split_document_xml(self.doc)
+        self._stream.write(content + tail)
+        self._stream.close()
+        if set(self.doc.part.rels) != self._rel_ids:
+            self._zip.close()
+            os.remove(self.path)
+            raise RuntimeError("A section added a package part or relationship; "
+                               "StreamingDocxWriter only supports body content")
+        for name in self._remaining:
+            self._zip.writestr(name, self._skeleton.read(name))
+        self._zip.close()
+
+    def __enter__(self) -> "StreamingDocxWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._stream.close()
+            self._zip.close()
+            os.remove(self.path)
+
+
+@profiled()
+def write_m11_document(
+    data: Union[dict, UsdmIndex], output_path: str, version_index: int = 0, design_index: int = 0,
+    jobs: Optional[int] = 1, template: Optional[str] = None,
+):
+    """Build the M11 document and stream it to `output_path` section by section.
+
+    Produces the same document as build_m11_document() followed by
+    save(), but never holds more than one section in memory (see
+    StreamingDocxWriter). With `jobs` other than 1, the sections are
+    rendered in parallel (see render_m11_sections) and each fragment is
+    written as soon as its turn comes; only fragments finished ahead of
+    an earlier, slower section wait in memory. `template` is as for build_m11_document.
+    """
+    doc = new_m11_document(template)
+    with StreamingDocxWriter(doc, output_path) as writer:
+        if jobs != 1:
+            for fragment in render_m11_sections(data, version_index, design_index, jobs, template):
+                writer.write(fragment)
+            return
+        for add_section in m11_sections(data, version_index, design_index):
+            add_section(doc)
+            writer.flush()
+
+
+def design_output_path(output_path: str, design_pair: tuple[int, int]) -> str:
+    """Per-design document path: protocol.docx -> protocol_v1_d2.docx."""
+    path = Path(output_path)
+    return str(path.with_name(f"{path.stem}_{design_label(*design_pair)}{path.suffix}"))
+
+
+def generate_study(
+    input_path: str, output_path: str, stream: bool = False, profile: bool = False,
+    cache_dir: Optional[str] = None, design_pair: tuple[int, int] = (0, 0),
+    index: Optional[UsdmIndex] = None, stream_docx: bool = False, section_jobs: Optional[int] = 1,
+    template: Optional[str] = None,
+) -> dict:
+    """Build and save the M11 document for one study design of a USDM file; batch work unit.
+
+    `design_pair` is the (version index, design index) to document, the
+    first design by default. `index` is the already loaded file, if the
+    caller has one. With `stream_docx`, the document is written section
+    by section (see write_m11_document). With `section_jobs` other than
+    1, its sections are rendered across that many worker processes
+    (None: CPU count; see render_m11_sections). `template` is a
+    pre-styled base .docx to build from. With `cache_dir`, a document
+    built earlier from an identical input file is copied from the cache
+    instead of being rebuilt.
+    """
+    with profiling(profile) as profiler:
+        cache = ResultCache(cache_dir) if cache_dir else None
+        entry = None
+        if cache:
+            request = cache.request(input_path, TOOL, __file__, design=list(design_pair),
+                                    template=file_digest(template) if template else None)
+            entry = cache.get(request)
+        if entry:
+            cache.restore(entry, {"protocol.docx": output_path})
+        else:
+            if index is None:
+                index = UsdmIndex(load_usdm(input_path, stream))
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            if stream_docx:
+                write_m11_document(index, output_path, *design_pair, jobs=section_jobs, template=template)
+            else:
+                doc = build_m11_document(index, *design_pair, jobs=section_jobs, template=template)
+
+                # Save
+                with profile_stage("save_docx"):
+                    doc.save(output_path)
+            if cache:
+                cache.put(request, files={"protocol.docx": output_path})
+    result = {"output": output_path, "cached": entry is not None}
+    if profiler:
+        result["profile"] = profiler.report()
+    return result
+
+
+def generate_designs(
+    input_path: str, output_path: str, stream: bool = False, profile: bool = False,
+    cache_dir: Optional[str] = None, jobs: Optional[int] = 1, executor: str = "process",
+    stream_docx: bool = False, section_jobs: Optional[int] = 1, template: Optional[str] = None,
+) -> dict:
+    """Build one M11 document per version/design pair of a USDM file.
+
+    Each pair is an independent work unit saved next to `output_path`
+    (see design_output_path). With `jobs` 1, or with thread workers, the
+    file is loaded once and shared by all pairs; process workers each
+    load it again.
+    """
+    with profiling(profile) as profiler:
+        index = UsdmIndex(load_usdm(input_path, stream))
+        pairs = list_design_pairs(index.data)
+    shared = index if jobs == 1 or executor == "thread" else None
+    items = [
+        (input_path, (design_output_path(output_path, pair), stream, profile, cache_dir, pair, shared,
+                      stream_docx, section_jobs, template))
+        for pair in pairs
+    ]
+    designs = run_batch(generate_study, items, jobs=jobs, executor=executor)
+    for (version_index, design_index), design in zip(pairs, designs):
+        design["version_index"] = version_index
+        design["design_index"] = design_index
+    result = {
+        "output": output_path,
+        "designs": designs,
+        "status": "ok" if all(d["status"] == "ok" for d in designs) else "error",
+    }
+    if result["status"] != "ok":
+        result["error"] = "; ".join(
+            f"{design_label(d['version_index'], d['design_index'])}: {d['error']}"
+            for d in designs if d["status"] != "ok"
+        )
+    if profiler:
+        result["profile"] = aggregate_profiles(
+            [profiler.report()] + [d["profile"] for d in designs if d.get("profile")]
+        )
+    return result
+
+
+def generate_m11(input_path: str, output_path: str, stream: bool = False,
+                 profile_path: Optional[str] = None, cache_dir: Optional[str] = None,
+                 all_designs: bool = False, jobs: int = 1, executor: str = "process",
+                 stream_docx: bool = False, section_jobs: Optional[int] = 1,
+                 template: Optional[str] = None) -> bool:
+    """Main generation function.
+
+    With `all_designs`, one document per version/design pair is written
+    (see generate_designs). With `stream_docx`, documents are written
+    section by section (see write_m11_document). With `section_jobs`
+    other than 1, sections are rendered in parallel (see
+    render_m11_sections). `template` is a pre-styled base .docx to
+    build from (see load_template). With `profile_path`, the per-stage
+    timing/allocation report is written there as JSON. Returns False if
+    any design failed.
+    """
+    if all_designs:
+        result = generate_designs(input_path, output_path, stream, bool(profile_path),
+                                  cache_dir, jobs, executor, stream_docx, section_jobs, template)
+        for design in result["designs"]:
+            label = design_label(design["version_index"], design["design_index"])
+            if design["status"] != "ok":
+                print(f"  ✗ {label}: {design['error']}")
+                continue
+            source = " (from cache)" if design["cached"] else ""
+            print(f"  ✓ {label}: M11 protocol document saved to: {design['output']}{source}")
+    else:
+        result = generate_study(input_path, output_path, stream, profile=bool(profile_path),
+                                cache_dir=cache_dir, stream_docx=stream_docx,
+                                section_jobs=section_jobs, template=template)
+        source = " (from cache)" if result["cached"] else ""
+        print(f"  ✓ M11 protocol document saved to: {output_path}{source}")
+    if profile_path:
+        write_json(dict(tool=TOOL, input=input_path, **result["profile"]), profile_path)
+        print(f"  Profile report saved to: {profile_path}")
+    return result.get("status", "ok") == "ok"
+
+
+def run_batch_generation(args) -> int:
+    """Generate M11 documents for every study matched by --input across a process pool."""
+    inputs = expand_inputs(args.input)
+    if not inputs:
+        print(f"ERROR: no USDM JSON files match '{args.input}'")
+        return 2
+
+    names = batch_output_names(inputs)
+    items = [
+        (path, (os.path.join(args.output, f"{names[path]}_m11.docx"), args.stream, bool(args.profile),
+                resolve_cache_dir(args.cache, args.cache_dir)))
+        for path in inputs
+    ]
+    # With --all-designs each study stays one work unit whose designs
+    # share the loaded file
+    worker = generate_designs if args.all_designs else generate_study
+    # Each worker process compiles the template once and reuses it for
+    # every study it is given (see load_template)
+    if args.stream_docx or args.section_jobs != 1 or args.template:
+        worker = functools.partial(worker, stream_docx=args.stream_docx,
+                                   section_jobs=args.section_jobs or None, template=args.template)
+
+    def report(entry: dict):
+        if entry["status"] != "ok":
+            print(f"  ✗ {entry['input']}: {entry['error']}")
+        elif "designs" in entry:
+            print(f"  ✓ {entry['input']} → {len(entry['designs'])} document(s) "
+                  f"next to {entry['output']}")
+        else:
+            cached = " (cached)" if entry["cached"] else ""
+            print(f"  ✓ {entry['input']} → {entry['output']}{cached}")
+
+    print(f"Generating M11 documents for {len(inputs)} stud(ies) "
+          f"with {args.jobs or os.cpu_count()} worker(s)")
+    results = run_batch(worker, items, jobs=args.jobs, on_result=report, executor=args.executor)
+
+    summary_path = args.summary or os.path.join(args.output, "m11_summary.json")
+    summary = write_batch_summary(results, summary_path, TOOL)
+    print(f"\n{summary['succeeded']} succeeded, {summary['failed']} failed")
+    print(f"Batch summary saved to: {summary_path}")
+    if args.profile:
+        write_json(summary.get("profile", {}), args.profile)
+        print(f"Profile report saved to: {args.profile}")
+    return 0 if summary["failed"] == 0 else 1
 
 
 def main():
     parser = argparse.ArgumentParser(
         description="Generate M11-compliant protocol document from USDM v4.0.0 JSON"
     )
-    parser.add_argument("--input", "-i", required=True, help="Path to USDM JSON file")
-    parser.add_argument("--output", "-o", required=True, help="Output .docx file path")
+    parser.add_argument("--input", "-i", required=True,
+                        help="Path to USDM JSON file, or a directory/glob for batch mode")
+    parser.add_argument("--output", "-o", required=True,
+                        help="Output .docx file path (batch mode: output directory)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream-parse the input, skipping sections the generator never reads "
+                             "(uses ijson when installed)")
+    parser.add_argument("--stream-docx", action="store_true",
+                        help="Write the document section by section instead of building it whole "
+                             "in memory (same output, lower peak memory)")
+    parser.add_argument("--template", metavar="BASE_DOCX",
+                        help="Pre-styled base .docx to build documents from; its styles, numbering "
+                             "and page setup are kept, its body content is dropped "
+                             "(default: built-in Arial 10pt base)")
+    parser.add_argument("--all-designs", action="store_true",
+                        help="Build one document per StudyVersion x StudyDesign pair, named "
+                             "<output>_v<N>_d<M>.docx (default: first design only)")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="Number of workers: studies in batch mode (default: CPU count), "
+                             "designs with --all-designs on a single file (default: 1)")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process",
+                        help="Worker pool type for --jobs (default: process)")
+    parser.add_argument("--section-jobs", type=int, default=1,
+                        help="Render the sections of each document across this many worker "
+                             "processes, 0 for the CPU count (default: 1, no section workers)")
+    parser.add_argument("--summary",
+                        help="Batch mode: aggregate summary path (default: <output>/m11_summary.json)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse the stored document when the input file is unchanged")
+    parser.add_argument("--cache-dir",
+                        help="Cache directory; implies --cache "
+                             "(default: $USDM_CACHE_DIR or ~/.cache/usdm-tools)")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="Write a per-stage timing/allocation report as JSON "
+                             "(batch mode: aggregated over all studies)")
     args = parser.parse_args()
-
-    generate_m11(args.input, args.output)
+    if args.template:
+        if not os.path.isfile(args.template):
+            parser.error(f"--template {args.template}: no such file")
+        try:
+            load_template(args.template)
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    if is_batch_input(args.input):
+        sys.exit(run_batch_generation(args))
+
+    ok = generate_m11(args.input, args.output, args.stream, args.profile,
+                      resolve_cache_dir(args.cache, args.cache_dir),
+                      args.all_designs, args.jobs or 1, args.executor, args.stream_docx,
+                      args.section_jobs or None, args.template)
+    sys.exit(0 if ok else 1)
 
 
 if __name__ == "__main__":
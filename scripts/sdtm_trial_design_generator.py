@@ -13,33 +13,70 @@ Usage:
     python sdtm_trial_design_generator.py \
         --input study_definition.json \
         --output-dir output/sdtm/
+
+    # Batch mode: every *.json in a directory (or a glob), in parallel
+    python sdtm_trial_design_generator.py \
+        --input studies/ --output-dir output/sdtm/ --jobs 8
 """
 
-import json
 import argparse
 import os
+import sys
+from itertools import repeat
 from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, NamedTuple, Optional, Union
 
-try:
+if TYPE_CHECKING:
     import pandas as pd
-except ImportError:
-    print("ERROR: pandas is required. Install with: pip install pandas")
-    raise
 
 from usdm_utils import (
+    UsdmIndex,
+    split_index,
+    load_usdm_file,
+    write_json,
+    GENERATOR_SKIP_SECTIONS,
+    profiled,
+    profile_stage,
+    profiling,
+    is_batch_input,
+    expand_inputs,
+    batch_output_names,
+    run_batch,
+    write_batch_summary,
     get_version_and_design,
+    list_design_pairs,
+    design_label,
+    aggregate_profiles,
+    build_cell_matrix,
     sort_linked_list,
     get_study_id,
     get_study_title,
-    get_criterion_text,
+    resolve_criteria_text,
     get_enrollment_number,
 )
+from usdm_cache import ResultCache, resolve_cache_dir
+import sdtm_writers
+from sdtm_writers import WRITERS, output_path
+
+TOOL = "sdtm_trial_design_generator"
+
+# Anything the generate_* functions accept: a raw USDM dict, a UsdmIndex
+# or a prebuilt TrialDesignContext
+StudySource = Union[dict, UsdmIndex, "TrialDesignContext"]
+
+# What the generate_* functions return: a DataFrame by default, the
+# pandas-free ColumnarTable with dataframe=False
+Dataset = Union["pd.DataFrame", "ColumnarTable"]
 
 
-def load_usdm(path: str) -> dict:
-    """Load and return USDM JSON."""
-    with open(path) as f:
-        return json.load(f)
+def load_usdm(path: str, stream: bool = False) -> dict:
+    """Load USDM JSON.
+
+    With `stream`, sections this generator never reads (narrative content,
+    biomedical concepts, ...) are skipped while parsing; see
+    usdm_utils.load_usdm_file.
+    """
+    return load_usdm_file(path, GENERATOR_SKIP_SECTIONS if stream else ())
 
 
 def make_code(name: str, max_len: int) -> str:
@@ -47,136 +84,374 @@ def make_code(name: str, max_len: int) -> str:
     return name.upper().replace(" ", "").replace("-", "").replace("/", "")[:max_len]
 
 
-def generate_ta(data: dict) -> pd.DataFrame:
-    """Generate TA (Trial Arms) domain."""
-    version, design = get_version_and_design(data)
-    study_id = get_study_id(version)
+class Variable(NamedTuple):
+    """One SDTM variable of a domain schema.
+
+    `type` is the SDTM type ("Char" or "Num") and `label` the variable
+    label, as written to define.xml/XPT. `length` is the SDTM maximum
+    length of a Char variable when it is below the 200-byte XPT limit
+    (codes such as ETCD). `categorical` marks character variables whose
+    values repeat across rows (STUDYID, DOMAIN, arm, element and epoch
+    names, ...); they become categoricals in DataFrame output built with
+    categorical=True and are dictionary-encoded in Parquet. `split`
+    marks variables whose longer values continue in NAME1..NAMEn in XPT
+    output (TSVAL).
+    """
+    name: str
+    type: str
+    label: str
+    length: Optional[int] = None
+    categorical: bool = False
+    split: bool = False
+
+
+# Column order, types and labels of each Trial Design domain (SDTMIG 3.4)
+DOMAIN_SCHEMAS: dict[str, list[Variable]] = {
+    "ta": [
+        Variable("STUDYID", "Char", "Study Identifier", categorical=True),
+        Variable("DOMAIN", "Char", "Domain Abbreviation", categorical=True),
+        Variable("ARMCD", "Char", "Planned Arm Code", 20, categorical=True),
+        Variable("ARM", "Char", "Description of Planned Arm", categorical=True),
+        Variable("TAETORD", "Num", "Planned Order of Element within Arm"),
+        Variable("ETCD", "Char", "Element Code", 8, categorical=True),
+        Variable("ELEMENT", "Char", "Description of Element", categorical=True),
+        Variable("TABRANCH", "Char", "Branch"),
+        Variable("TATRANS", "Char", "Transition Rule"),
+        Variable("EPOCH", "Char", "Epoch", categorical=True),
+    ],
+    "te": [
+        Variable("STUDYID", "Char", "Study Identifier", categorical=True),
+        Variable("DOMAIN", "Char", "Domain Abbreviation", categorical=True),
+        Variable("ETCD", "Char", "Element Code", 8),
+        Variable("ELEMENT", "Char", "Description of Element"),
+        Variable("TESTRL", "Char", "Rule for Start of Element"),
+        Variable("TEENRL", "Char", "Rule for End of Element"),
+        Variable("TEDUR", "Char", "Planned Duration of Element"),
+    ],
+    "ti": [
+        Variable("STUDYID", "Char", "Study Identifier", categorical=True),
+        Variable("DOMAIN", "Char", "Domain Abbreviation", categorical=True),
+        Variable("IETESTCD", "Char", "Incl/Excl Criterion Short Name", 8),
+        Variable("IETEST", "Char", "Inclusion/Exclusion Criterion"),
+        Variable("IECAT", "Char", "Inclusion/Exclusion Category", categorical=True),
+        Variable("IESCAT", "Char", "Inclusion/Exclusion Subcategory"),
+        Variable("TIRL", "Char", "Criterion Rule"),
+        Variable("TIVERS", "Char", "Protocol Criteria Versions"),
+    ],
+    "tv": [
+        Variable("STUDYID", "Char", "Study Identifier", categorical=True),
+        Variable("DOMAIN", "Char", "Domain Abbreviation", categorical=True),
+        Variable("VISITNUM", "Num", "Visit Number"),
+        Variable("VISIT", "Char", "Visit Name"),
+        Variable("VISITDY", "Num", "Planned Study Day of Visit"),
+        Variable("ARMCD", "Char", "Planned Arm Code", 20, categorical=True),
+        Variable("ARM", "Char", "Description of Planned Arm", categorical=True),
+        Variable("TVSTRL", "Char", "Visit Start Rule"),
+        Variable("TVENRL", "Char", "Visit End Rule"),
+    ],
+    "ts": [
+        Variable("STUDYID", "Char", "Study Identifier", categorical=True),
+        Variable("DOMAIN", "Char", "Domain Abbreviation", categorical=True),
+        Variable("TSSEQ", "Num", "Sequence Number"),
+        Variable("TSGRPID", "Char", "Group ID"),
+        Variable("TSPARMCD", "Char", "Trial Summary Parameter Short Name", 8),
+        Variable("TSPARM", "Char", "Trial Summary Parameter"),
+        Variable("TSVAL", "Char", "Parameter Value", split=True),
+        Variable("TSVALNF", "Char", "Parameter Null Flavor"),
+        Variable("TSVALCD", "Char", "Parameter Value Code"),
+        Variable("TSVCDREF", "Char", "Name of the Reference Terminology"),
+        Variable("TSVCDVER", "Char", "Version of the Reference Terminology"),
+    ],
+}
+
+
+DOMAIN_LABELS = {
+    "ta": "Trial Arms",
+    "te": "Trial Elements",
+    "ti": "Trial Inclusion/Exclusion Criteria",
+    "tv": "Trial Visits",
+    "ts": "Trial Summary",
+}
+
+
+def _import_pandas():
+    """Import pandas on first use; only DataFrame output needs it."""
+    try:
+        import pandas
+    except ImportError:
+        print("ERROR: pandas is required for DataFrame output. Install with: pip install pandas")
+        raise
+    return pandas
+
+
+class ColumnarTable:
+    """A domain dataset held column-wise, following DOMAIN_SCHEMAS.
+
+    Each column is either a list of `n_rows` values or a single value
+    shared by every row (STUDYID, DOMAIN, empty rule columns), which is
+    stored once. Empty Char values are "" and empty Num values None.
+    The writers stream `rows()`; `to_pandas()` builds a DataFrame only
+    when one is asked for.
+    """
+
+    def __init__(self, domain: str, n_rows: int, columns: dict):
+        self.domain = domain
+        self.label = DOMAIN_LABELS[domain]
+        self.variables = DOMAIN_SCHEMAS[domain]
+        self.n_rows = n_rows
+        self.columns = {}
+        for var in self.variables:
+            values = columns.get(var.name)
+            if isinstance(values, list):
+                if len(values) != n_rows:
+                    raise ValueError(
+                        f"{domain.upper()}.{var.name}: {len(values)} values for {n_rows} rows"
+                    )
+            elif values is None or values == "":
+                values = None if var.type == "Num" else ""
+            self.columns[var.name] = values
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    @property
+    def names(self) -> list[str]:
+        return [var.name for var in self.variables]
+
+    def is_constant(self, name: str) -> bool:
+        return not isinstance(self.columns[name], list)
+
+    def column(self, name: str) -> list:
+        values = self.columns[name]
+        return list(values) if isinstance(values, list) else [values] * self.n_rows
+
+    def rows(self) -> Iterator[tuple]:
+        """Iterate the rows as tuples in schema order."""
+        return zip(*(
+            values if isinstance(values, list) else repeat(values, self.n_rows)
+            for values in self.columns.values()
+        ))
+
+    @profiled("dataframe")
+    def to_pandas(self, categorical: bool = False) -> "pd.DataFrame":
+        """Convert to a pandas DataFrame (imports pandas on first use).
+
+        Num variables become int64 (float64 when empty) and Char
+        variables object columns, so no dtype inference is involved.
+        With `categorical`, the schema's `categorical` variables become
+        categoricals instead; a Categorical costs a few hundred
+        microseconds and kilobytes per column to build, which pays for
+        itself on large tables (SoA-driven TV, long TI) but not on small
+        ones.
+        """
+        pd = _import_pandas()
+        import numpy as np  # a pandas dependency
+        data = {}
+        n_rows = self.n_rows
+        for var in self.variables:
+            values = self.columns[var.name]
+            constant = not isinstance(values, list)
+            if var.type == "Num":
+                if values is None:
+                    data[var.name] = np.full(n_rows, np.nan)
+                else:
+                    data[var.name] = np.array(self.column(var.name), dtype=np.int64)
+            elif categorical and var.categorical:
+                if constant:
+                    data[var.name] = pd.Categorical.from_codes(
+                        np.zeros(n_rows, dtype=np.int8), categories=[values]
+                    )
+                else:
+                    data[var.name] = pd.Categorical(values)
+            elif constant:
+                data[var.name] = np.full(n_rows, values, dtype=object)
+            else:
+                data[var.name] = np.array(values, dtype=object)
+        return pd.DataFrame(data, copy=False)
+
+
+def build_dataset(domain: str, n_rows: int, columns: dict, dataframe: bool = True,
+                  categorical: bool = False):
+    """Assemble a domain dataset from column arrays.
+
+    `columns` maps variable names to a list of `n_rows` values or to a
+    single value shared by every row; variables missing from it are left
+    empty. Returns a DataFrame (see ColumnarTable.to_pandas for
+    `categorical`), or the ColumnarTable itself when `dataframe` is
+    False.
+    """
+    table = ColumnarTable(domain, n_rows, columns)
+    return table.to_pandas(categorical) if dataframe else table
+
+
+class TrialDesignContext:
+    """Study data shared by all SDTM Trial Design domain generators.
+
+    Computed once per study design (navigation, sorting, lookups and
+    criterion text resolution) and consumed by every generate_* function,
+    so producing all five domains does not re-derive the same data. The
+    first StudyDesign of the first StudyVersion is used unless
+    `version_index`/`design_index` select another one.
+
+    Attributes:
+        version, design: The StudyVersion and StudyDesign
+        index: The UsdmIndex, if one was supplied
+        study_id: Sponsor study identifier (STUDYID)
+        arms: design.arms (or legacy studyArms)
+        epochs: Epochs in linked-list order
+        encounters: Encounters in linked-list order
+        elements: design.elements (or legacy studyElements)
+        element_map: element id -> element
+        cell_matrix: (armId, epochId) -> StudyCells
+        criteria: design.eligibilityCriteria in linked-list order
+        criterion_texts: Resolved plain text, parallel to `criteria`
+    """
+
+    def __init__(self, data: Union[dict, UsdmIndex], version_index: int = 0, design_index: int = 0):
+        data, index = split_index(data)
+        self.data = data
+        self.index = index
+        self.version, self.design = get_version_and_design(data, version_index, design_index)
+        version, design = self.version, self.design
+
+        self.study_id = get_study_id(version, index=index)
+        self.arms = design.get("arms", design.get("studyArms", []))
+        self.epochs = sort_linked_list(design.get("epochs", design.get("studyEpochs", [])), index)
+        self.encounters = sort_linked_list(design.get("encounters", []), index)
+        self.elements = design.get("elements", design.get("studyElements", []))
+        self.element_map = {e["id"]: e for e in self.elements}
+        if index is not None:
+            self.cell_matrix = index.cell_matrix(design)
+        else:
+            self.cell_matrix = build_cell_matrix(design.get("studyCells", []))
+
+        # Resolve all criterion texts via criterionItemId in one pass
+        self.criteria = sort_linked_list(design.get("eligibilityCriteria", []), index)
+        self.criterion_texts = resolve_criteria_text(
+            self.criteria, version.get("eligibilityCriterionItems", []), index
+        )
 
-    arms = design.get("arms", design.get("studyArms", []))
-    epochs = sort_linked_list(design.get("epochs", design.get("studyEpochs", [])))
-    cells = design.get("studyCells", [])
-    elements = {e["id"]: e for e in design.get("elements", design.get("studyElements", []))}
 
-    rows = []
-    for arm in arms:
+def as_context(
+    source: Union[dict, UsdmIndex, TrialDesignContext], version_index: int = 0, design_index: int = 0
+) -> TrialDesignContext:
+    """Return `source` if it is already a TrialDesignContext, else build one
+    for the selected version/design."""
+    if isinstance(source, TrialDesignContext):
+        return source
+    with profile_stage("context"):
+        return TrialDesignContext(source, version_index, design_index)
+
+
+@profiled()
+def generate_ta(data: StudySource, dataframe: bool = True, categorical: bool = False) -> Dataset:
+    """Generate TA (Trial Arms) domain."""
+    ctx = as_context(data)
+    study_id = ctx.study_id
+    epochs = ctx.epochs
+    cell_matrix = ctx.cell_matrix
+    elements = ctx.element_map
+
+    armcd, arm_label, taetord, etcd, element, epoch_label = [], [], [], [], [], []
+    for arm in ctx.arms:
         arm_id = arm["id"]
-        taetord = 0
+        code = make_code(arm.get("name", ""), 20)
+        label = arm.get("label", arm.get("name", ""))
+        order = 0
         for epoch in epochs:
             epoch_id = epoch["id"]
-            matching_cells = [
-                c for c in cells
-                if c.get("armId") == arm_id and c.get("epochId") == epoch_id
-            ]
-            for cell in matching_cells:
+            for cell in cell_matrix.get((arm_id, epoch_id), []):
                 for elem_id in cell.get("elementIds", []):
                     elem = elements.get(elem_id, {})
-                    taetord += 1
-                    rows.append({
-                        "STUDYID": study_id,
-                        "DOMAIN": "TA",
-                        "ARMCD": make_code(arm.get("name", ""), 20),
-                        "ARM": arm.get("label", arm.get("name", "")),
-                        "TAETORD": taetord,
-                        "ETCD": make_code(elem.get("name", ""), 8),
-                        "ELEMENT": elem.get("label", elem.get("name", "")),
-                        "TABRANCH": "",
-                        "TATRANS": "",
-                        "EPOCH": epoch.get("label", epoch.get("name", "")),
-                    })
-
-    return pd.DataFrame(rows)
-
-
-def generate_te(data: dict) -> pd.DataFrame:
+                    order += 1
+                    armcd.append(code)
+                    arm_label.append(label)
+                    taetord.append(order)
+                    etcd.append(make_code(elem.get("name", ""), 8))
+                    element.append(elem.get("label", elem.get("name", "")))
+                    epoch_label.append(epoch.get("label", epoch.get("name", "")))
+
+    return build_dataset("ta", len(taetord), {
+        "STUDYID": study_id,
+        "DOMAIN": "TA",
+        "ARMCD": armcd,
+        "ARM": arm_label,
+        "TAETORD": taetord,
+        "ETCD": etcd,
+        "ELEMENT": element,
+        "EPOCH": epoch_label,
+    }, dataframe, categorical)
+
+
+@profiled()
+def generate_te(data: StudySource, dataframe: bool = True, categorical: bool = False) -> Dataset:
     """Generate TE (Trial Elements) domain."""
-    version, design = get_version_and_design(data)
-    study_id = get_study_id(version)
-
-    elements = design.get("elements", design.get("studyElements", []))
-
-    rows = []
-    for elem in elements:
-        rows.append({
-            "STUDYID": study_id,
-            "DOMAIN": "TE",
-            "ETCD": make_code(elem.get("name", ""), 8),
-            "ELEMENT": elem.get("label", elem.get("name", "")),
-            "TESTRL": "",
-            "TEENRL": "",
-            "TEDUR": "",
-        })
+    ctx = as_context(data)
+    study_id = ctx.study_id
 
-    return pd.DataFrame(rows)
+    elements = ctx.elements
+    return build_dataset("te", len(elements), {
+        "STUDYID": study_id,
+        "DOMAIN": "TE",
+        "ETCD": [make_code(elem.get("name", ""), 8) for elem in elements],
+        "ELEMENT": [elem.get("label", elem.get("name", "")) for elem in elements],
+    }, dataframe, categorical)
 
 
-def generate_ti(data: dict) -> pd.DataFrame:
+@profiled()
+def generate_ti(data: StudySource, dataframe: bool = True, categorical: bool = False) -> Dataset:
     """Generate TI (Trial Inclusion/Exclusion) domain."""
-    version, design = get_version_and_design(data)
-    study_id = get_study_id(version)
+    ctx = as_context(data)
+    study_id = ctx.study_id
 
-    criteria = design.get("eligibilityCriteria", [])
-    criterion_items = version.get("eligibilityCriterionItems", [])
-
-    rows = []
+    ietestcd, ietest, iecat = [], [], []
     inc_num = 0
     exc_num = 0
 
-    for c in criteria:
+    # Criterion text was resolved via criterionItemId when building the context
+    for c, text in zip(ctx.criteria, ctx.criterion_texts):
         category = c.get("category", {}).get("decode", "")
         if "inclusion" in category.lower():
             inc_num += 1
-            ietestcd = f"IN{inc_num:02d}"
-            iecat = "INCLUSION"
+            ietestcd.append(f"IN{inc_num:02d}")
+            iecat.append("INCLUSION")
         else:
             exc_num += 1
-            ietestcd = f"EX{exc_num:02d}"
-            iecat = "EXCLUSION"
-
-        # Resolve criterion text via criterionItemId if available
-        text = get_criterion_text(c, criterion_items)
-
-        rows.append({
-            "STUDYID": study_id,
-            "DOMAIN": "TI",
-            "IETESTCD": ietestcd,
-            "IETEST": text,
-            "IECAT": iecat,
-            "IESCAT": "",
-            "TIRL": "",
-            "TIVERS": "1",
-        })
-
-    return pd.DataFrame(rows)
-
-
-def generate_tv(data: dict) -> pd.DataFrame:
+            ietestcd.append(f"EX{exc_num:02d}")
+            iecat.append("EXCLUSION")
+        ietest.append(text)
+
+    return build_dataset("ti", len(ietestcd), {
+        "STUDYID": study_id,
+        "DOMAIN": "TI",
+        "IETESTCD": ietestcd,
+        "IETEST": ietest,
+        "IECAT": iecat,
+        "TIVERS": "1",
+    }, dataframe, categorical)
+
+
+@profiled()
+def generate_tv(data: StudySource, dataframe: bool = True, categorical: bool = False) -> Dataset:
     """Generate TV (Trial Visits) domain."""
-    version, design = get_version_and_design(data)
-    study_id = get_study_id(version)
-
-    encounters = sort_linked_list(design.get("encounters", []))
+    ctx = as_context(data)
+    study_id = ctx.study_id
 
-    rows = []
-    for i, enc in enumerate(encounters, 1):
-        rows.append({
-            "STUDYID": study_id,
-            "DOMAIN": "TV",
-            "VISITNUM": i,
-            "VISIT": enc.get("label", enc.get("name", "")),
-            "VISITDY": "",
-            "ARMCD": "",
-            "ARM": "",
-            "TVSTRL": "",
-            "TVENRL": "",
-        })
+    encounters = ctx.encounters
+    return build_dataset("tv", len(encounters), {
+        "STUDYID": study_id,
+        "DOMAIN": "TV",
+        "VISITNUM": list(range(1, len(encounters) + 1)),
+        "VISIT": [enc.get("label", enc.get("name", "")) for enc in encounters],
+    }, dataframe, categorical)
 
-    return pd.DataFrame(rows)
 
-
-def generate_ts(data: dict) -> pd.DataFrame:
+@profiled()
+def generate_ts(data: StudySource, dataframe: bool = True, categorical: bool = False) -> Dataset:
     """Generate TS (Trial Summary) domain."""
-    version, design = get_version_and_design(data)
-    study_id = get_study_id(version)
+    ctx = as_context(data)
+    version, design = ctx.version, ctx.design
+    study_id = ctx.study_id
 
     # Title from version.titles[]
     title = get_study_title(version)
@@ -189,8 +464,7 @@ def generate_ts(data: dict) -> pd.DataFrame:
     int_model = model.get("decode", "") if isinstance(model, dict) else ""
 
     # Arms count
-    arms = design.get("arms", design.get("studyArms", []))
-    num_arms = len(arms)
+    num_arms = len(ctx.arms)
 
     # Planned enrollment from design.population (singular)
     planned_enrollment = get_enrollment_number(design)
@@ -217,52 +491,288 @@ def generate_ts(data: dict) -> pd.DataFrame:
         ("BLIND", blinding_text, "Blinding Schema"),
     ]
 
-    rows = []
-    for seq, (tsparmcd, tsval, tsparm) in enumerate(params, 1):
-        rows.append({
-            "STUDYID": study_id,
-            "DOMAIN": "TS",
-            "TSSEQ": seq,
-            "TSGRPID": "",
-            "TSPARMCD": tsparmcd,
-            "TSPARM": tsparm,
-            "TSVAL": tsval,
-            "TSVALNF": "",
-            "TSVALCD": "",
-            "TSVCDREF": "",
-            "TSVCDVER": "",
-        })
-
-    return pd.DataFrame(rows)
+    tsparmcd, tsval, tsparm = (list(column) for column in zip(*params))
+    return build_dataset("ts", len(params), {
+        "STUDYID": study_id,
+        "DOMAIN": "TS",
+        "TSSEQ": list(range(1, len(params) + 1)),
+        "TSPARMCD": tsparmcd,
+        "TSPARM": tsparm,
+        "TSVAL": tsval,
+    }, dataframe, categorical)
+
+
+GENERATORS = {
+    "ta": generate_ta,
+    "te": generate_te,
+    "ti": generate_ti,
+    "tv": generate_tv,
+    "ts": generate_ts,
+}
+
+
+@profiled()
+def generate_all(
+    data: StudySource, domains: list[str] = None, dataframe: bool = True, categorical: bool = False
+) -> dict[str, Dataset]:
+    """Generate all (or the selected) domains from one shared TrialDesignContext.
+
+    Returns DataFrames, with the schema's categorical variables as
+    categoricals when `categorical` is set, or ColumnarTables (no pandas
+    needed) when `dataframe` is False.
+    """
+    ctx = as_context(data)
+    return {
+        domain: gen_func(ctx, dataframe, categorical)
+        for domain, gen_func in GENERATORS.items()
+        if domains is None or domain in domains
+    }
+
+
+def parse_formats(fmt: str) -> list[str]:
+    """Split a comma-separated format list ("csv,xpt") and check each format."""
+    formats = [f.strip().lower() for f in fmt.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in WRITERS]
+    if unknown or not formats:
+        raise ValueError(f"Unknown output format(s) '{fmt}'; choose from {', '.join(WRITERS)}")
+    return formats
+
+
+def write_datasets(data: StudySource, output_dir: str, fmt: str = "csv") -> dict[str, dict]:
+    """Generate all five domains and write them to `output_dir`.
+
+    `fmt` is one format or a comma-separated list ("csv,xpt,json"); each
+    domain is generated once and handed to every format's writer (see
+    sdtm_writers.WRITERS).
+
+    Returns:
+        domain -> {"paths": output paths, "rows": row count,
+                   "warnings": values shortened or split to fit a format}
+    """
+    formats = parse_formats(fmt)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Build the shared context once and derive every domain from it;
+    # the writers stream the column tables, so pandas is never loaded
+    datasets = generate_all(as_context(data), dataframe=False)
+
+    written = {}
+    for domain, table in datasets.items():
+        paths, warnings = [], []
+        for name in formats:
+            path = output_path(output_dir, domain, name)
+            with profile_stage(f"write_{name}"):
+                warnings.extend(WRITERS[name].write(table, path))
+            paths.append(path)
+        written[domain] = {"paths": paths, "rows": len(table), "warnings": warnings}
+    return written
+
+
+def generate_study(
+    input_path: str, output_dir: str, fmt: str = "csv", stream: bool = False, profile: bool = False,
+    cache_dir: Optional[str] = None, design_pair: tuple[int, int] = (0, 0),
+    index: Optional[UsdmIndex] = None,
+) -> dict:
+    """Generate the datasets for one study design of a USDM file; batch work unit.
+
+    `design_pair` is the (version index, design index) to generate, the
+    first design by default. `index` is the already loaded file, if the
+    caller has one. With `cache_dir`, datasets generated earlier from an
+    identical input file are copied from the cache instead of being
+    regenerated.
+    """
+    with profiling(profile) as profiler:
+        cache = ResultCache(cache_dir) if cache_dir else None
+        entry = None
+        if cache:
+            request = cache.request(input_path, TOOL, [__file__, sdtm_writers.__file__],
+                                    format=",".join(parse_formats(fmt)), design=list(design_pair))
+            entry = cache.get(request)
+        if entry:
+            cache.restore(entry, {name: os.path.join(output_dir, name) for name in entry["files"]})
+            rows = entry["result"]["rows"]
+            warnings = entry["result"].get("warnings", [])
+        else:
+            if index is None:
+                index = UsdmIndex(load_usdm(input_path, stream))
+            written = write_datasets(as_context(index, *design_pair), output_dir, fmt)
+            rows = {domain: w["rows"] for domain, w in written.items()}
+            warnings = [warning for w in written.values() for warning in w["warnings"]]
+            if cache:
+                files = {os.path.basename(path): path for w in written.values() for path in w["paths"]}
+                cache.put(request, files=files, result={"rows": rows, "warnings": warnings})
+    result = {
+        "output_dir": output_dir,
+        "rows": rows,
+        "cached": entry is not None,
+    }
+    if warnings:
+        result["warnings"] = warnings
+    if profiler:
+        result["profile"] = profiler.report()
+    return result
+
+
+def generate_designs(
+    input_path: str, output_dir: str, fmt: str = "csv", stream: bool = False, profile: bool = False,
+    cache_dir: Optional[str] = None, jobs: Optional[int] = 1, executor: str = "process",
+) -> dict:
+    """Generate the datasets for every version/design pair of a USDM file.
+
+    Each pair is an independent work unit written to its own
+    ``<output_dir>/v<N>_d<M>/`` directory. With `jobs` 1, or with thread
+    workers, the file is loaded once and shared by all pairs; process
+    workers each load it again.
+    """
+    with profiling(profile) as profiler:
+        index = UsdmIndex(load_usdm(input_path, stream))
+        pairs = list_design_pairs(index.data)
+    shared = index if jobs == 1 or executor == "thread" else None
+    items = [
+        (input_path, (os.path.join(output_dir, design_label(*pair)), fmt, stream, profile,
+                      cache_dir, pair, shared))
+        for pair in pairs
+    ]
+    designs = run_batch(generate_study, items, jobs=jobs, executor=executor)
+    for (version_index, design_index), design in zip(pairs, designs):
+        design["version_index"] = version_index
+        design["design_index"] = design_index
+    result = {
+        "output_dir": output_dir,
+        "designs": designs,
+        "status": "ok" if all(d["status"] == "ok" for d in designs) else "error",
+    }
+    if result["status"] != "ok":
+        result["error"] = "; ".join(
+            f"{design_label(d['version_index'], d['design_index'])}: {d['error']}"
+            for d in designs if d["status"] != "ok"
+        )
+    if profiler:
+        result["profile"] = aggregate_profiles(
+            [profiler.report()] + [d["profile"] for d in designs if d.get("profile")]
+        )
+    return result
+
+
+def run_batch_generation(args) -> int:
+    """Generate datasets for every study matched by --input across a process pool."""
+    inputs = expand_inputs(args.input)
+    if not inputs:
+        print(f"ERROR: no USDM JSON files match '{args.input}'")
+        return 2
+
+    names = batch_output_names(inputs)
+    items = [
+        (path, (os.path.join(args.output_dir, names[path]), args.format, args.stream, bool(args.profile),
+                resolve_cache_dir(args.cache, args.cache_dir)))
+        for path in inputs
+    ]
+    # With --all-designs each study stays one work unit whose designs
+    # share the loaded file
+    worker = generate_designs if args.all_designs else generate_study
+
+    def report(entry: dict):
+        if entry["status"] != "ok":
+            print(f"  ✗ {entry['input']}: {entry['error']}")
+        elif "designs" in entry:
+            print(f"  ✓ {entry['input']} → {entry['output_dir']} ({len(entry['designs'])} design(s))")
+        else:
+            counts = ", ".join(f"{d.upper()} {n}" for d, n in entry["rows"].items())
+            cached = ", cached" if entry["cached"] else ""
+            print(f"  ✓ {entry['input']} → {entry['output_dir']} ({counts}{cached})")
+        for warning in entry.get("warnings", []):
+            print(f"    WARNING: {warning}")
+
+    print(f"Generating SDTM datasets for {len(inputs)} stud(ies) "
+          f"with {args.jobs or os.cpu_count()} worker(s)")
+    results = run_batch(worker, items, jobs=args.jobs, on_result=report, executor=args.executor)
+
+    summary_path = args.summary or os.path.join(args.output_dir, "sdtm_summary.json")
+    summary = write_batch_summary(results, summary_path, TOOL)
+    print(f"\n{summary['succeeded']} succeeded, {summary['failed']} failed")
+    print(f"Batch summary saved to: {summary_path}")
+    if args.profile:
+        write_json(summary.get("profile", {}), args.profile)
+        print(f"Profile report saved to: {args.profile}")
+    return 0 if summary["failed"] == 0 else 1
 
 
 def main():
     parser = argparse.ArgumentParser(
         description="Generate SDTM Trial Design datasets from USDM v4.0.0 JSON"
     )
-    parser.add_argument("--input", "-i", required=True, help="Path to USDM JSON file")
-    parser.add_argument("--output-dir", "-o", required=True, help="Output directory for CSV files")
-    parser.add_argument("--format", "-f", default="csv", choices=["csv"], help="Output format")
+    parser.add_argument("--input", "-i", required=True,
+                        help="Path to USDM JSON file, or a directory/glob for batch mode")
+    parser.add_argument("--output-dir", "-o", required=True,
+                        help="Output directory for the datasets (batch mode: one subdirectory per study)")
+    parser.add_argument("--format", "-f", default="csv",
+                        help=f"Output format, or a comma-separated list written in one pass "
+                             f"(choices: {', '.join(WRITERS)}; parquet needs pyarrow)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream-parse the input, skipping sections the generator never reads "
+                             "(uses ijson when installed)")
+    parser.add_argument("--all-designs", action="store_true",
+                        help="Generate every StudyVersion x StudyDesign pair, each into its own "
+                             "<output-dir>/v<N>_d<M>/ subdirectory (default: first design only)")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="Number of workers: studies in batch mode (default: CPU count), "
+                             "designs with --all-designs on a single file (default: 1)")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process",
+                        help="Worker pool type for --jobs (default: process)")
+    parser.add_argument("--summary",
+                        help="Batch mode: aggregate summary path (default: <output-dir>/sdtm_summary.json)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse stored datasets when the input file is unchanged")
+    parser.add_argument("--cache-dir",
+                        help="Cache directory; implies --cache "
+                             "(default: $USDM_CACHE_DIR or ~/.cache/usdm-tools)")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="Write a per-stage timing/allocation report as JSON "
+                             "(batch mode: aggregated over all studies)")
     args = parser.parse_args()
-
-    data = load_usdm(args.input)
-    os.makedirs(args.output_dir, exist_ok=True)
-
-    generators = {
-        "ta": generate_ta,
-        "te": generate_te,
-        "ti": generate_ti,
-        "tv": generate_tv,
-        "ts": generate_ts,
-    }
-
-    for domain, gen_func in generators.items():
-        df = gen_func(data)
-        output_path = os.path.join(args.output_dir, f"{domain}.csv")
-        df.to_csv(output_path, index=False)
-        print(f"  ✓ {domain.upper()} → {output_path} ({len(df)} rows)")
-
-    print(f"\nAll SDTM Trial Design datasets written to {args.output_dir}")
+    try:
+        formats = parse_formats(args.format)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if "parquet" in formats and sdtm_writers.pa is None:
+        parser.error("pyarrow is required for --format parquet. Install with: pip install pyarrow")
+
+    if is_batch_input(args.input):
+        sys.exit(run_batch_generation(args))
+
+    cache_dir = resolve_cache_dir(args.cache, args.cache_dir)
+    if args.all_designs:
+        result = generate_designs(args.input, args.output_dir, args.format, args.stream,
+                                  bool(args.profile), cache_dir, args.jobs or 1, args.executor)
+        for design in result["designs"]:
+            label = design_label(design["version_index"], design["design_index"])
+            if design["status"] != "ok":
+                print(f"  ✗ {label}: {design['error']}")
+                continue
+            counts = ", ".join(f"{d.upper()} {n}" for d, n in design["rows"].items())
+            cached = ", cached" if design["cached"] else ""
+            print(f"  ✓ {label} → {design['output_dir']} ({counts}{cached})")
+            for warning in design.get("warnings", []):
+                print(f"    WARNING: {warning}")
+        print(f"\nSDTM Trial Design datasets for {len(result['designs'])} design(s) "
+              f"written to {args.output_dir}")
+    else:
+        result = generate_study(args.input, args.output_dir, args.format, args.stream,
+                                profile=bool(args.profile), cache_dir=cache_dir)
+
+        for domain, rows in result["rows"].items():
+            paths = ", ".join(output_path(args.output_dir, domain, f) for f in formats)
+            print(f"  ✓ {domain.upper()} → {paths} ({rows} rows)")
+        for warning in result.get("warnings", []):
+            print(f"  WARNING: {warning}")
+
+        source = " (from cache)" if result["cached"] else ""
+        print(f"\nAll SDTM Trial Design datasets written to {args.output_dir}{source}")
+    if args.profile:
+        write_json(dict(tool=TOOL, input=args.input, **result["profile"]), args.profile)
+        print(f"Profile report saved to: {args.profile}")
+    if result.get("status", "ok") != "ok":
+        sys.exit(1)
 
 
 if __name__ == "__main__":
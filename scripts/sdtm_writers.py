@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+SDTM Dataset Writers
+
+Writers for the column tables built by sdtm_trial_design_generator
+(ColumnarTable): CSV, SAS XPORT v5 (.xpt), Parquet and CDISC
+Dataset-JSON v1.1. Every writer streams the table's rows (or its
+columns, for Parquet) straight to disk; nothing is converted through
+pandas or an intermediate CSV file.
+
+Writers are registered by format name in WRITERS. A writer is called as
+``writer(table, path)`` and returns a list of warnings (values that had
+to be shortened or split to fit the format). Additional formats can be
+plugged in with the register_writer decorator:
+
+    @register_writer("sas7bdat", "sas7bdat")
+    def write_sas7bdat(table, path) -> list[str]:
+        ...
+
+Parquet output requires pyarrow (pip install pyarrow).
+"""
+
+import csv
+import math
+import os
+import platform
+import struct
+from datetime import datetime
+from itertools import repeat
+from typing import Callable, NamedTuple
+
+from usdm_utils import __version__, json_dumps
+
+try:
+    import pyarrow as pa  # optional: Parquet output
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# SAS XPORT v5 limits: character values, variable names, labels
+XPT_CHAR_LIMIT = 200
+XPT_NAME_LIMIT = 8
+XPT_LABEL_LIMIT = 40
+
+DATASET_JSON_VERSION = "1.1.0"
+
+
+class DatasetWriter(NamedTuple):
+    extension: str
+    write: Callable
+
+
+WRITERS: dict[str, DatasetWriter] = {}
+
+
+def register_writer(fmt: str, extension: str):
+    """Decorator registering `writer(table, path) -> list[str]` for a format."""
+    def decorator(func: Callable) -> Callable:
+        WRITERS[fmt] = DatasetWriter(extension, func)
+        return func
+    return decorator
+
+
+def output_path(output_dir: str, domain: str, fmt: str) -> str:
+    """Path of `domain`'s dataset in format `fmt`, e.g. ``<dir>/ta.xpt``."""
+    return os.path.join(output_dir, f"{domain}.{WRITERS[fmt].extension}")
+
+
+def fit_bytes(data: bytes, limit: int) -> bytes:
+    """Truncate UTF-8 `data` to at most `limit` bytes without splitting a character."""
+    if len(data) <= limit:
+        return data
+    return data[:limit].decode("utf-8", "ignore").encode("utf-8")
+
+
+def split_bytes(data: bytes, limit: int) -> list[bytes]:
+    """Split UTF-8 `data` into chunks of at most `limit` bytes on character boundaries."""
+    chunks = []
+    while len(data) > limit:
+        chunk = fit_bytes(data, limit)
+        chunks.append(chunk)
+        data = data[len(chunk):]
+    chunks.append(data)
+    return chunks
+
+
+# ---------------------------------------------------------------------------
+# CSV
+# ---------------------------------------------------------------------------
+
+@register_writer("csv", "csv")
+def write_csv(table, path: str) -> list[str]:
+    """Stream a table to CSV, byte-identical to DataFrame.to_csv(index=False)."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(table.names)
+        writer.writerows(table.rows())
+    return []
+
+
+# ---------------------------------------------------------------------------
+# SAS XPORT v5
+# ---------------------------------------------------------------------------
+
+_XPT_RECORD = 80
+_XPT_MISSING = b"." + bytes(7)
+# ntype, nhfun, nlng, nvar0, nname, nlabel, nform, nfl, nfd, nfj, nfill,
+# niform, nifl, nifd, npos, rest: one 140-byte NAMESTR record per variable
+_NAMESTR = struct.Struct(">hhhh8s40s8shhh2s8shhi52s")
+
+
+def ibm_float(value) -> bytes:
+    """Encode a number as an 8-byte IBM System/370 double (XPORT numeric).
+
+    None is the SAS missing value ".".
+    """
+    if value is None:
+        return _XPT_MISSING
+    if value == 0:
+        return bytes(8)
+    sign = 0x80 if value < 0 else 0
+    mantissa, exponent = math.frexp(abs(value))  # 0.5 <= mantissa < 1
+    # Base-16 exponent; the fraction keeps 56 bits
+    exponent16 = -(-exponent // 4)
+    shift = exponent16 * 4 - exponent
+    fraction = int(mantissa * (1 << (56 - shift)))
+    if not -64 <= exponent16 < 64:
+        raise ValueError(f"{value} cannot be represented in XPORT format")
+    return bytes([sign | (exponent16 + 64)]) + fraction.to_bytes(7, "big")
+
+
+def _xpt_header(kind: str, numbers: str = "0" * 30) -> bytes:
+    return f"HEADER RECORD*******{kind:<8}HEADER RECORD!!!!!!!{numbers}  ".encode("ascii")
+
+
+def _ascii_field(text: str, width: int) -> bytes:
+    return text.encode("ascii", "replace")[:width].ljust(width)
+
+
+class _XptColumn(NamedTuple):
+    name: str
+    label: str
+    numeric: bool
+    length: int
+    values: object  # list of encoded values, or one value shared by all rows
+
+
+def _xpt_columns(table) -> tuple[list[_XptColumn], list[str]]:
+    """Encode a table's columns for XPORT, enforcing its length limits.
+
+    Character values are UTF-8, limited to the variable's SDTM length
+    (at most 200 bytes). Variables marked `split` (TSVAL) carry the
+    overflow of longer values in NAME1..NAMEn as SDTMIG prescribes;
+    other values are truncated. Returns the columns and a warning per
+    shortened or split variable.
+    """
+    domain = table.domain.upper()
+    columns = []
+    warnings = []
+    for var in table.variables:
+        values = table.columns[var.name]
+        constant = not isinstance(values, list)
+        if var.type == "Num":
+            encoded = ibm_float(values) if constant else [ibm_float(v) for v in values]
+            columns.append(_XptColumn(var.name, var.label, True, 8, encoded))
+            continue
+
+        limit = min(var.length or XPT_CHAR_LIMIT, XPT_CHAR_LIMIT)
+        texts = [str(v).encode("utf-8") for v in ([values] if constant else values)]
+        too_long = sum(len(v) > limit for v in texts)
+        if too_long and var.split:
+            chunks = [split_bytes(v, limit) for v in texts]
+            parts = max(len(c) for c in chunks)
+            names = [var.name] + [f"{var.name}{i}" for i in range(1, parts)]
+            warnings.append(f"{domain}.{var.name}: {too_long} value(s) over {limit} bytes "
+                            f"continued in {', '.join(names[1:])}")
+            labels = [var.label] + [f"{var.label[:XPT_LABEL_LIMIT - 3]} {i}" for i in range(1, parts)]
+            part_values = [[c[i] if i < len(c) else b"" for c in chunks] for i in range(parts)]
+        else:
+            if too_long:
+                warnings.append(f"{domain}.{var.name}: {too_long} value(s) truncated to {limit} bytes")
+                texts = [fit_bytes(v, limit) for v in texts]
+            names, labels, part_values = [var.name], [var.label], [texts]
+        for name, label, part in zip(names, labels, part_values):
+            length = max(max(map(len, part), default=0), 1)
+            padded = [v.ljust(length) for v in part]
+            columns.append(_XptColumn(name, label, False, length, padded[0] if constant else padded))
+
+    for column in columns:
+        if len(column.name) > XPT_NAME_LIMIT:
+            raise ValueError(f"{domain}.{column.name}: XPORT variable names are limited "
+                             f"to {XPT_NAME_LIMIT} characters")
+        if len(column.label) > XPT_LABEL_LIMIT:
+            raise ValueError(f"{domain}.{column.name}: XPORT labels are limited "
+                             f"to {XPT_LABEL_LIMIT} characters")
+    return columns, warnings
+
+
+@register_writer("xpt", "xpt")
+def write_xpt(table, path: str) -> list[str]:
+    """Write a table as a SAS XPORT v5 transport file (one member)."""
+    columns, warnings = _xpt_columns(table)
+    name = table.domain.upper()
+    if len(name) > XPT_NAME_LIMIT:
+        raise ValueError(f"{name}: XPORT dataset names are limited to {XPT_NAME_LIMIT} characters")
+    stamp = datetime.now().strftime("%d%b%y:%H:%M:%S").upper().encode("ascii")
+    system = _ascii_field(platform.system(), 8)
+    version = _ascii_field("9.4", 8)
+
+    namestrs = []
+    position = 0
+    for number, column in enumerate(columns, 1):
+        namestrs.append(_NAMESTR.pack(
+            1 if column.numeric else 2, 0, column.length, number,
+            _ascii_field(column.name, 8), _ascii_field(column.label, 40), b" " * 8,
+            0, 0, 0, b"\0\0", b" " * 8, 0, 0, position, bytes(52),
+        ))
+        position += column.length
+    namestr_block = b"".join(namestrs)
+    namestr_block += b" " * (-len(namestr_block) % _XPT_RECORD)
+
+    with open(path, "wb") as f:
+        f.write(_xpt_header("LIBRARY"))
+        f.write(b"SAS     SAS     SASLIB  " + version + system + b" " * 24 + stamp)
+        f.write(stamp + b" " * 64)
+        f.write(_xpt_header("MEMBER", "00000000000000000160" "0000000140"))
+        f.write(_xpt_header("DSCRPTR"))
+        f.write(b"SAS     " + _ascii_field(name, 8) + b"SASDATA " + version + system
+                + b" " * 24 + stamp)
+        f.write(stamp + b" " * 16 + _ascii_field(table.label, 40) + b" " * 8)
+        f.write(_xpt_header("NAMESTR", f"000000{len(columns):04d}" + "0" * 20))
+        f.write(namestr_block)
+        f.write(_xpt_header("OBS"))
+
+        written = 0
+        cells = [
+            repeat(c.values, table.n_rows) if not isinstance(c.values, list) else c.values
+            for c in columns
+        ]
+        for row in zip(*cells):
+            record = b"".join(row)
+            f.write(record)
+            written += len(record)
+        f.write(b" " * (-written % _XPT_RECORD))
+    return warnings
+
+
+# ---------------------------------------------------------------------------
+# Parquet
+# ---------------------------------------------------------------------------
+
+@register_writer("parquet", "parquet")
+def write_parquet(table, path: str) -> list[str]:
+    """Write a table as Parquet (requires pyarrow).
+
+    Num variables are int64 (nullable); categorical Char variables
+    (see Variable) are dictionary-encoded. Variable labels are kept as field
+    metadata and the dataset label as schema metadata.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet output. Install with: pip install pyarrow")
+    arrays = []
+    fields = []
+    for var in table.variables:
+        values = table.columns[var.name]
+        constant = not isinstance(values, list)
+        arrow_type = pa.int64() if var.type == "Num" else pa.string()
+        if constant:
+            array = pa.repeat(pa.scalar(values, arrow_type), table.n_rows)
+        else:
+            array = pa.array(values, type=arrow_type)
+        if var.type == "Char" and var.categorical:
+            array = array.dictionary_encode()
+        arrays.append(array)
+        fields.append(pa.field(var.name, array.type, metadata={"label": var.label}))
+    schema = pa.schema(fields, metadata={"name": table.domain.upper(), "label": table.label})
+    pq.write_table(pa.Table.from_arrays(arrays, schema=schema), path)
+    return []
+
+
+# ---------------------------------------------------------------------------
+# CDISC Dataset-JSON
+# ---------------------------------------------------------------------------
+
+@register_writer("json", "json")
+def write_dataset_json(table, path: str) -> list[str]:
+    """Write a table as CDISC Dataset-JSON v1.1.
+
+    The metadata is written first and the rows are streamed after it,
+    one row array per line.
+    """
+    domain = table.domain.upper()
+    columns = []
+    for var in table.variables:
+        column = {
+            "itemOID": f"IT.{domain}.{var.name}",
+            "name": var.name,
+            "label": var.label,
+            "dataType": "integer" if var.type == "Num" else "string",
+        }
+        if var.type == "Char":
+            values = table.columns[var.name]
+            texts = [values] if not isinstance(values, list) else values
+            column["length"] = max(max((len(str(v)) for v in texts), default=0), 1)
+        columns.append(column)
+
+    metadata = {
+        "datasetJSONCreationDateTime": datetime.now().isoformat(timespec="seconds"),
+        "datasetJSONVersion": DATASET_JSON_VERSION,
+        "sourceSystem": {"name": "usdm-tools", "version": __version__},
+        "itemGroupOID": f"IG.{domain}",
+        "records": table.n_rows,
+        "name": domain,
+        "label": table.label,
+        "columns": columns,
+    }
+    study_id = table.columns.get("STUDYID")
+    if isinstance(study_id, str) and study_id:
+        metadata["studyOID"] = study_id
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json_dumps(metadata)[:-1])
+        f.write(',"rows":[')
+        for number, row in enumerate(table.rows()):
+            f.write(",\n" if number else "\n")
+            f.write(json_dumps(list(row)))
+        f.write("\n]}\n")
+    return []
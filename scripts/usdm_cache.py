@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+USDM Result Cache
+
+Content-addressed on-disk cache for validator reports and generator
+artifacts (SDTM datasets, M11 documents). Entries are keyed by the
+SHA-256 of the input file, the tool name, the tool version (plus a
+digest of the tool's source, so local edits never reuse stale results)
+and any output-affecting options. The cache is bounded in size and
+evicts the least recently used entries first.
+
+The validator and both generators use it when run with --cache or
+--cache-dir; this script inspects and invalidates it.
+
+Usage:
+    python usdm_cache.py stats
+    python usdm_cache.py invalidate study_definition.json
+    python usdm_cache.py invalidate "sdr_export/**/*.json"
+    python usdm_cache.py clear [--tool m11_document_generator]
+    python usdm_cache.py prune --max-size 500M
+
+The cache lives in $USDM_CACHE_DIR (default ~/.cache/usdm-tools) and is
+limited to $USDM_CACHE_MAX_SIZE (default 1G); --cache-dir and
+--max-size override both.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional, Union
+
+from usdm_utils import (
+    __version__,
+    read_json,
+    write_json,
+    profiled,
+    expand_inputs,
+)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "usdm-tools")
+DEFAULT_MAX_SIZE = "1G"
+
+_META = "meta.json"
+_CHUNK = 1 << 20
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+# Eviction triggered by put() trims to this fraction of the limit, so the
+# next few stores do not each rescan the cache.
+_PRUNE_TARGET = 0.9
+
+# Per-process running total of each cache root's size: scanned once, then
+# grown by every put(), so a batch does not re-read every meta.json per study.
+_SIZE_ESTIMATES: dict[Path, int] = {}
+_SIZE_LOCK = threading.Lock()
+
+
+def default_cache_dir() -> str:
+    return os.environ.get("USDM_CACHE_DIR") or DEFAULT_CACHE_DIR
+
+
+def resolve_cache_dir(enabled: bool, cache_dir: Optional[str] = None) -> Optional[str]:
+    """Cache directory for the --cache/--cache-dir CLI flags (None: caching off)."""
+    if cache_dir:
+        return cache_dir
+    return default_cache_dir() if enabled else None
+
+
+def parse_size(text: str) -> int:
+    """Parse a size such as ``1048576``, ``500M`` or ``2G`` into bytes."""
+    text = text.strip().upper().removesuffix("B")
+    unit = text[-1:] if text[-1:] in _SIZE_UNITS else ""
+    number = text[:len(text) - len(unit)]
+    try:
+        return int(float(number) * _SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid size '{text}'; expected e.g. 500M or 2G") from None
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_CODE_DIGESTS: dict[tuple, str] = {}
+
+
+def code_digest(tool_file: Union[str, list[str]]) -> str:
+    """Digest of the tool version and the sources a cached result depends on.
+
+    Covers usdm_utils, this module and the tool script itself (plus any
+    helper modules, when `tool_file` is a list), so an edited checkout
+    never serves results produced by older code even if __version__ was
+    not bumped.
+    """
+    here = Path(__file__).resolve().parent
+    tool_files = [tool_file] if isinstance(tool_file, str) else tool_file
+    files = (here / "usdm_utils.py", here / "usdm_cache.py", *(Path(f).resolve() for f in tool_files))
+    cached = _CODE_DIGESTS.get(files)
+    if cached is None:
+        digest = hashlib.sha256(__version__.encode())
+        for path in files:
+            digest.update(path.read_bytes())
+        cached = _CODE_DIGESTS[files] = digest.hexdigest()
+    return cached
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.iterdir() if p.is_file())
+
+
+class ResultCache:
+    """Size-bounded, least-recently-used, content-addressed result cache.
+
+    Usage from a tool:
+
+        cache = ResultCache(cache_dir)
+        request = cache.request(input_path, "sdtm_trial_design_generator", __file__, format="csv")
+        entry = cache.get(request)
+        if entry:
+            cache.restore(entry, {"ta.csv": "out/ta.csv", ...})
+        else:
+            ...  # run the pipeline
+            cache.put(request, files={"ta.csv": "out/ta.csv", ...}, result={...})
+
+    Each entry is a directory ``<root>/<key[:2]>/<key>/`` holding the
+    artifact files and a meta.json with the request, the JSON `result`
+    and the artifact names. The mtime of meta.json is the entry's last
+    use. Entries are written to a temporary directory and renamed into
+    place, so concurrent batch workers never see partial entries.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = Path(root or default_cache_dir())
+        if max_bytes is None:
+            max_bytes = parse_size(os.environ.get("USDM_CACHE_MAX_SIZE", DEFAULT_MAX_SIZE))
+        self.max_bytes = max_bytes
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    @profiled("cache_key")
+    def request(self, input_path: str, tool: str, tool_file: Union[str, list[str]], **options) -> dict:
+        """Describe one cacheable run; `options` are the output-affecting settings.
+
+        `tool_file` is the tool's source file, or a list of it and the
+        helper modules it writes its output with.
+        """
+        input_sha256 = file_digest(input_path)
+        # Always the stdlib encoder: the pluggable backends differ in how
+        # they write non-ASCII text, which would split one key into several.
+        key_source = json.dumps({
+            "input_sha256": input_sha256,
+            "tool": tool,
+            "code": code_digest(tool_file),
+            "options": options,
+        }, sort_keys=True, separators=(",", ":"))
+        return {
+            "key": hashlib.sha256(key_source.encode()).hexdigest(),
+            "tool": tool,
+            "version": __version__,
+            "input": os.path.abspath(input_path),
+            "input_sha256": input_sha256,
+            "options": options,
+        }
+
+    @profiled("cache_lookup")
+    def get(self, request: dict) -> Optional[dict]:
+        """Return the cached entry's metadata, or None on a miss.
+
+        The returned dict has the entry directory under "path"; a hit
+        marks the entry as most recently used.
+        """
+        entry_dir = self._entry_dir(request["key"])
+        meta_path = entry_dir / _META
+        try:
+            meta = read_json(str(meta_path))
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        if any(not (entry_dir / name).is_file() for name in meta.get("files", [])):
+            return None
+        meta["path"] = str(entry_dir)
+        return meta
+
+    @profiled("cache_restore")
+    def restore(self, entry: dict, outputs: dict[str, str]):
+        """Copy cached artifacts out of an entry: artifact name -> destination path."""
+        for name, dest in outputs.items():
+            Path(dest).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(os.path.join(entry["path"], name), dest)
+
+    @profiled("cache_store")
+    def put(self, request: dict, files: Optional[dict[str, str]] = None, result: Optional[dict] = None):
+        """Store a run's artifacts (artifact name -> source path) and JSON result.
+
+        An existing entry for the same key is left as is. Least recently
+        used entries are evicted afterwards if the cache exceeds its size
+        limit. The cache is scanned once per process to learn its size;
+        later stores only add their own bytes until the limit is crossed.
+        """
+        files = files or {}
+        entry_dir = self._entry_dir(request["key"])
+        if (entry_dir / _META).is_file():
+            return
+        tmp_dir = self.root / ".tmp" / uuid.uuid4().hex
+        tmp_dir.mkdir(parents=True)
+        try:
+            for name, src in files.items():
+                shutil.copyfile(src, tmp_dir / name)
+            meta = dict(request, result=result, files=sorted(files), created=time.time())
+            write_json(meta, str(tmp_dir / _META))
+            entry_dir.parent.mkdir(parents=True, exist_ok=True)
+            size = _dir_size(tmp_dir)
+            try:
+                os.replace(tmp_dir, entry_dir)
+            except OSError:  # another worker stored the same key first
+                size = 0
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        with _SIZE_LOCK:
+            total = _SIZE_ESTIMATES.get(self.root)
+            total = self.size() if total is None else total + size
+            _SIZE_ESTIMATES[self.root] = total
+            if total > self.max_bytes:
+                self.prune(int(self.max_bytes * _PRUNE_TARGET))
+
+    def entries(self) -> list[dict]:
+        """Metadata of every complete entry, with "path", "size" and "last_used"."""
+        found = []
+        for meta_path in self.root.glob(f"??/*/{_META}"):
+            try:
+                meta = read_json(str(meta_path))
+                meta["path"] = str(meta_path.parent)
+                meta["size"] = _dir_size(meta_path.parent)
+                meta["last_used"] = meta_path.stat().st_mtime
+            except (OSError, ValueError):
+                continue  # evicted or being replaced by another process
+            found.append(meta)
+        return found
+
+    def size(self) -> int:
+        """Total bytes of all complete entries."""
+        return sum(e["size"] for e in self.entries())
+
+    def remove(self, entry: dict):
+        shutil.rmtree(entry["path"], ignore_errors=True)
+
+    def prune(self, max_bytes: Optional[int] = None) -> int:
+        """Evict least recently used entries until the cache fits; returns the count."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(e["size"] for e in entries)
+        removed = 0
+        for entry in sorted(entries, key=lambda e: e["last_used"]):
+            if total <= limit:
+                break
+            self.remove(entry)
+            total -= entry["size"]
+            removed += 1
+        _SIZE_ESTIMATES[self.root] = total
+        return removed
+
+    def clear(self, tool: Optional[str] = None) -> int:
+        """Remove every entry (or every entry of one tool); returns the count."""
+        removed = 0
+        for entry in self.entries():
+            if tool is None or entry.get("tool") == tool:
+                self.remove(entry)
+                removed += 1
+        _SIZE_ESTIMATES.pop(self.root, None)
+        return removed
+
+    def invalidate(self, input_path: str) -> int:
+        """Remove every entry produced from `input_path`; returns the count.
+
+        Matches on the recorded input path as well as on the content
+        hash, so copies of the same study are invalidated too.
+        """
+        path = os.path.abspath(input_path)
+        digest = file_digest(input_path) if os.path.isfile(input_path) else None
+        removed = 0
+        for entry in self.entries():
+            if entry.get("input") == path or (digest and entry.get("input_sha256") == digest):
+                self.remove(entry)
+                removed += 1
+        _SIZE_ESTIMATES.pop(self.root, None)
+        return removed
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        by_tool: dict[str, dict] = {}
+        for entry in entries:
+            tool = by_tool.setdefault(entry.get("tool", "?"), {"entries": 0, "bytes": 0})
+            tool["entries"] += 1
+            tool["bytes"] += entry["size"]
+        return {
+            "root": str(self.root),
+            "entries": len(entries),
+            "bytes": sum(e["size"] for e in entries),
+            "max_bytes": self.max_bytes,
+            "tools": by_tool,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and invalidate the USDM result cache")
+    parser.add_argument("--cache-dir",
+                        help="Cache directory (default: $USDM_CACHE_DIR or ~/.cache/usdm-tools)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="Show entry counts and sizes per tool")
+    invalidate = commands.add_parser("invalidate", help="Drop cached results for the given studies")
+    invalidate.add_argument("inputs", nargs="+", help="USDM JSON files, directories or globs")
+    clear = commands.add_parser("clear", help="Drop all cached results")
+    clear.add_argument("--tool", help="Only drop results of this tool (e.g. usdm_validator)")
+    prune = commands.add_parser("prune", help="Evict least recently used entries down to a size")
+    prune.add_argument("--max-size", help=f"Size limit such as 500M (default: {DEFAULT_MAX_SIZE})")
+    args = parser.parse_args()
+
+    cache = ResultCache(args.cache_dir)
+
+    if args.command == "stats":
+        stats = cache.stats()
+        print(f"Cache: {stats['root']}")
+        print(f"  {stats['entries']} entries, {stats['bytes'] / (1 << 20):.1f} MB "
+              f"of {stats['max_bytes'] / (1 << 20):.0f} MB")
+        for tool, tool_stats in sorted(stats["tools"].items()):
+            print(f"  {tool}: {tool_stats['entries']} entries, "
+                  f"{tool_stats['bytes'] / (1 << 20):.1f} MB")
+    elif args.command == "invalidate":
+        removed = 0
+        for spec in args.inputs:
+            for path in expand_inputs(spec):
+                removed += cache.invalidate(path)
+        print(f"Removed {removed} cache entr(ies)")
+    elif args.command == "clear":
+        print(f"Removed {cache.clear(args.tool)} cache entr(ies)")
+    elif args.command == "prune":
+        max_bytes = parse_size(args.max_size) if args.max_size else None
+        print(f"Evicted {cache.prune(max_bytes)} cache entr(ies)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+USDM Reference Graph and Impact Analysis
+
+Builds a persistent graph of the references between the objects of a
+USDM v4.0.0 study definition: every object with an id is a node, and
+every *Id/*Ids value is an edge typed by its field (encounterId,
+activityIds, nextId, ...). The graph answers the questions curators
+otherwise work out by hand:
+
+  - impact: what breaks if these objects are deleted, i.e. every
+    reference into them (or into anything nested inside them) from
+    the rest of the document
+  - prune: which objects nothing references and can be removed
+
+The graph is built in one pass over a UsdmIndex, can be saved as JSON
+and loaded again instead of the study, and is stored in the result
+cache with --cache, so repeated queries on an unchanged study skip the
+build.
+
+Amendment snapshots reuse ids across study versions. In a study with
+more than one version, every object inside versions[N] is therefore a
+node named "versions[N]/<id>", and references resolve within their own
+version first. A bare id used in several versions must be qualified, or
+given with --version N.
+
+Usage:
+    python usdm_graph.py -i study_definition.json impact Encounter_3
+    python usdm_graph.py -i study_definition.json -o prune.json prune [--type Encounter]
+    python usdm_graph.py -i study_definition.json save study.graph.json
+    python usdm_graph.py -i study.graph.json impact Activity_7 Activity_8
+    python usdm_graph.py -i amended.json impact --version 1 Encounter_3
+"""
+
+import argparse
+import sys
+from typing import Iterable, NamedTuple, Optional, Union
+
+from usdm_utils import (
+    JsonPath,
+    UsdmIndex,
+    format_path,
+    load_usdm_file,
+    write_json,
+    profiled,
+)
+from usdm_cache import ResultCache, resolve_cache_dir
+
+TOOL = "usdm_graph"
+
+# Version of the saved graph layout (see ReferenceGraph.to_dict)
+GRAPH_FORMAT = 2
+
+# Linked-list pointers between siblings; they do not keep an object in use
+CHAIN_FIELDS = ("previousId", "nextId")
+
+
+def is_entry_point(obj: dict) -> bool:
+    """Objects in use without being referenced: the main schedule timeline,
+    and narrative sections (top-level sections are only listed, not referenced)."""
+    return obj.get("mainTimeline") is True or obj.get("instanceType") == "NarrativeContent"
+
+
+def qualify(scope: Optional[str], obj_id: str) -> str:
+    """Node key of `obj_id` inside `scope`, e.g. "versions[1]/Encounter_3"."""
+    return f"{scope}/{obj_id}" if scope else obj_id
+
+
+class Node(NamedTuple):
+    """An object with an id."""
+    type: Optional[str]    # instanceType
+    parent: Optional[str]  # key of the nearest enclosing object with an id
+    path: str              # dotted JSON path
+    scope: Optional[str] = None  # "versions[N]" in a multi-version study, else None
+
+
+class Edge(NamedTuple):
+    """One *Id/*Ids value: `source` refers to `target` through `field`.
+
+    Both are node keys; a target that is not a node is a dangling reference.
+    """
+    source: Optional[str]  # nearest object with an id enclosing the value (None: none)
+    field: str             # e.g. "encounterId", "activityIds"
+    target: str
+    path: str              # dotted JSON path of the value
+
+
+class Impact(NamedTuple):
+    """What deleting some objects does to the rest of the document."""
+    removed: list[str]   # the objects and everything nested inside them
+    broken: list[Edge]   # references from outside `removed` into it
+
+
+class ReferenceGraph:
+    """Typed reference edges between the objects of one USDM document.
+
+        graph = ReferenceGraph.from_index(UsdmIndex(data))
+        graph.referrers("Encounter_3")   # edges pointing at it
+        graph.referents("Encounter_3")   # edges leaving it
+        graph.impact("Encounter_3")      # Impact(removed, broken)
+        graph.prunable()                 # keys of objects nothing refers to
+
+    Nodes are keyed by id. In a study with several versions, objects
+    inside a version are keyed "versions[N]/<id>" (see qualify), because
+    amendment snapshots reuse ids; resolve() maps a bare id to its key.
+    A reference resolves to an object of its own version first, then to
+    one outside every version; a reference from outside every version to
+    an id defined in several versions has an edge to each of them. An id
+    used twice within one version keeps its first object and is listed
+    in `duplicates`; impact() and prunable() refuse to answer for it
+    rather than guess.
+
+    Building, loading and the lookups are linear in the number of
+    objects and references; impact() and prunable() walk only the
+    objects concerned.
+
+    Attributes:
+        nodes: key -> Node, in document order
+        edges: Edge for every reference, in document order
+        entry_points: keys of objects in use without any reference (see
+            is_entry_point); never prunable
+        duplicates: keys whose id occurs more than once in its scope
+    """
+
+    def __init__(self, nodes: dict[str, Node], edges: list[Edge], entry_points: Iterable[str] = (),
+                 duplicates: Iterable[str] = ()):
+        self.nodes = nodes
+        self.edges = edges
+        self.entry_points = set(entry_points)
+        self.duplicates = set(duplicates)
+        self._incoming: dict[str, list[Edge]] = {}
+        self._outgoing: dict[Optional[str], list[Edge]] = {}
+        self._children: dict[str, list[str]] = {}
+        self._keys: dict[str, list[str]] = {}  # bare id -> keys, in document order
+        for edge in edges:
+            self._incoming.setdefault(edge.target, []).append(edge)
+            self._outgoing.setdefault(edge.source, []).append(edge)
+        for key, node in nodes.items():
+            if node.parent is not None:
+                self._children.setdefault(node.parent, []).append(key)
+            obj_id = key[len(node.scope) + 1:] if node.scope else key
+            self._keys.setdefault(obj_id, []).append(key)
+
+    @classmethod
+    @profiled("reference_graph")
+    def from_index(cls, index: UsdmIndex) -> "ReferenceGraph":
+        """Build the graph from an index's objects and references.
+
+        Walks `index.nodes` rather than the id map, so objects sharing an
+        id in different versions each get their own node.
+        """
+        path_cache: dict = {}
+        study = index.data.get("study") if isinstance(index.data, dict) else None
+        versions = study.get("versions") if isinstance(study, dict) else None
+        scoped = isinstance(versions, list) and len(versions) > 1
+
+        nodes: dict[str, Node] = {}
+        owners: dict[int, str] = {}  # id() of an object's path frame -> its key
+        in_scope: dict[Optional[str], dict[str, str]] = {None: {}}  # scope -> id -> key
+        entry_points, duplicates = [], []
+
+        def owner_of(frame: Optional[JsonPath]) -> Optional[str]:
+            while frame is not None and id(frame) not in owners:
+                frame = frame[0]
+            return owners[id(frame)] if frame is not None else None
+
+        for obj, path in index.nodes:
+            obj_id = obj.get("id")
+            if not isinstance(obj_id, str):
+                continue
+            parent = owner_of(path[0])
+            scope = nodes[parent].scope if parent is not None else None
+            if scoped and obj.get("instanceType") == "StudyVersion" and scope is None:
+                scope = f"versions[{path[1]}]" if isinstance(path[1], int) else format_path(path, path_cache)
+            key = qualify(scope, obj_id)
+            owners[id(path)] = key
+            if key in nodes:
+                duplicates.append(key)
+                continue
+            nodes[key] = Node(obj.get("instanceType"), parent, format_path(path, path_cache), scope)
+            in_scope.setdefault(scope, {})[obj_id] = key
+            if is_entry_point(obj):
+                entry_points.append(key)
+
+        # A reference from outside every version (e.g. the study's protocol
+        # document) to an id the versions define refers to each of them
+        in_versions: dict[str, list[str]] = {}
+        for scope, keys in in_scope.items():
+            if scope is not None:
+                for obj_id, key in keys.items():
+                    in_versions.setdefault(obj_id, []).append(key)
+        edges = []
+        for ref_id, path, _owner in index.references:
+            # *Id values sit at (object, field), *Ids items at ((object, field), i)
+            key = path[1]
+            field = path[0][1] if isinstance(key, int) else key
+            source = owner_of(path[0])
+            scope = nodes[source].scope if source is not None else None
+            target = in_scope.get(scope, {}).get(ref_id) or in_scope[None].get(ref_id)
+            if target is not None:
+                targets = [target]
+            elif scope is None and ref_id in in_versions:
+                targets = in_versions[ref_id]
+            else:
+                targets = [qualify(scope, ref_id)]  # dangling
+            value_path = format_path(path, path_cache)
+            edges.extend(Edge(source, field, target, value_path) for target in targets)
+        return cls(nodes, edges, entry_points, duplicates)
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form; ReferenceGraph.from_dict() reads it back."""
+        return {
+            "graphFormat": GRAPH_FORMAT,
+            "nodes": [[obj_id, *node] for obj_id, node in self.nodes.items()],
+            "edges": [list(edge) for edge in self.edges],
+            "entryPoints": [key for key in self.nodes if key in self.entry_points],
+            "duplicates": [key for key in self.nodes if key in self.duplicates],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ReferenceGraph":
+        if data.get("graphFormat") != GRAPH_FORMAT:
+            raise ValueError(f"Unsupported reference graph format {data.get('graphFormat')!r}; "
+                             f"expected {GRAPH_FORMAT}")
+        nodes = {key: Node(*fields) for key, *fields in data["nodes"]}
+        return cls(nodes, [Edge(*edge) for edge in data["edges"]], data.get("entryPoints", []),
+                   data.get("duplicates", []))
+
+    def save(self, path: str):
+        write_json(self.to_dict(), path, indent=None)
+
+    def resolve(self, obj_id: str, version: Optional[int] = None) -> str:
+        """Node key of `obj_id`: a key as is, or a bare id used in one place.
+
+        `version` picks the StudyVersion a bare id belongs to; objects
+        outside every version are found with any `version`.
+
+        Raises:
+            KeyError if there is no such object.
+            ValueError if a bare id is used in several versions and no
+            `version` is given.
+        """
+        if version is not None and qualify(f"versions[{version}]", obj_id) in self.nodes:
+            return qualify(f"versions[{version}]", obj_id)
+        if obj_id in self.nodes:
+            return obj_id
+        keys = self._keys.get(obj_id, []) if version is None else []
+        if len(keys) == 1:
+            return keys[0]
+        if not keys:
+            where = f" in versions[{version}]" if version is not None else ""
+            raise KeyError(f"No object with id '{obj_id}'{where}")
+        raise ValueError(f"Id '{obj_id}' is used in several study versions ({', '.join(keys)}); "
+                         f"pass a qualified id or a version")
+
+    def referrers(self, obj_id: str) -> list[Edge]:
+        """References to `obj_id`, in document order."""
+        return self._incoming.get(obj_id, [])
+
+    def referents(self, obj_id: str) -> list[Edge]:
+        """References made by `obj_id` itself (not by objects nested in it)."""
+        return self._outgoing.get(obj_id, [])
+
+    def subtree(self, obj_id: str) -> list[str]:
+        """`obj_id` and the ids of every object nested inside it, in document order."""
+        found = []
+        stack = [obj_id]
+        while stack:
+            current = stack.pop()
+            found.append(current)
+            stack.extend(reversed(self._children.get(current, [])))
+        return found
+
+    def contains(self, ancestor: str, obj_id: Optional[str]) -> bool:
+        """True if `obj_id` is `ancestor` or nested inside it."""
+        while obj_id is not None:
+            if obj_id == ancestor:
+                return True
+            node = self.nodes.get(obj_id)
+            obj_id = node.parent if node else None
+        return False
+
+    def impact(self, obj_ids: Union[str, Iterable[str]]) -> Impact:
+        """What breaks if the given objects are deleted.
+
+        Deleting an object deletes everything nested inside it too; every
+        reference from the rest of the document into the deleted objects
+        is broken, including linked-list pointers from neighbours. Ids
+        are node keys or bare ids (see resolve).
+
+        Raises:
+            KeyError for an unknown id; ValueError for an ambiguous one,
+            or if the deleted objects include a duplicated id, whose
+            references cannot be told apart.
+        """
+        if isinstance(obj_ids, str):
+            obj_ids = [obj_ids]
+        removed = []
+        seen = set()
+        for obj_id in obj_ids:
+            for nested in self.subtree(self.resolve(obj_id)):
+                if nested in self.duplicates:
+                    raise ValueError(f"Id '{nested}' is used by several objects; "
+                                     f"references to it cannot be attributed")
+                if nested not in seen:
+                    seen.add(nested)
+                    removed.append(nested)
+        broken = [
+            edge
+            for obj_id in removed
+            for edge in self.referrers(obj_id)
+            if edge.source not in seen
+        ]
+        return Impact(removed, broken)
+
+    def prunable(self, types: Optional[Iterable[str]] = None,
+                 ignore_fields: Iterable[str] = CHAIN_FIELDS,
+                 version: Optional[int] = None) -> list[str]:
+        """Objects nothing else refers to, which can be deleted without breaking a reference.
+
+        Only objects of a type that is referenced somewhere in the
+        document are candidates: an unreferenced Encounter is a finding,
+        an unreferenced Code or StudyVersion is not. References through
+        `ignore_fields` (linked-list pointers by default) and from
+        inside the object itself do not keep it, and entry points are
+        never candidates. Objects nested in another prunable object are
+        not listed separately. Pruning can leave further objects
+        unreferenced; run the query again afterwards.
+
+        `types` restricts the result to these instanceTypes and
+        `version` to the objects of versions[N] in a multi-version study.
+        Objects with a duplicated id are never listed.
+        """
+        ignore = set(ignore_fields)
+        referenced_types = {
+            self.nodes[edge.target].type
+            for edge in self.edges
+            if edge.field not in ignore and edge.target in self.nodes
+        }
+        if types is not None:
+            referenced_types &= set(types)
+        scope = f"versions[{version}]" if version is not None else None
+        found = []
+        pruned = set()
+        for obj_id, node in self.nodes.items():  # document order: parents first
+            if node.parent in pruned:
+                pruned.add(obj_id)
+                continue
+            if node.type not in referenced_types or obj_id in self.entry_points:
+                continue
+            if obj_id in self.duplicates or (scope is not None and node.scope not in (scope, None)):
+                continue
+            if any(edge.field not in ignore and not self.contains(obj_id, edge.source)
+                   for edge in self.referrers(obj_id)):
+                continue
+            pruned.add(obj_id)
+            found.append(obj_id)
+        return found
+
+
+def load_graph(input_path: str, cache_dir: Optional[str] = None) -> tuple[ReferenceGraph, bool]:
+    """Graph of a USDM file, or a graph saved with ReferenceGraph.save().
+
+    With `cache_dir`, the graph of an unchanged study is read from the
+    result cache instead of being rebuilt.
+
+    Returns:
+        (graph, True if it came from the cache)
+    """
+    cache = ResultCache(cache_dir) if cache_dir else None
+    if cache:
+        request = cache.request(input_path, TOOL, __file__, graph_format=GRAPH_FORMAT)
+        entry = cache.get(request)
+        if entry:
+            return ReferenceGraph.from_dict(entry["result"]), True
+
+    data = load_usdm_file(input_path)
+    if "graphFormat" in data:
+        return ReferenceGraph.from_dict(data), False
+    graph = ReferenceGraph.from_index(UsdmIndex(data))
+    if cache:
+        cache.put(request, result=graph.to_dict())
+    return graph, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reference graph and impact analysis for USDM JSON")
+    parser.add_argument("--input", "-i", required=True,
+                        help="USDM JSON file, or a graph saved with the 'save' command")
+    parser.add_argument("--json-output", "-o", help="Optional: save the query result as JSON")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse the stored graph when the input file is unchanged")
+    parser.add_argument("--cache-dir",
+                        help="Cache directory; implies --cache "
+                             "(default: $USDM_CACHE_DIR or ~/.cache/usdm-tools)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    impact = commands.add_parser("impact", help="List the references that deleting objects would break")
+    impact.add_argument("ids", nargs="+", help="Ids of the objects to delete")
+    impact.add_argument("--version", type=int, metavar="N",
+                        help="Multi-version studies: the ids are those of versions[N]")
+    prune = commands.add_parser("prune", help="List objects nothing refers to")
+    prune.add_argument("--type", action="append", dest="types", metavar="INSTANCE_TYPE",
+                       help="Only objects of this instanceType (repeatable)")
+    prune.add_argument("--version", type=int, metavar="N",
+                       help="Multi-version studies: only objects of versions[N]")
+    save = commands.add_parser("save", help="Save the graph as JSON for later runs")
+    save.add_argument("path", help="Output path, e.g. study.graph.json")
+    args = parser.parse_args()
+
+    graph, cached = load_graph(args.input, resolve_cache_dir(args.cache, args.cache_dir))
+    source = " (from cache)" if cached else ""
+    print(f"Reference graph: {len(graph.nodes)} objects, {len(graph.edges)} references{source}")
+    if graph.duplicates:
+        print(f"WARNING: {len(graph.duplicates)} id(s) are used by several objects in the same "
+              f"scope and are left out of queries: {', '.join(sorted(graph.duplicates)[:5])}")
+
+    if args.command == "impact":
+        try:
+            keys = [graph.resolve(obj_id, args.version) for obj_id in args.ids]
+            result = graph.impact(keys)
+        except (KeyError, ValueError) as exc:
+            print(f"ERROR: {exc.args[0]}")
+            sys.exit(2)
+        print(f"Deleting {', '.join(keys)} removes {len(result.removed)} object(s) "
+              f"and breaks {len(result.broken)} reference(s)")
+        for edge in result.broken:
+            print(f"  {edge.source or '<root>'}.{edge.field} -> {edge.target}  ({edge.path})")
+        output = {"removed": result.removed, "broken": [edge._asdict() for edge in result.broken]}
+    elif args.command == "prune":
+        found = graph.prunable(args.types, version=args.version)
+        print(f"{len(found)} unreferenced object(s) can be pruned")
+        for obj_id in found:
+            node = graph.nodes[obj_id]
+            print(f"  {obj_id} ({node.type}) at {node.path}")
+        output = {"prunable": [dict(id=obj_id, **graph.nodes[obj_id]._asdict()) for obj_id in found]}
+    else:
+        graph.save(args.path)
+        print(f"Graph saved to: {args.path}")
+        output = None
+
+    if args.json_output and output is not None:
+        write_json(output, args.json_output)
+        print(f"JSON result saved to: {args.json_output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,18 +3,493 @@
 USDM v4.0.0 Shared Utilities
 
 Common helper functions for navigating and extracting data from
-USDM v4.0.0 JSON structures. Used by the validator, SDTM generator,
-and M11 document generator scripts.
+USDM v4.0.0 JSON structures, plus the batch-processing and profiling
+helpers behind each CLI's directory/glob mode and --profile flag. Used
+by the validator, SDTM generator, and M11 document generator scripts.
 """
 
-from typing import Any, Optional
+# Version of the USDM scripts; part of every result-cache key (see usdm_cache)
+__version__ = "2.0.0"
 
+import functools
+import glob
+import json
+import mmap
+import os
+import re
+import threading
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
 
-def get_version_and_design(data: dict) -> tuple[dict, dict]:
-    """Navigate to the first StudyVersion and first StudyDesign.
+try:
+    import ijson  # optional: event-based streaming parser
+except ImportError:
+    ijson = None
+
+try:
+    import orjson  # optional: fast JSON backend
+except ImportError:
+    orjson = None
+
+try:
+    import ujson  # optional: fast JSON backend
+except ImportError:
+    ujson = None
+
+
+# A JSON path is kept as a chain of parent-pointer frames, ``(parent, key)``,
+# where key is a dict key or list index and the root frame is
+# ``(None, label)``. Frames cost one tuple each; the dotted string such as
+# ``root.study.versions[0]`` is only built by format_path() when needed.
+JsonPath = tuple
+
+
+def root_path(label: str = "root") -> JsonPath:
+    """Return the root frame for a path starting with `label`."""
+    return (None, label)
+
+
+def format_path(path: JsonPath, cache: Optional[dict] = None) -> str:
+    """Render a parent-pointer path frame as a dotted JSON path string.
+
+    Pass the same `cache` dict when rendering many paths from one walk to
+    reuse already rendered prefixes (frames are keyed by identity, so the
+    cache must not outlive the walk).
+    """
+    pending = []
+    frame = path
+    while True:
+        if cache is not None and id(frame) in cache:
+            text = cache[id(frame)]
+            break
+        parent, key = frame
+        if parent is None:
+            text = str(key)
+            if cache is not None:
+                cache[id(frame)] = text
+            break
+        pending.append(frame)
+        frame = parent
+    for frame in reversed(pending):
+        key = frame[1]
+        text = f"{text}[{key}]" if isinstance(key, int) else f"{text}.{key}"
+        if cache is not None:
+            cache[id(frame)] = text
+    return text
+
+
+# ---------------------------------------------------------------------------
+# Profiling
+# ---------------------------------------------------------------------------
+
+class StageProfiler:
+    """Per-stage wall time and allocation recorder behind ``--profile``.
+
+    Stages nest; each is recorded under its slash-joined path (for
+    example ``generate_all/generate_ta/dataframe``) and repeated stages
+    with the same path are summed. Allocation figures come from
+    tracemalloc and are only recorded when `track_memory` is set and
+    tracing is active (see profiling()); tracing slows Python code down,
+    so compare timings from runs with the same setting.
+
+    Stage fields in report():
+        path, stage, depth: Where the stage sits in the nesting
+        calls: How many times it ran
+        seconds: Total wall time, including nested stages
+        peak_bytes: Largest allocation high-water mark above the memory
+            in use when the stage started
+        net_bytes: Memory still allocated when the stage ended, summed
+            over calls
+    """
+
+    def __init__(self, track_memory: bool = True):
+        self.track_memory = track_memory
+        self.started = time.perf_counter()
+        self.stages: dict[str, dict] = {}
+        # Open stages: [path, start time, start memory, peak so far]
+        self._open: list[list] = []
+
+    def _memory(self) -> tuple[int, int]:
+        if self.track_memory and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()
+        return 0, 0
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time (and measure allocations of) the enclosed block as `name`."""
+        parent = self._open[-1] if self._open else None
+        path = f"{parent[0]}/{name}" if parent else name
+        current, peak = self._memory()
+        if parent:
+            # tracemalloc keeps a single peak; fold it into the enclosing
+            # stage before resetting it for this one
+            parent[3] = max(parent[3], peak)
+        if self.track_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        entry = self.stages.get(path)
+        if entry is None:
+            # Registered on entry so the report lists stages in call order
+            entry = self.stages[path] = {
+                "path": path,
+                "stage": name,
+                "depth": len(self._open),
+                "calls": 0,
+                "seconds": 0.0,
+                "peak_bytes": 0,
+                "net_bytes": 0,
+            }
+        frame = [path, time.perf_counter(), current, current]
+        self._open.append(frame)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - frame[1]
+            current, peak = self._memory()
+            frame[3] = max(frame[3], peak)
+            self._open.pop()
+            if parent:
+                parent[3] = max(parent[3], frame[3])
+            entry["calls"] += 1
+            entry["seconds"] += elapsed
+            entry["peak_bytes"] = max(entry["peak_bytes"], frame[3] - frame[2])
+            entry["net_bytes"] += current - frame[2]
+
+    def report(self, **meta: Any) -> dict:
+        """JSON-serializable report; `meta` (tool, input, ...) is included as-is."""
+        stages = []
+        for entry in self.stages.values():
+            entry = dict(entry, seconds=round(entry["seconds"], 6))
+            if not self.track_memory:
+                del entry["peak_bytes"], entry["net_bytes"]
+            stages.append(entry)
+        report = dict(meta)
+        report["total_seconds"] = round(time.perf_counter() - self.started, 6)
+        report["memory_tracked"] = self.track_memory
+        report["stages"] = stages
+        return report
+
+
+class _ActiveProfiler(threading.local):
+    # The profiler instrumented code in this thread reports to; None when
+    # profiling is off. Per thread, so thread-pool workers profile
+    # independently (tracemalloc figures stay process-wide).
+    profiler: Optional[StageProfiler] = None
+
+
+_ACTIVE = _ActiveProfiler()
+_NO_STAGE = nullcontext()
+
+
+@contextmanager
+def profiling(enabled: bool = True, track_memory: bool = True):
+    """Collect stage timings for the enclosed block.
+
+    Yields the active StageProfiler, or None when `enabled` is false, so
+    callers can write ``with profiling(args.profile) as profiler:``
+    without a separate code path. tracemalloc is started for the block
+    if `track_memory` is set and it is not already running.
+    """
+    if not enabled:
+        yield None
+        return
+    start_tracing = track_memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    previous = _ACTIVE.profiler
+    profiler = _ACTIVE.profiler = StageProfiler(track_memory)
+    try:
+        yield profiler
+    finally:
+        _ACTIVE.profiler = previous
+        if start_tracing:
+            tracemalloc.stop()
+
+
+def profile_stage(name: str):
+    """Context manager recording the enclosed block as stage `name`.
+
+    A shared no-op context when profiling is off, so instrumentation can
+    stay in hot paths.
+    """
+    profiler = _ACTIVE.profiler
+    if profiler is None:
+        return _NO_STAGE
+    return profiler.stage(name)
+
+
+def profiled(name: Optional[str] = None) -> Callable:
+    """Decorator recording every call of a function as a stage.
+
+    The stage is named after the function unless `name` is given.
+    """
+    def decorate(func: Callable) -> Callable:
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _ACTIVE.profiler
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.stage(stage_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def aggregate_profiles(reports: Iterable[dict]) -> dict:
+    """Combine profile reports of several runs (e.g. the studies of a batch).
+
+    Stage fields are summed across runs, except `max_seconds` (the
+    slowest single run) and `peak_bytes` (the largest peak); `runs`
+    counts the reports a stage appears in.
+    """
+    stages: dict[str, dict] = {}
+    runs = 0
+    total = 0.0
+    for report in reports:
+        runs += 1
+        total += report.get("total_seconds", 0.0)
+        for entry in report.get("stages", []):
+            agg = stages.get(entry["path"])
+            if agg is None:
+                agg = stages[entry["path"]] = {
+                    "path": entry["path"],
+                    "stage": entry["stage"],
+                    "depth": entry["depth"],
+                    "runs": 0,
+                    "calls": 0,
+                    "seconds": 0.0,
+                    "max_seconds": 0.0,
+                }
+            agg["runs"] += 1
+            agg["calls"] += entry["calls"]
+            agg["seconds"] += entry["seconds"]
+            agg["max_seconds"] = max(agg["max_seconds"], entry["seconds"])
+            if "peak_bytes" in entry:
+                agg["peak_bytes"] = max(agg.get("peak_bytes", 0), entry["peak_bytes"])
+                agg["net_bytes"] = agg.get("net_bytes", 0) + entry["net_bytes"]
+    for agg in stages.values():
+        agg["seconds"] = round(agg["seconds"], 6)
+    return {
+        "runs": runs,
+        "total_seconds": round(total, 6),
+        "stages": list(stages.values()),
+    }
+
+
+class UsdmIndex:
+    """Lookup tables for one loaded USDM document, built in a single walk.
+
+    Build it once per document and pass it to the validator and the
+    generators instead of the raw dict:
+
+        index = UsdmIndex(data)
+        index.get("Encounter_1")          # id -> object
+        index.path_of("Encounter_1")      # id -> "root.study.versions[0]..."
+        index.of_type("StudyEpoch")       # instanceType -> objects
+        index.referrers_of("Encounter_1") # id -> [(referring object id, path)]
+
+    The walk is iterative (no recursion limit) and tracks paths as
+    parent-pointer frames, so strings are only built on request. The
+    index does not follow later edits to `data`; rebuild it if the
+    document changes.
+
+    Attributes:
+        data: The indexed document
+        objects: id -> object (the last one wins on duplicate ids). Study
+            versions usually reuse ids, so per-version lookups go through
+            id_map() on that version's own list instead
+        paths: id -> JsonPath frame
+        by_type: instanceType -> objects, in document order
+        nodes: (object, JsonPath) for every JSON object, in document order
+        references: (ref_id, JsonPath, owner id) for every *Id/*Ids value,
+            in document order; the owner is the nearest enclosing object
+            with an id
+        referrers: ref_id -> [(owner id, JsonPath)]
+    """
+
+    def __init__(self, data: Any, root: str = "root"):
+        self.data = data
+        self.objects: dict[str, dict] = {}
+        self.paths: dict[str, JsonPath] = {}
+        self.by_type: dict[str, list[dict]] = {}
+        self.nodes: list[tuple[dict, JsonPath]] = []
+        self.references: list[tuple[str, JsonPath, Optional[str]]] = []
+        self.referrers: dict[str, list[tuple[Optional[str], JsonPath]]] = {}
+        self._path_cache: dict = {}
+        self._criterion_resolvers: dict = {}
+        self._id_maps: dict = {}
+        self._cell_matrices: dict = {}
+        self._activity_matrices: dict = {}
+        self._linked_lists: dict = {}
+        with profile_stage("index"):
+            self._build(data, root_path(root))
+
+    def _build(self, data: Any, root: JsonPath):
+        # Iterative pre-order walk with an explicit stack. References are
+        # queued as events alongside child nodes to keep document order.
+        objects = self.objects
+        paths = self.paths
+        by_type = self.by_type
+        nodes = self.nodes
+        references = self.references
+        referrers = self.referrers
+
+        stack = [(False, data, root, None)]
+        pop = stack.pop
+        push = stack.extend
+        while stack:
+            is_ref, value, path, owner = pop()
+            if is_ref:
+                references.append((value, path, owner))
+                if value in referrers:
+                    referrers[value].append((owner, path))
+                else:
+                    referrers[value] = [(owner, path)]
+                continue
+            if isinstance(value, dict):
+                nodes.append((value, path))
+                obj_id = value.get("id")
+                if obj_id is not None:
+                    objects[obj_id] = value
+                    paths[obj_id] = path
+                    owner = obj_id
+                instance_type = value.get("instanceType")
+                if isinstance(instance_type, str):
+                    if instance_type in by_type:
+                        by_type[instance_type].append(value)
+                    else:
+                        by_type[instance_type] = [value]
+                pending = []
+                for key, child_value in value.items():
+                    if isinstance(child_value, str):
+                        if key[-2:] == "Id" and key != "id":
+                            pending.append((True, child_value, (path, key), owner))
+                    elif isinstance(child_value, list):
+                        if not child_value:
+                            continue
+                        child = (path, key)
+                        if key[-3:] == "Ids":
+                            for i, ref_id in enumerate(child_value):
+                                if isinstance(ref_id, str):
+                                    pending.append((True, ref_id, (child, i), owner))
+                        pending.append((False, child_value, child, owner))
+                    elif isinstance(child_value, dict):
+                        pending.append((False, child_value, (path, key), owner))
+                pending.reverse()
+                push(pending)
+            elif isinstance(value, list):
+                pending = [
+                    (False, item, (path, i), owner)
+                    for i, item in enumerate(value)
+                    if isinstance(item, (dict, list))
+                ]
+                pending.reverse()
+                push(pending)
+
+    # The caches below are keyed on the identity of the list or design
+    # they were built from, never on its "id": amendment snapshots reuse
+    # ids across versions[], and each version must see its own objects.
+    # The source is stored alongside so a recycled id() is never served.
+
+    def criterion_resolver(self, criterion_items: list[dict]) -> "CriterionTextResolver":
+        """Shared CriterionTextResolver for one version's eligibilityCriterionItems."""
+        cached = self._criterion_resolvers.get(id(criterion_items))
+        if cached is None or cached[0] is not criterion_items:
+            cached = (criterion_items, CriterionTextResolver(criterion_items))
+            self._criterion_resolvers[id(criterion_items)] = cached
+        return cached[1]
+
+    def id_map(self, items: list[dict]) -> dict[str, dict]:
+        """Shared {id: item} for a list in this document (the first one wins)."""
+        cached = self._id_maps.get(id(items))
+        if cached is None or cached[0] is not items:
+            mapping: dict[str, dict] = {}
+            for item in items:
+                mapping.setdefault(item.get("id"), item)
+            cached = (items, mapping)
+            self._id_maps[id(items)] = cached
+        return cached[1]
+
+    def cell_matrix(self, design: dict) -> dict[tuple[str, str], list[dict]]:
+        """Shared build_cell_matrix() result for `design`, built once per index."""
+        cached = self._cell_matrices.get(id(design))
+        if cached is None or cached[0] is not design:
+            cached = (design, build_cell_matrix(design.get("studyCells", [])))
+            self._cell_matrices[id(design)] = cached
+        return cached[1]
+
+    def activity_matrix(self, design: dict) -> dict[tuple[str, str], list[dict]]:
+        """Shared build_activity_matrix() result for `design`, built once per index."""
+        cached = self._activity_matrices.get(id(design))
+        if cached is None or cached[0] is not design:
+            cached = (design, build_activity_matrix(design))
+            self._activity_matrices[id(design)] = cached
+        return cached[1]
+
+    def linked_list(self, items: list[dict]) -> "LinkedList":
+        """Shared LinkedList for a list in this document, built once per index."""
+        chain = self._linked_lists.get(id(items))
+        if chain is None or chain.items is not items:
+            chain = LinkedList(items)
+            self._linked_lists[id(items)] = chain
+        return chain
+
+    def __contains__(self, obj_id: str) -> bool:
+        return obj_id in self.objects
+
+    def get(self, obj_id: Optional[str], default: Any = None) -> Any:
+        """Return the object with this id, or `default`."""
+        return self.objects.get(obj_id, default)
+
+    def path_of(self, obj_id: str) -> Optional[str]:
+        """Return the dotted JSON path of the object with this id."""
+        path = self.paths.get(obj_id)
+        if path is None:
+            return None
+        return format_path(path, self._path_cache)
+
+    def of_type(self, instance_type: str) -> list[dict]:
+        """Return all objects with this instanceType, in document order."""
+        return self.by_type.get(instance_type, [])
+
+    def referrers_of(self, obj_id: str) -> list[tuple[Optional[str], str]]:
+        """Return (referring object id, field path) for each reference to `obj_id`."""
+        return [
+            (owner, format_path(path, self._path_cache))
+            for owner, path in self.referrers.get(obj_id, [])
+        ]
+
+
+def as_index(source: Any) -> UsdmIndex:
+    """Return `source` if it is already a UsdmIndex, else index it."""
+    if isinstance(source, UsdmIndex):
+        return source
+    return UsdmIndex(source)
+
+
+def split_index(source: Any) -> tuple[Any, Optional[UsdmIndex]]:
+    """Accept a raw USDM dict or a UsdmIndex; return (data, index or None)."""
+    if isinstance(source, UsdmIndex):
+        return source.data, source
+    return source, None
+
+
+def get_version_and_design(
+    data: dict, version_index: int = 0, design_index: int = 0
+) -> tuple[dict, dict]:
+    """Navigate to a StudyVersion and one of its StudyDesigns.
 
     In USDM v4.0.0, the path is:
-        data["study"]["versions"][0]["studyDesigns"][0]
+        data["study"]["versions"][v]["studyDesigns"][d]
+    and the first version and design are used by default.
 
     Returns:
         (version, design) tuple
@@ -22,53 +497,239 @@ def get_version_and_design(data: dict) -> tuple[dict, dict]:
         KeyError/IndexError if the expected structure is missing.
     """
     study = data["study"]
-    version = study["versions"][0]
-    design = version["studyDesigns"][0]
+    version = study["versions"][version_index]
+    design = version["studyDesigns"][design_index]
     return version, design
 
 
-def sort_linked_list(items: list[dict]) -> list[dict]:
+def list_design_pairs(data: dict) -> list[tuple[int, int]]:
+    """(version index, design index) of every StudyDesign, in document order."""
+    return [
+        (vi, di)
+        for vi, version in enumerate(data.get("study", {}).get("versions", []))
+        for di in range(len(version.get("studyDesigns", [])))
+    ]
+
+
+def design_label(version_index: int, design_index: int) -> str:
+    """Output name for one version/design pair, e.g. ``v1_d2`` (1-based)."""
+    return f"v{version_index + 1}_d{design_index + 1}"
+
+
+class LinkedList:
+    """Order and diagnose objects chained by previousId/nextId pointers.
+
+    Everything is computed in O(n) passes over the items, whatever the
+    shape of the links; broken chains never loop or go quadratic.
+
+        chain = LinkedList(design["encounters"])
+        chain.ordered      # every encounter once, in chain order
+        chain.cycles       # e.g. [["Encounter_3", "Encounter_4"]]
+
+    Use UsdmIndex.linked_list() to share one result between the
+    validator and the generators.
+
+    Attributes:
+        items: The input list
+        ordered: Every item exactly once: the chain of each head (in
+            input order of the heads), then chains without a head, then
+            cycles, each followed along nextId
+        chains: The chain of each head, as lists of items
+        heads: ids of the items with no previousId
+        dangling: (item id, field, target id) for links to ids that are
+            not in the list
+        asymmetric: (item id, field, target id) for links the target does
+            not return (A.nextId is B but B.previousId is not A, or the
+            reverse)
+        forks: (field, target id, [item ids]) for targets that several
+            items link to through the same field
+        cycles: The ids on each nextId cycle, in chain order
+        orphans: ids of the items no head reaches that are not on a cycle
+    """
+
+    def __init__(self, items: list[dict]):
+        self.items = items
+        n = len(items)
+        ids = [item.get("id") for item in items]
+        links = {
+            "previousId": [item.get("previousId") for item in items],
+            "nextId": [item.get("nextId") for item in items],
+        }
+        position = {item_id: i for i, item_id in enumerate(ids) if item_id is not None}
+
+        # Link targets as positions (-1: no link, None: dangling), then
+        # one pass per field for the findings
+        dangling = []  # (position, field rank, finding): sorted into item order below
+        self.asymmetric: list[tuple[str, str, str]] = []
+        forks: dict[tuple[str, str], list[str]] = {}
+        targets = {}
+        claims = {}  # field -> first item linking to each position (-1: none)
+        for rank, field, back_field in ((1, "previousId", "nextId"), (0, "nextId", "previousId")):
+            values = links[field]
+            back = links[back_field]
+            field_targets = targets[field] = [position.get(v) if v else -1 for v in values]
+            first_claim = claims[field] = [-1] * n
+            for i, target in enumerate(field_targets):
+                if target == -1:
+                    continue
+                if target is None:
+                    dangling.append((i, rank, (ids[i], field, values[i])))
+                    continue
+                if back[target] != ids[i]:
+                    self.asymmetric.append((ids[i], field, values[i]))
+                first = first_claim[target]
+                if first == -1:
+                    first_claim[target] = i
+                else:
+                    forks.setdefault((field, values[i]), [ids[first]]).append(ids[i])
+        self.dangling: list[tuple[str, str, str]] = [finding for _i, _rank, finding in sorted(dangling)]
+        heads = [i for i, target in enumerate(targets["previousId"]) if target == -1]
+        next_pos = [-1 if target is None else target for target in targets["nextId"]]
+        has_pred = [first != -1 for first in claims["nextId"]]
+        self.heads = [ids[i] for i in heads]
+        self.forks = [(field, target_id, claimants) for (field, target_id), claimants in forks.items()]
+
+        # Cycles: each item has at most one successor, so one coloring
+        # walk finds them all (0 new, 1 on the current path, 2 done)
+        state = [0] * n
+        on_cycle = [False] * n
+        self.cycles: list[list[str]] = []
+        for start in range(n):
+            path = []
+            i = start
+            while i >= 0 and state[i] == 0:
+                state[i] = 1
+                path.append(i)
+                i = next_pos[i]
+            if i >= 0 and state[i] == 1:
+                cycle = path[path.index(i):]
+                self.cycles.append([ids[j] for j in cycle])
+                for j in cycle:
+                    on_cycle[j] = True
+            for j in path:
+                state[j] = 2
+
+        # Ordering: walk from the heads, then from the starts of headless
+        # chains, then around whatever is left (the cycles)
+        visited = [False] * n
+
+        def walk(i: int) -> list[dict]:
+            chain = []
+            while i >= 0 and not visited[i]:
+                visited[i] = True
+                chain.append(items[i])
+                i = next_pos[i]
+            return chain
+
+        self.chains = [chain for chain in map(walk, heads) if chain]
+        reached = visited[:]
+        rest = [walk(i) for i in range(n) if not visited[i] and not has_pred[i]]
+        rest.extend(walk(i) for i in range(n) if not visited[i])
+        self.orphans = [ids[i] for i in range(n) if not reached[i] and not on_cycle[i]]
+        self.ordered = [item for chain in self.chains for item in chain]
+        self.ordered.extend(item for chain in rest for item in chain)
+
+
+def sort_linked_list(items: list[dict], index: Optional["UsdmIndex"] = None) -> list[dict]:
     """Sort objects connected by previousId/nextId linked-list pointers.
 
-    Finds the head (previousId is None/null), then follows nextId
-    to produce an ordered list. Items not reachable from the head
-    are appended at the end.
+    Each chain is followed from its head (previousId is None/null);
+    several heads give several chains, in input order. Items no head
+    reaches follow, still in nextId order (see LinkedList). With
+    `index`, the result is shared with the validator and other callers.
     """
     if not items:
         return []
+    if index is not None:
+        return index.linked_list(items).ordered
+    return LinkedList(items).ordered
 
-    by_id = {item["id"]: item for item in items}
-    by_prev = {}
-    head = None
 
-    for item in items:
-        prev_id = item.get("previousId")
-        if prev_id is None:
-            head = item
-        by_prev[prev_id] = item
+def build_cell_matrix(cells: list[dict]) -> dict[tuple[str, str], list[dict]]:
+    """Group StudyCells by (armId, epochId) in one pass.
 
-    if head is None:
-        return items  # fallback: return as-is if no head found
+    Replaces scanning all of design.studyCells for every (arm, epoch)
+    pair; cells keep their original order within each group.
 
-    ordered = []
-    current = head
-    visited = set()
-    while current and current["id"] not in visited:
-        ordered.append(current)
-        visited.add(current["id"])
-        next_id = current.get("nextId")
-        current = by_id.get(next_id) if next_id else None
+        matrix = build_cell_matrix(design.get("studyCells", []))
+        matrix.get((arm["id"], epoch["id"]), [])
+    """
+    matrix: dict[tuple[str, str], list[dict]] = {}
+    for cell in cells:
+        key = (cell.get("armId"), cell.get("epochId"))
+        if key in matrix:
+            matrix[key].append(cell)
+        else:
+            matrix[key] = [cell]
+    return matrix
 
-    # Append any unreachable items
-    for item in items:
-        if item["id"] not in visited:
-            ordered.append(item)
 
-    return ordered
+def build_activity_matrix(design: dict) -> dict[tuple[str, str], list[dict]]:
+    """Group ScheduledActivityInstances by (activityId, encounterId).
 
+    This is the Schedule of Activities incidence matrix: an activity is
+    scheduled at an encounter when the key is present. It is built in one
+    pass over every scheduleTimelines[].instances list. A sub-timeline
+    runs at the encounters of whatever invokes it, which is either an
+    instance with a timelineId or an activity with a timelineId. Its
+    instances without an encounterId of their own are placed at those
+    encounters. Nested sub-timelines are followed, and cycles are cut.
 
-def resolve_organization(scope_id: str, organizations: list[dict]) -> Optional[dict]:
-    """Find an organization by ID from the version.organizations[] array."""
+        matrix = build_activity_matrix(design)
+        if (activity["id"], encounter["id"]) in matrix:
+            ...
+    """
+    activity_timelines = {
+        a["id"]: a["timelineId"] for a in design.get("activities", []) if a.get("timelineId")
+    }
+    matrix: dict[tuple[str, str], list[dict]] = {}
+    unplaced: dict[str, list[dict]] = {}  # timeline id -> instances without an encounter
+    invoked: list[tuple[str, str]] = []  # (sub-timeline id, encounter id) still to place
+
+    def place(instance: dict, encounter_id: str):
+        for activity_id in instance.get("activityIds") or []:
+            key = (activity_id, encounter_id)
+            if key in matrix:
+                matrix[key].append(instance)
+            else:
+                matrix[key] = [instance]
+            if activity_id in activity_timelines:
+                invoked.append((activity_timelines[activity_id], encounter_id))
+        if instance.get("timelineId"):
+            invoked.append((instance["timelineId"], encounter_id))
+
+    for timeline in design.get("scheduleTimelines", []):
+        pending = unplaced.setdefault(timeline.get("id"), [])
+        for instance in timeline.get("instances", []):
+            if instance.get("encounterId"):
+                place(instance, instance["encounterId"])
+            else:
+                pending.append(instance)
+
+    placed = set()
+    while invoked:
+        key = invoked.pop()
+        if key in placed:
+            continue
+        placed.add(key)
+        timeline_id, encounter_id = key
+        for instance in unplaced.get(timeline_id, []):
+            place(instance, encounter_id)
+    return matrix
+
+
+def resolve_organization(
+    scope_id: str,
+    organizations: list[dict],
+    index: Optional[UsdmIndex] = None,
+) -> Optional[dict]:
+    """Find an organization by ID from the version.organizations[] array.
+
+    With an `index`, this is an O(1) lookup in the index's id map of
+    `organizations`, so other versions' organizations are never returned.
+    """
+    if index is not None:
+        return index.id_map(organizations).get(scope_id)
     for org in organizations:
         if org.get("id") == scope_id:
             return org
@@ -91,7 +752,11 @@ def get_study_title(version: dict, title_type: str = "Official Study Title") ->
     return ""
 
 
-def get_study_id(version: dict, org_type: str = "Drug Company") -> str:
+def get_study_id(
+    version: dict,
+    org_type: str = "Drug Company",
+    index: Optional[UsdmIndex] = None,
+) -> str:
     """Extract a study identifier by organization type.
 
     Resolves the scopeId to find the matching organization, then
@@ -101,11 +766,12 @@ def get_study_id(version: dict, org_type: str = "Drug Company") -> str:
         version: The StudyVersion object
         org_type: Organization type decode to match (e.g., "Drug Company",
                   "Study Registry", "Regulatory Agency")
+        index: Optional UsdmIndex for O(1) organization lookup
     """
     organizations = version.get("organizations", [])
     for sid in version.get("studyIdentifiers", []):
         scope_id = sid.get("scopeId", "")
-        org = resolve_organization(scope_id, organizations)
+        org = resolve_organization(scope_id, organizations, index)
         if org:
             org_type_decode = org.get("type", {}).get("decode", "")
             if org_type.lower() in org_type_decode.lower():
@@ -117,7 +783,7 @@ def get_study_id(version: dict, org_type: str = "Drug Company") -> str:
     return "UNKNOWN"
 
 
-def get_sponsor_info(version: dict) -> dict:
+def get_sponsor_info(version: dict, index: Optional[UsdmIndex] = None) -> dict:
     """Extract sponsor name and protocol number from version data.
 
     Searches organizations for Drug Company or Sponsor types.
@@ -125,7 +791,7 @@ def get_sponsor_info(version: dict) -> dict:
     organizations = version.get("organizations", [])
     for sid in version.get("studyIdentifiers", []):
         scope_id = sid.get("scopeId", "")
-        org = resolve_organization(scope_id, organizations)
+        org = resolve_organization(scope_id, organizations, index)
         if org:
             org_type_decode = org.get("type", {}).get("decode", "").lower()
             if "drug company" in org_type_decode or "sponsor" in org_type_decode:
@@ -136,12 +802,12 @@ def get_sponsor_info(version: dict) -> dict:
     return {"name": "TBD", "protocol_number": "TBD"}
 
 
-def get_registry_id(version: dict) -> str:
+def get_registry_id(version: dict, index: Optional[UsdmIndex] = None) -> str:
     """Extract registry identifier (e.g., NCT number)."""
     organizations = version.get("organizations", [])
     for sid in version.get("studyIdentifiers", []):
         scope_id = sid.get("scopeId", "")
-        org = resolve_organization(scope_id, organizations)
+        org = resolve_organization(scope_id, organizations, index)
         if org:
             org_type_decode = org.get("type", {}).get("decode", "").lower()
             if "registry" in org_type_decode:
@@ -149,9 +815,83 @@ def get_registry_id(version: dict) -> str:
     return ""
 
 
+_USDM_TAG_RE = re.compile(r"<usdm:tag[^/]*/?>")
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def criterion_item_plain_text(text: str) -> str:
+    """Strip <usdm:tag> templates and HTML tags from criterion item text."""
+    text = _USDM_TAG_RE.sub("[...]", text)
+    text = _HTML_TAG_RE.sub("", text)
+    return text.strip()
+
+
+def _criterion_fallback_text(criterion: dict) -> str:
+    """Criterion's own fields, used when no item text can be resolved."""
+    return (
+        criterion.get("description", "")
+        or criterion.get("label", "")
+        or criterion.get("name", "")
+    )
+
+
+class CriterionTextResolver:
+    """Resolve plain text for many eligibility criteria at once.
+
+    Items are indexed by id in one pass over `criterion_items` (one
+    version's eligibilityCriterionItems), and the stripped text of each
+    item is computed at most once, so resolving N criteria costs
+    O(N + items) rather than O(N x items).
+    """
+
+    def __init__(self, criterion_items: list[dict] = ()):
+        self._items: dict[str, dict] = {}
+        for item in criterion_items:
+            item_id = item.get("id")
+            # Keep the first item with text, as the old linear scan did
+            if item_id not in self._items or not self._items[item_id].get("text"):
+                self._items[item_id] = item
+        self._texts: dict[str, str] = {}
+
+    def item_text(self, item_id: str) -> str:
+        """Plain text of the EligibilityCriterionItem `item_id` ("" if none)."""
+        text = self._texts.get(item_id)
+        if text is None:
+            item = self._items.get(item_id)
+            raw = item.get("text", "") if item else ""
+            text = criterion_item_plain_text(raw) if raw else ""
+            self._texts[item_id] = text
+        return text
+
+    def text(self, criterion: dict) -> str:
+        """Resolve one criterion's text, falling back to its own fields."""
+        item_id = criterion.get("criterionItemId")
+        if item_id:
+            text = self.item_text(item_id)
+            if text:
+                return text
+        return _criterion_fallback_text(criterion)
+
+    def resolve_all(self, criteria: list[dict]) -> list[str]:
+        """Resolve the text of every criterion, in order."""
+        return [self.text(c) for c in criteria]
+
+
+def resolve_criteria_text(
+    criteria: list[dict],
+    criterion_items: list[dict],
+    index: Optional[UsdmIndex] = None,
+) -> list[str]:
+    """Resolve plain text for all `criteria` in one pass (see get_criterion_text)."""
+    if index is not None:
+        return index.criterion_resolver(criterion_items).resolve_all(criteria)
+    return CriterionTextResolver(criterion_items).resolve_all(criteria)
+
+
 def get_criterion_text(
     criterion: dict,
     criterion_items: list[dict],
+    index: Optional[UsdmIndex] = None,
 ) -> str:
     """Resolve eligibility criterion text via criterionItemId.
 
@@ -160,7 +900,12 @@ def get_criterion_text(
     The actual text (possibly with <usdm:tag> templates) is on the item.
 
     Falls back to criterion's own description if no item found.
+    With an `index`, the item is looked up in O(1) and its text is
+    memoized on the index, per `criterion_items` list. Use
+    resolve_criteria_text() for many criteria.
     """
+    if index is not None:
+        return index.criterion_resolver(criterion_items).text(criterion)
     item_id = criterion.get("criterionItemId")
     if item_id:
         for item in criterion_items:
@@ -168,16 +913,9 @@ def get_criterion_text(
                 text = item.get("text", "")
                 if text:
                     # Strip HTML tags for plain-text usage
-                    import re
-                    text = re.sub(r"<usdm:tag[^/]*/?>", "[...]", text)
-                    text = re.sub(r"<[^>]+>", "", text)
-                    return text.strip()
+                    return criterion_item_plain_text(text)
     # Fallback to criterion's own fields
-    return (
-        criterion.get("description", "")
-        or criterion.get("label", "")
-        or criterion.get("name", "")
-    )
+    return _criterion_fallback_text(criterion)
 
 
 def get_enrollment_number(design: dict) -> str:
@@ -198,3 +936,349 @@ def get_enrollment_number(design: dict) -> str:
     elif min_val is not None:
         return str(min_val)
     return "TBD"
+
+
+# ---------------------------------------------------------------------------
+# JSON loading
+# ---------------------------------------------------------------------------
+
+# Fastest installed backend first; USDM_JSON_BACKEND=json|ujson|orjson
+# forces a specific one (e.g. to compare outputs).
+_JSON_BACKENDS = {"orjson": orjson, "ujson": ujson, "json": json}
+
+
+def select_json_backend(name: Optional[str] = None) -> str:
+    """Pick the JSON backend used by json_loads/json_dumps/read_json/write_json.
+
+    Args:
+        name: "orjson", "ujson" or "json"; None picks the fastest installed
+              one (honouring the USDM_JSON_BACKEND environment variable)
+    Returns:
+        The name of the selected backend.
+    Raises:
+        ValueError if the requested backend is unknown or not installed.
+    """
+    global JSON_BACKEND
+    name = name or os.environ.get("USDM_JSON_BACKEND")
+    if name:
+        if _JSON_BACKENDS.get(name) is None:
+            raise ValueError(f"JSON backend '{name}' is not available")
+        JSON_BACKEND = name
+    else:
+        JSON_BACKEND = next(n for n, mod in _JSON_BACKENDS.items() if mod is not None)
+    return JSON_BACKEND
+
+
+JSON_BACKEND = "json"
+try:
+    select_json_backend()
+except ValueError as exc:
+    # A bad USDM_JSON_BACKEND must not stop every script at import time.
+    warnings.warn(f"{exc}; USDM_JSON_BACKEND ignored, using the stdlib json module")
+    select_json_backend("json")
+
+
+def json_loads(data: Any) -> Any:
+    """Parse JSON from str, bytes, bytearray or memoryview with the selected backend.
+
+    orjson parses bytes-like input directly, without decoding it to a
+    str first.
+    """
+    if JSON_BACKEND == "orjson":
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if JSON_BACKEND == "ujson":
+        return ujson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj: Any, indent: Optional[int] = None) -> str:
+    """Serialize to a JSON str with the selected backend.
+
+    Output is byte-identical across backends only for ASCII content:
+    non-ASCII characters are escaped by the stdlib and ujson backends and
+    written as UTF-8 by orjson. The parsed result is the same.
+    """
+    if JSON_BACKEND == "orjson" and indent in (None, 2):
+        option = orjson.OPT_INDENT_2 if indent == 2 else 0
+        return orjson.dumps(obj, option=option).decode("utf-8")
+    if JSON_BACKEND == "ujson":
+        return ujson.dumps(obj, indent=indent or 0, escape_forward_slashes=False)
+    return json.dumps(obj, indent=indent)
+
+
+def read_json(path: str, use_mmap: bool = False) -> Any:
+    """Read and parse a JSON file with the selected backend.
+
+    With `use_mmap`, the file is memory-mapped and handed to the parser as
+    a buffer, so with orjson the document bytes are never copied into a
+    separate str/bytes object.
+    """
+    with open(path, "rb") as f:
+        if use_mmap and os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    return json_loads(view)
+                finally:
+                    view.release()
+        return json_loads(f.read())
+
+
+def write_json(obj: Any, path: str, indent: Optional[int] = 2):
+    """Serialize `obj` to a JSON file with the selected backend."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json_dumps(obj, indent=indent))
+
+
+# Sections the SDTM and M11 generators never read. Each entry is a dotted
+# path in ijson prefix notation ("item" stands for any array element).
+GENERATOR_SKIP_SECTIONS = (
+    "study.documentedBy",
+    "study.versions.item.narrativeContentItems",
+    "study.versions.item.biomedicalConcepts",
+    "study.versions.item.bcCategories",
+    "study.versions.item.bcSurrogates",
+    "study.versions.item.dictionaries",
+    "study.versions.item.conditions",
+    "study.versions.item.abbreviations",
+)
+
+_CONTAINER_START = ("start_map", "start_array")
+_CONTAINER_END = ("end_map", "end_array")
+
+
+def _build_from_events(events: Iterable[tuple], skip: frozenset) -> Any:
+    """Assemble JSON values from ijson parse events, dropping `skip` sections.
+
+    Skipped values are consumed event by event and never materialized.
+    """
+    root = None
+    stack: list[list] = []  # [container, current key] frames
+    skip_next = False
+    skip_depth = 0
+
+    for prefix, event, value in events:
+        if skip_depth:
+            if event in _CONTAINER_START:
+                skip_depth += 1
+            elif event in _CONTAINER_END:
+                skip_depth -= 1
+            continue
+        if skip_next:
+            skip_next = False
+            if event in _CONTAINER_START:
+                skip_depth = 1
+            continue
+
+        if event == "map_key":
+            if (f"{prefix}.{value}" if prefix else value) in skip:
+                skip_next = True
+            else:
+                stack[-1][1] = value
+            continue
+        if event in _CONTAINER_END:
+            stack.pop()
+            continue
+
+        if event == "start_map":
+            value = {}
+        elif event == "start_array":
+            value = []
+
+        if not stack:
+            root = value
+        else:
+            container, key = stack[-1]
+            if key is None:
+                container.append(value)
+            else:
+                container[key] = value
+        if event in _CONTAINER_START:
+            stack.append([value, None])
+
+    return root
+
+
+def _prune_sections(data: Any, skip: Iterable[str]):
+    """Remove `skip` sections from an already parsed document (stdlib fallback)."""
+    for section in skip:
+        *parents, last = section.split(".")
+        targets = [data]
+        for part in parents:
+            if part == "item":
+                targets = [item for t in targets if isinstance(t, list) for item in t]
+            else:
+                targets = [t[part] for t in targets if isinstance(t, dict) and part in t]
+        for target in targets:
+            if isinstance(target, dict):
+                target.pop(last, None)
+
+
+@profiled("load")
+def load_usdm_file(path: str, skip_sections: Iterable[str] = ()) -> dict:
+    """Load a USDM JSON file, optionally leaving out whole sections.
+
+    With `skip_sections` (see GENERATOR_SKIP_SECTIONS) and ijson
+    installed, the file is streamed through ijson's event parser and the
+    skipped sections are never materialized, so peak memory is bounded by
+    what is kept. Without ijson the stdlib parser loads everything and
+    the sections are dropped afterwards: same result, no memory saving.
+    Use load_usdm_section() to fetch a skipped section later on demand.
+
+    Full loads go through read_json(), i.e. the fastest installed backend.
+    """
+    skip = frozenset(skip_sections)
+    if skip and ijson is not None:
+        with open(path, "rb") as f:
+            return _build_from_events(ijson.parse(f, use_float=True), skip)
+
+    data = read_json(path)
+    if skip:
+        _prune_sections(data, skip)
+    return data
+
+
+def load_usdm_section(path: str, section: str) -> list:
+    """Load one section on demand, e.g. "study.versions.item.biomedicalConcepts".
+
+    Returns one value per match (one per version for "item" paths).
+    """
+    if ijson is not None:
+        with open(path, "rb") as f:
+            return list(ijson.items(f, section, use_float=True))
+
+    targets = [read_json(path)]
+    for part in section.split("."):
+        if part == "item":
+            targets = [item for t in targets if isinstance(t, list) for item in t]
+        else:
+            targets = [t[part] for t in targets if isinstance(t, dict) and part in t]
+    return targets
+
+
+# ---------------------------------------------------------------------------
+# Batch processing
+# ---------------------------------------------------------------------------
+
+_GLOB_CHARS = ("*", "?", "[")
+
+
+def is_batch_input(spec: str) -> bool:
+    """True if `spec` names a directory or a glob rather than a single file.
+
+    An existing file is never a glob, even if its name contains ``[``.
+    """
+    if os.path.isfile(spec):
+        return False
+    return os.path.isdir(spec) or any(ch in spec for ch in _GLOB_CHARS)
+
+
+def expand_inputs(spec: str) -> list[str]:
+    """Expand a file, directory (all *.json inside) or glob into sorted paths."""
+    if os.path.isdir(spec):
+        return sorted(str(p) for p in Path(spec).glob("*.json") if p.is_file())
+    if not os.path.isfile(spec) and any(ch in spec for ch in _GLOB_CHARS):
+        return sorted(p for p in glob.glob(spec, recursive=True) if os.path.isfile(p))
+    return [spec]
+
+
+def batch_output_names(inputs: list[str]) -> dict[str, str]:
+    """Map each input path to a unique output stem (file name without suffix).
+
+    Inputs from different directories that share a file name get a
+    numeric suffix (``study``, ``study_2``, ...).
+    """
+    names: dict[str, str] = {}
+    seen: dict[str, int] = {}
+    for path in inputs:
+        stem = Path(path).stem
+        count = seen.get(stem, 0) + 1
+        seen[stem] = count
+        names[path] = stem if count == 1 else f"{stem}_{count}"
+    return names
+
+
+def _run_batch_item(worker: Callable[..., dict], input_path: str, args: tuple) -> dict:
+    """Run one batch work unit, turning any exception into a failed entry."""
+    start = time.perf_counter()
+    entry = {"input": input_path}
+    try:
+        entry.update(worker(input_path, *args) or {})
+        entry.setdefault("status", "ok")
+    except Exception as exc:  # one bad file must not abort the batch
+        entry["status"] = "error"
+        entry["error"] = f"{type(exc).__name__}: {exc}"
+    entry["seconds"] = round(time.perf_counter() - start, 4)
+    return entry
+
+
+def run_batch(
+    worker: Callable[..., dict],
+    items: list[tuple[str, tuple]],
+    jobs: Optional[int] = None,
+    on_result: Optional[Callable[[dict], None]] = None,
+    executor: str = "process",
+) -> list[dict]:
+    """Process many studies (or study designs) across a worker pool.
+
+    Args:
+        worker: Module-level (picklable) function called as
+                ``worker(input_path, *args)``; returns a dict of summary
+                fields for that study and may raise on failure
+        items: (input_path, args) work units
+        jobs: Number of worker processes (default: CPU count); 1 runs
+              everything in this process
+        on_result: Optional callback invoked as each study finishes
+        executor: "process" (default) or "thread"; threads share memory
+                  with the caller, so `args` need not be picklable
+
+    Returns:
+        One summary dict per input, in input order. Failures are recorded
+        with ``status: "error"`` instead of being raised.
+    """
+    results: list[Optional[dict]] = [None] * len(items)
+    if jobs == 1 or len(items) <= 1:
+        for i, (input_path, args) in enumerate(items):
+            results[i] = _run_batch_item(worker, input_path, args)
+            if on_result:
+                on_result(results[i])
+        return results
+
+    pool_class = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+    with pool_class(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(_run_batch_item, worker, input_path, args): i
+            for i, (input_path, args) in enumerate(items)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as exc:  # e.g. a worker process died
+                results[i] = {
+                    "input": items[i][0],
+                    "status": "error",
+                    "error": f"{type(exc).__name__}: {exc}",
+                }
+            if on_result:
+                on_result(results[i])
+    return results
+
+
+def write_batch_summary(results: list[dict], path: str, tool: str) -> dict:
+    """Write the aggregate summary of a batch run as JSON and return it."""
+    summary = {
+        "tool": tool,
+        "total": len(results),
+        "succeeded": sum(1 for r in results if r.get("status") == "ok"),
+        "failed": sum(1 for r in results if r.get("status") != "ok"),
+        "studies": results,
+    }
+    profiles = [r["profile"] for r in results if r.get("profile")]
+    if profiles:
+        summary["profile"] = aggregate_profiles(profiles)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    write_json(summary, path)
+    return summary
@@ -18,14 +18,44 @@ Checks:
 
 Usage:
     python usdm_validator.py --input study_definition.json
+
+    # Batch mode: every *.json in a directory (or a glob), in parallel
+    python usdm_validator.py --input studies/ --output-dir reports/ --jobs 8
+
+    # Amendment review: only re-check what changed since the previous version
+    # (validates original.json first; the speedup is in the IncrementalValidator API)
+    python usdm_validator.py --input amended.json --previous original.json
 """
 
-import json
 import argparse
+import os
 import sys
-from typing import Any
-
-from usdm_utils import get_version_and_design, sort_linked_list, get_criterion_text
+from typing import Any, Optional, Union
+
+from usdm_utils import (
+    JsonPath,
+    UsdmIndex,
+    format_path,
+    root_path,
+    split_index,
+    load_usdm_file,
+    write_json,
+    profiled,
+    profile_stage,
+    profiling,
+    is_batch_input,
+    expand_inputs,
+    batch_output_names,
+    run_batch,
+    write_batch_summary,
+    get_version_and_design,
+    sort_linked_list,
+    LinkedList,
+    get_criterion_text,
+)
+from usdm_cache import ResultCache, resolve_cache_dir
+
+TOOL = "usdm_validator"
 
 
 class ValidationResult:
@@ -43,6 +73,21 @@ class ValidationResult:
     def add_info(self, msg: str):
         self.info.append(f"INFO: {msg}")
 
+    def extend(self, other: "ValidationResult"):
+        """Append all messages from another result, preserving order."""
+        self.errors.extend(other.errors)
+        self.warnings.extend(other.warnings)
+        self.info.extend(other.info)
+
+    @classmethod
+    def from_report(cls, report: dict) -> "ValidationResult":
+        """Rebuild a result from its build_report() form (e.g. a cached report)."""
+        result = cls()
+        result.errors = list(report["errors"])
+        result.warnings = list(report["warnings"])
+        result.info = list(report["info"])
+        return result
+
     @property
     def is_valid(self) -> bool:
         return len(self.errors) == 0
@@ -73,79 +118,236 @@ class ValidationResult:
         return "\n".join(lines)
 
 
-def collect_ids(obj: Any, path: str = "") -> dict[str, str]:
-    """Recursively collect all 'id' fields and their paths."""
-    ids = {}
-    if isinstance(obj, dict):
-        if "id" in obj and obj["id"] is not None:
-            ids[obj["id"]] = path
-        for key, value in obj.items():
-            ids.update(collect_ids(value, f"{path}.{key}"))
-    elif isinstance(obj, list):
-        for i, item in enumerate(obj):
-            ids.update(collect_ids(item, f"{path}[{i}]"))
-    return ids
+class PrefixedResult:
+    """Writes to another ValidationResult, prefixing every message with a location."""
 
+    def __init__(self, result: ValidationResult, prefix: str):
+        self.result = result
+        self.prefix = prefix
 
-def collect_references(obj: Any, path: str = "") -> list[tuple[str, str]]:
-    """Recursively collect all *Id and *Ids reference fields."""
-    refs = []
-    if isinstance(obj, dict):
-        for key, value in obj.items():
-            if key.endswith("Id") and key != "id" and isinstance(value, str):
-                refs.append((value, f"{path}.{key}"))
-            elif key.endswith("Ids") and isinstance(value, list):
-                for i, ref_id in enumerate(value):
-                    if isinstance(ref_id, str):
-                        refs.append((ref_id, f"{path}.{key}[{i}]"))
-            else:
-                refs.extend(collect_references(value, f"{path}.{key}"))
-    elif isinstance(obj, list):
-        for i, item in enumerate(obj):
-            refs.extend(collect_references(item, f"{path}[{i}]"))
-    return refs
+    def error(self, msg: str):
+        self.result.error(f"{self.prefix}: {msg}")
+
+    def warning(self, msg: str):
+        self.result.warning(f"{self.prefix}: {msg}")
 
+    def add_info(self, msg: str):
+        self.result.add_info(f"{self.prefix}: {msg}")
 
-def validate_instance_types(obj: Any, path: str, result: ValidationResult):
+
+class NodeRule:
+    """Base class for checks run by :class:`TraversalEngine`.
+
+    Subclasses override ``visit`` (called once per JSON object),
+    ``visit_reference`` (called once per ``*Id``/``*Ids`` value) and/or
+    ``finish`` (called after the walk). Messages go to the ``result``
+    passed in, which is a per-rule buffer merged in registration order.
+
+    ``path`` is a parent-pointer :data:`JsonPath` frame; render it with
+    ``format_path`` only when a message is actually emitted.
+
+    Rules whose ``visit`` messages depend only on the object and its path
+    set ``node_local``; :class:`IncrementalValidator` reuses their
+    messages for unchanged objects.
+    """
+
+    node_local = False
+
+    def visit(self, obj: dict, path: JsonPath, result: ValidationResult):
+        pass
+
+    def visit_reference(self, ref_id: str, path: JsonPath, result: ValidationResult):
+        pass
+
+    def finish(self, result: ValidationResult):
+        pass
+
+
+class TraversalEngine:
+    """Run every registered rule over a USDM document in a single walk.
+
+    The walk itself is done once by :class:`UsdmIndex`; the engine then
+    dispatches each object and reference to the rules. Each rule writes
+    into its own buffer, so the merged report keeps the same message
+    order as running the rules one after another.
+    """
+
+    def __init__(self, rules: list[NodeRule] = None):
+        self.rules: list[NodeRule] = list(rules or [])
+
+    def add_rule(self, rule: NodeRule) -> NodeRule:
+        self.rules.append(rule)
+        return rule
+
+    def run(self, data: Any, path: str = "root", result: ValidationResult = None) -> ValidationResult:
+        """Run the rules over `data` (a raw document or a prebuilt UsdmIndex)."""
+        if result is None:
+            result = ValidationResult()
+        index = data if isinstance(data, UsdmIndex) else UsdmIndex(data, path)
+        buffers = [(rule, ValidationResult()) for rule in self.rules]
+
+        on_object = self._overridden(buffers, "visit")
+        if on_object:
+            for obj, obj_path in index.nodes:
+                for visit, buffer in on_object:
+                    visit(obj, obj_path, buffer)
+        on_reference = self._overridden(buffers, "visit_reference")
+        if on_reference:
+            for ref_id, ref_path, _owner in index.references:
+                for visit, buffer in on_reference:
+                    visit(ref_id, ref_path, buffer)
+
+        for rule, buffer in buffers:
+            rule.finish(buffer)
+            result.extend(buffer)
+        return result
+
+    @staticmethod
+    def _overridden(buffers: list, name: str) -> list:
+        """Bound callbacks for the rules that actually implement `name`."""
+        base = getattr(NodeRule, name)
+        return [
+            (getattr(rule, name), buffer)
+            for rule, buffer in buffers
+            if getattr(type(rule), name) is not base
+        ]
+
+
+class IdCollector(NodeRule):
+    """Collect all 'id' fields and their paths."""
+
+    def __init__(self):
+        self.ids: dict[str, JsonPath] = {}
+
+    def visit(self, obj, path, result):
+        if obj.get("id") is not None:
+            self.ids[obj["id"]] = path
+
+
+class ReferenceCollector(NodeRule):
+    """Collect all *Id and *Ids reference fields."""
+
+    def __init__(self):
+        self.refs: list[tuple[str, JsonPath]] = []
+
+    def visit_reference(self, ref_id, path, result):
+        self.refs.append((ref_id, path))
+
+
+class CrossReferenceRule(NodeRule):
+    """Check that every *Id/*Ids reference points to an existing object."""
+
+    max_reported = 20  # Cap output
+
+    def __init__(self):
+        self.ids = IdCollector()
+        self.refs = ReferenceCollector()
+
+    def visit(self, obj, path, result):
+        self.ids.visit(obj, path, result)
+
+    def visit_reference(self, ref_id, path, result):
+        self.refs.visit_reference(ref_id, path, result)
+
+    def finish(self, result):
+        all_ids = self.ids.ids
+        all_refs = self.refs.refs
+        orphan_refs = [(ref_id, path) for ref_id, path in all_refs if ref_id not in all_ids]
+        self.report(orphan_refs, len(all_refs), result)
+
+    def report(self, orphan_refs: list[tuple[str, JsonPath]], ref_count: int, result: ValidationResult):
+        """Emit the messages for the unresolved references, in document order."""
+        if orphan_refs:
+            for ref_id, path in orphan_refs[:self.max_reported]:
+                result.error(f"Broken reference at {format_path(path)}: '{ref_id}' not found")
+            if len(orphan_refs) > self.max_reported:
+                result.error(f"... and {len(orphan_refs) - self.max_reported} more broken references")
+        else:
+            result.add_info(f"All {ref_count} cross-references are valid")
+
+
+class InstanceTypeRule(NodeRule):
     """Check that instanceType is present on all objects that should have it."""
-    if isinstance(obj, dict):
+
+    node_local = True
+
+    def visit(self, obj, path, result):
         if "id" in obj and "instanceType" not in obj:
-            result.warning(f"Object at {path} has 'id' but no 'instanceType'")
-        for key, value in obj.items():
-            validate_instance_types(value, f"{path}.{key}", result)
-    elif isinstance(obj, list):
-        for i, item in enumerate(obj):
-            validate_instance_types(item, f"{path}[{i}]", result)
+            result.warning(f"Object at {format_path(path)} has 'id' but no 'instanceType'")
 
 
-def validate_extension_attributes(obj: Any, path: str, result: ValidationResult):
+class ExtensionAttributesRule(NodeRule):
     """Check that extensionAttributes is present on objects with id."""
-    if isinstance(obj, dict):
+
+    node_local = True
+
+    def visit(self, obj, path, result):
         if "id" in obj and obj["id"] is not None and "extensionAttributes" not in obj:
-            result.warning(f"Object at {path} missing 'extensionAttributes'")
-        for key, value in obj.items():
-            validate_extension_attributes(value, f"{path}.{key}", result)
-    elif isinstance(obj, list):
-        for i, item in enumerate(obj):
-            validate_extension_attributes(item, f"{path}[{i}]", result)
+            result.warning(f"Object at {format_path(path)} missing 'extensionAttributes'")
 
 
-def validate_code_objects(obj: Any, path: str, result: ValidationResult):
+class CodeObjectRule(NodeRule):
     """Validate Code objects have required fields."""
-    if isinstance(obj, dict):
+
+    node_local = True
+
+    def visit(self, obj, path, result):
         if obj.get("instanceType") == "Code":
             for field in ["code", "codeSystem", "decode"]:
                 if field not in obj or not obj[field]:
-                    result.error(f"Code at {path} missing required field '{field}'")
-        for key, value in obj.items():
-            validate_code_objects(value, f"{path}.{key}", result)
-    elif isinstance(obj, list):
-        for i, item in enumerate(obj):
-            validate_code_objects(item, f"{path}[{i}]", result)
+                    result.error(f"Code at {format_path(path)} missing required field '{field}'")
+
+
+def default_node_rules() -> list[NodeRule]:
+    """Per-node rules run by validate_study, in report order."""
+    return [
+        CrossReferenceRule(),
+        InstanceTypeRule(),
+        ExtensionAttributesRule(),
+        CodeObjectRule(),
+    ]
+
+
+def collect_ids(obj: Any, path: str = "") -> dict[str, str]:
+    """Collect all 'id' fields and their paths."""
+    collector = IdCollector()
+    TraversalEngine([collector]).run(obj, path)
+    cache = {}
+    return {obj_id: format_path(id_path, cache) for obj_id, id_path in collector.ids.items()}
+
+
+def collect_references(obj: Any, path: str = "") -> list[tuple[str, str]]:
+    """Collect all *Id and *Ids reference fields."""
+    collector = ReferenceCollector()
+    TraversalEngine([collector]).run(obj, path)
+    cache = {}
+    return [(ref_id, format_path(ref_path, cache)) for ref_id, ref_path in collector.refs]
+
+
+def validate_instance_types(obj: Any, path: str, result: ValidationResult):
+    """Check that instanceType is present on all objects that should have it."""
+    TraversalEngine([InstanceTypeRule()]).run(obj, path, result)
+
+
+def validate_extension_attributes(obj: Any, path: str, result: ValidationResult):
+    """Check that extensionAttributes is present on objects with id."""
+    TraversalEngine([ExtensionAttributesRule()]).run(obj, path, result)
+
+
+def validate_code_objects(obj: Any, path: str, result: ValidationResult):
+    """Validate Code objects have required fields."""
+    TraversalEngine([CodeObjectRule()]).run(obj, path, result)
 
 
-def validate_linked_list(items: list[dict], item_name: str, result: ValidationResult):
-    """Validate a linked-list (previousId/nextId) for consistency."""
+def validate_linked_list(
+    items: list[dict], item_name: str, result: ValidationResult, index: Optional[UsdmIndex] = None
+):
+    """Validate a linked-list (previousId/nextId) for consistency.
+
+    Reports dangling links, cycles, forks, links that the target does
+    not return and items no head reaches (see usdm_utils.LinkedList).
+    With `index`, the analysis is shared with the generators.
+    """
     if not items:
         return
 
@@ -154,28 +356,38 @@ def validate_linked_list(items: list[dict], item_name: str, result: ValidationRe
     if not has_linked:
         return
 
-    by_id = {item["id"]: item for item in items}
+    chain = index.linked_list(items) if index is not None else LinkedList(items)
 
-    heads = [item for item in items if item.get("previousId") is None]
-    if len(heads) == 0:
+    if not chain.heads:
         result.warning(f"{item_name}: No linked-list head found (no item with previousId=null)")
-    elif len(heads) > 1:
+    elif len(chain.heads) > 1 and any(len(c) > 1 for c in chain.chains):
         # Multiple heads is OK (e.g., separate inclusion/exclusion lists)
-        pass
-
-    for item in items:
-        next_id = item.get("nextId")
-        prev_id = item.get("previousId")
-        if next_id and next_id not in by_id:
-            result.error(f"{item_name}: Item '{item['id']}' has nextId '{next_id}' that doesn't exist")
-        if prev_id and prev_id not in by_id:
-            result.error(f"{item_name}: Item '{item['id']}' has previousId '{prev_id}' that doesn't exist")
-
-
-def validate_study(data: dict) -> ValidationResult:
-    """Main validation entry point."""
-    result = ValidationResult()
-
+        result.add_info(f"{item_name}: {len(chain.heads)} separate chains")
+
+    for item_id, field, target_id in chain.dangling:
+        result.error(f"{item_name}: Item '{item_id}' has {field} '{target_id}' that doesn't exist")
+    for cycle in chain.cycles:
+        result.error(f"{item_name}: nextId cycle {' -> '.join(cycle + cycle[:1])}")
+    for field, target_id, item_ids in chain.forks:
+        listed = ", ".join(f"'{i}'" for i in item_ids)
+        result.error(f"{item_name}: Items {listed} all have {field} '{target_id}'")
+    for item_id, field, target_id in chain.asymmetric:
+        back_field = "previousId" if field == "nextId" else "nextId"
+        result.warning(f"{item_name}: Item '{item_id}' has {field} '{target_id}', "
+                       f"but '{target_id}' does not link back through {back_field}")
+    if chain.orphans:
+        shown = ", ".join(chain.orphans[:5]) + (", ..." if len(chain.orphans) > 5 else "")
+        result.warning(f"{item_name}: {len(chain.orphans)} item(s) not reachable from a head: {shown}")
+
+
+def validate_structure(data: dict, result: ValidationResult, index: Optional[UsdmIndex] = None) -> bool:
+    """Envelope, version and study design checks, i.e. everything except
+    the per-node rules.
+
+    Returns False if the document is too broken for the per-node checks
+    (no study, versions or designs). With `index`, linked-list analyses
+    are stored there for reuse by the generators.
+    """
     # 1. Envelope fields
     usdm_version = data.get("usdmVersion")
     if usdm_version:
@@ -192,7 +404,7 @@ def validate_study(data: dict) -> ValidationResult:
     # 2. Root study object
     if "study" not in data:
         result.error("Missing root 'study' object")
-        return result
+        return False
 
     study = data["study"]
 
@@ -203,11 +415,23 @@ def validate_study(data: dict) -> ValidationResult:
     versions = study.get("versions", [])
     if not versions:
         result.error("Study has no 'versions' array (required in v4.0.0)")
-        return result
+        return False
 
     result.add_info(f"Found {len(versions)} study version(s)")
-    version = versions[0]
+    complete = True
+    for vi, version in enumerate(versions):
+        # Messages about later versions are prefixed with their location
+        target = result if vi == 0 else PrefixedResult(result, f"versions[{vi}]")
+        complete = validate_version(version, target, index) and complete
+    return complete
 
+
+def validate_version(version: dict, result: ValidationResult, index: Optional[UsdmIndex] = None) -> bool:
+    """Identifier, title, organization and study design checks for one StudyVersion.
+
+    Returns False if the version has no studyDesigns. `index` is as for
+    validate_structure.
+    """
     # 4. Study identifiers (now on version)
     identifiers = version.get("studyIdentifiers", [])
     if not identifiers:
@@ -239,7 +463,7 @@ def validate_study(data: dict) -> ValidationResult:
     designs = version.get("studyDesigns", [])
     if not designs:
         result.error("Version has no studyDesigns")
-        return result
+        return False
 
     result.add_info(f"Found {len(designs)} study design(s)")
 
@@ -274,7 +498,7 @@ def validate_study(data: dict) -> ValidationResult:
             result.warning(f"{prefix}: No epochs defined")
 
         # Validate epoch linked list
-        validate_linked_list(epochs, f"{prefix}.epochs", result)
+        validate_linked_list(epochs, f"{prefix}.epochs", result, index)
 
         # Check for legacy sequenceNumber
         if any("sequenceNumber" in e for e in epochs):
@@ -308,7 +532,7 @@ def validate_study(data: dict) -> ValidationResult:
         # Encounters
         encounters = design.get("encounters", [])
         result.add_info(f"{prefix}: {len(encounters)} encounter(s)")
-        validate_linked_list(encounters, f"{prefix}.encounters", result)
+        validate_linked_list(encounters, f"{prefix}.encounters", result, index)
         for enc in encounters:
             if "encounterType" in enc:
                 result.warning(f"{prefix}: Encounter uses legacy 'encounterType'; should use 'type'")
@@ -316,7 +540,7 @@ def validate_study(data: dict) -> ValidationResult:
         # Activities
         activities = design.get("activities", [])
         result.add_info(f"{prefix}: {len(activities)} activity(ies)")
-        validate_linked_list(activities, f"{prefix}.activities", result)
+        validate_linked_list(activities, f"{prefix}.activities", result, index)
 
         # Objectives (with embedded endpoints)
         objectives = design.get("objectives", [])
@@ -354,6 +578,7 @@ def validate_study(data: dict) -> ValidationResult:
         inc = [c for c in criteria if "inclusion" in c.get("category", {}).get("decode", "").lower()]
         exc = [c for c in criteria if "exclusion" in c.get("category", {}).get("decode", "").lower()]
         result.add_info(f"{prefix}: {len(inc)} inclusion, {len(exc)} exclusion criteria")
+        validate_linked_list(criteria, f"{prefix}.eligibilityCriteria", result, index)
 
         # Check criterionItemId usage
         criterion_items = version.get("eligibilityCriterionItems", [])
@@ -380,56 +605,421 @@ def validate_study(data: dict) -> ValidationResult:
     # Version-level biomedicalConcepts
     bcs = version.get("biomedicalConcepts", [])
     result.add_info(f"Version-level: {len(bcs)} biomedical concept(s)")
+    return True
 
-    # 8. Cross-reference integrity
-    all_ids = collect_ids(data, "root")
-    all_refs = collect_references(data, "root")
 
-    orphan_refs = [(ref_id, path) for ref_id, path in all_refs if ref_id not in all_ids]
-    if orphan_refs:
-        for ref_id, path in orphan_refs[:20]:  # Cap output
-            result.error(f"Broken reference at {path}: '{ref_id}' not found")
-        if len(orphan_refs) > 20:
-            result.error(f"... and {len(orphan_refs) - 20} more broken references")
-    else:
-        result.add_info(f"All {len(all_refs)} cross-references are valid")
-
-    # 9. instanceType checks
-    validate_instance_types(data, "root", result)
+@profiled()
+def validate_study(data: Union[dict, UsdmIndex]) -> ValidationResult:
+    """Main validation entry point.
 
-    # 10. extensionAttributes checks
-    validate_extension_attributes(data, "root", result)
+    Accepts the raw USDM dict or a UsdmIndex built from it; with a raw
+    dict the index is built here.
+    """
+    result = ValidationResult()
+    data, index = split_index(data)
+    if not validate_structure(data, result, index):
+        return result
 
-    # 11. Code object validation
-    validate_code_objects(data, "root", result)
+    # 8-11. Cross-references, instanceType, extensionAttributes and Code
+    # objects, all checked in a single walk of the document
+    with profile_stage("traversal"):
+        TraversalEngine(default_node_rules()).run(index or data, "root", result)
 
     return result
 
 
+# Entries of an _Unit's ``seq``, in document order
+_SEQ_REF, _SEQ_HIT, _SEQ_UNIT = 0, 1, 2
+
+
+class _Unit:
+    """Per-node rule findings for one object with an id, for incremental runs.
+
+    Covers the object and everything below it except nested objects with
+    their own id, which are recorded as child units in ``seq``. Frames
+    are those of the walk that built the unit; ``root`` is the unit's
+    own frame, so they can be rebased when the object moves.
+    """
+
+    __slots__ = ("obj", "root", "seq")
+
+    def __init__(self, obj: dict, root: JsonPath):
+        self.obj = obj
+        self.root = root
+        # (_SEQ_REF, ref_id, frame)
+        # (_SEQ_HIT, rule number, object, frame, errors, warnings, info)
+        # (_SEQ_UNIT, child unit, frame the child was placed at)
+        self.seq: list[tuple] = []
+
+
+def _rebase(frame: JsonPath, old_root: JsonPath, new_root: JsonPath) -> JsonPath:
+    """Move a frame below `old_root` to the same relative place below `new_root`."""
+    keys = []
+    while frame is not old_root:
+        keys.append(frame[1])
+        frame = frame[0]
+    for key in reversed(keys):
+        new_root = (new_root, key)
+    return new_root
+
+
+class IncrementalValidator:
+    """Validate successive versions of a study, re-checking only what changed.
+
+    Each validate() call diffs the new document against the previous one
+    by object ``id``. Objects that are unchanged (deep-equal, subtree
+    included) keep the per-node rule findings from the previous run, and
+    are re-rendered only if their path moved. Changed and new objects are
+    walked and checked again. Every reference is re-resolved against the
+    new set of ids, so references into changed, added or removed objects
+    are re-checked even when the referring object did not change. The
+    cheap structural checks (envelope, versions, designs) always run. The
+    report is identical to validate_study() on the same document.
+
+        validator = IncrementalValidator(previous_data)
+        result = validator.validate(amended_data)
+
+    Pass freshly loaded documents: objects edited in place after they
+    were validated compare equal to themselves and are not re-checked.
+
+    The saving only comes from keeping one validator across versions in
+    the same process (an editor session, a loop over amendments). Each
+    call still deep-compares every object with its previous version, so
+    building a validator just to check one file against another costs
+    more than validate_study(); usdm_validator.py --previous does exactly
+    that and is for reviewing the diff, not for speed.
+
+    Attributes:
+        result: The ValidationResult of the latest run
+        stats: Counts from the latest run: ``objects`` (with an id),
+            ``rechecked`` (walked again), ``reused`` (unchanged subtrees
+            taken from the previous run) and ``nodes_walked``
+    """
+
+    def __init__(self, previous: Union[dict, UsdmIndex, None] = None,
+                 rules: Optional[list[NodeRule]] = None):
+        self.rules = list(rules or default_node_rules())
+        for rule in self.rules:
+            if not (rule.node_local or isinstance(rule, CrossReferenceRule)):
+                raise ValueError(f"{type(rule).__name__} cannot be run incrementally")
+        self.units: dict[str, _Unit] = {}
+        self.result: Optional[ValidationResult] = None
+        self.stats: dict[str, int] = {}
+        if previous is not None:
+            self.validate(previous)
+
+    @profiled("validate_incremental")
+    def validate(self, data: Union[dict, UsdmIndex]) -> ValidationResult:
+        """Validate `data`, reusing findings for objects unchanged since the last call."""
+        result = ValidationResult()
+        data, index = split_index(data)
+        if validate_structure(data, result, index):
+            with profile_stage("diff"):
+                root = self._walk(data, root_path("root"))
+            with profile_stage("report"):
+                self._report(root, result)
+        else:
+            self.units = {}
+        self.result = result
+        return result
+
+    def _walk(self, data: dict, root: JsonPath) -> _Unit:
+        """Walk the changed parts of `data`; unchanged objects become reused units.
+
+        Same pre-order as UsdmIndex, so findings keep document order.
+        """
+        previous = self.units
+        local = [(i, rule) for i, rule in enumerate(self.rules) if rule.node_local]
+        scratch = {i: ValidationResult() for i, _rule in local}
+        top = _Unit(data, root)
+        walked = rechecked = reused = 0
+
+        stack = [(False, data, root, top)]
+        pop = stack.pop
+        push = stack.extend
+        while stack:
+            is_ref, value, path, unit = pop()
+            if is_ref:
+                unit.seq.append((_SEQ_REF, value, path))
+                continue
+            if isinstance(value, dict):
+                obj_id = value.get("id")
+                if obj_id is not None:
+                    before = previous.get(obj_id)
+                    if before is not None and before.obj == value:
+                        unit.seq.append((_SEQ_UNIT, before, path))
+                        reused += 1
+                        continue
+                    child = _Unit(value, path)
+                    unit.seq.append((_SEQ_UNIT, child, path))
+                    unit = child
+                    rechecked += 1
+                walked += 1
+                for i, rule in local:
+                    buffer = scratch[i]
+                    rule.visit(value, path, buffer)
+                    if buffer.errors or buffer.warnings or buffer.info:
+                        unit.seq.append((_SEQ_HIT, i, value, path,
+                                         buffer.errors, buffer.warnings, buffer.info))
+                        scratch[i] = ValidationResult()
+                pending = []
+                for key, child_value in value.items():
+                    if isinstance(child_value, str):
+                        if key[-2:] == "Id" and key != "id":
+                            pending.append((True, child_value, (path, key), unit))
+                    elif isinstance(child_value, list):
+                        if not child_value:
+                            continue
+                        child_path = (path, key)
+                        if key[-3:] == "Ids":
+                            for i, ref_id in enumerate(child_value):
+                                if isinstance(ref_id, str):
+                                    pending.append((True, ref_id, (child_path, i), unit))
+                        pending.append((False, child_value, child_path, unit))
+                    elif isinstance(child_value, dict):
+                        pending.append((False, child_value, (path, key), unit))
+                pending.reverse()
+                push(pending)
+            elif isinstance(value, list):
+                pending = [
+                    (False, item, (path, i), unit)
+                    for i, item in enumerate(value)
+                    if isinstance(item, (dict, list))
+                ]
+                pending.reverse()
+                push(pending)
+
+        self.stats = {"rechecked": rechecked, "reused": reused, "nodes_walked": walked}
+        return top
+
+    def _report(self, top: _Unit, result: ValidationResult):
+        """Merge fresh and reused findings in document order and resolve references."""
+        buffers = [ValidationResult() for _rule in self.rules]
+        ids: set = set()
+        refs: list[tuple[str, JsonPath, _Unit, JsonPath, bool]] = []
+        units: dict[str, _Unit] = {}
+
+        # (entries, unit, frame the unit now sits at, True if that renders
+        # the same as the unit's own root so stored messages still apply)
+        stack = [(iter(top.seq), top, top.root, True)]
+        while stack:
+            entries, unit, at, same = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                stack.pop()
+                continue
+            kind = entry[0]
+            if kind == _SEQ_REF:
+                refs.append((entry[1], entry[2], unit, at, same))
+            elif kind == _SEQ_HIT:
+                _kind, i, obj, path, errors, warnings, info = entry
+                buffer = buffers[i]
+                if same:
+                    buffer.errors.extend(errors)
+                    buffer.warnings.extend(warnings)
+                    buffer.info.extend(info)
+                else:
+                    self.rules[i].visit(obj, _rebase(path, unit.root, at), buffer)
+            else:
+                child, placed = entry[1], entry[2]
+                if same and placed is child.root:
+                    child_at, child_same = placed, True
+                else:
+                    child_at = placed if same else _rebase(placed, unit.root, at)
+                    # Frames are nested tuples, so == compares the key chains
+                    child_same = child_at == child.root
+                child_id = child.obj["id"]
+                units[child_id] = child
+                ids.add(child_id)
+                stack.append((iter(child.seq), child, child_at, child_same))
+
+        orphans = [
+            (ref_id, path if same else _rebase(path, unit.root, at))
+            for ref_id, path, unit, at, same in refs
+            if ref_id not in ids
+        ]
+        for rule, buffer in zip(self.rules, buffers):
+            if isinstance(rule, CrossReferenceRule):
+                rule.report(orphans, len(refs), buffer)
+            result.extend(buffer)
+
+        self.units = units
+        self.stats["objects"] = len(units)
+
+
+def validate_incremental(
+    data: Union[dict, UsdmIndex],
+    previous: Union[dict, UsdmIndex, IncrementalValidator],
+) -> tuple[ValidationResult, IncrementalValidator]:
+    """Validate `data` against a previous version of the same study.
+
+    `previous` is the earlier document (validated here first) or the
+    IncrementalValidator from an earlier run, which is updated in place.
+
+    Returns:
+        (result for `data`, the validator to pass as `previous` next time)
+    """
+    if not isinstance(previous, IncrementalValidator):
+        previous = IncrementalValidator(previous)
+    return previous.validate(data), previous
+
+
+def build_report(result: ValidationResult) -> dict:
+    """JSON-serializable form of a ValidationResult (the --json-output format)."""
+    return {
+        "is_valid": result.is_valid,
+        "error_count": len(result.errors),
+        "warning_count": len(result.warnings),
+        "errors": result.errors,
+        "warnings": result.warnings,
+        "info": result.info,
+    }
+
+
+def run_validation(input_path: str, cache_dir: Optional[str] = None) -> tuple[dict, bool]:
+    """Validate one USDM file, reusing a cached report when the file is unchanged.
+
+    Returns:
+        (build_report() dict, True if it came from the cache)
+    """
+    cache = ResultCache(cache_dir) if cache_dir else None
+    if cache:
+        request = cache.request(input_path, TOOL, __file__)
+        entry = cache.get(request)
+        if entry:
+            return entry["result"], True
+
+    # Cross-reference checks need every object, so nothing is skipped
+    data = load_usdm_file(input_path)
+    report = build_report(validate_study(UsdmIndex(data)))
+    if cache:
+        cache.put(request, result=report)
+    return report, False
+
+
+def validate_file(
+    input_path: str, report_path: Optional[str] = None, profile: bool = False,
+    cache_dir: Optional[str] = None,
+) -> dict:
+    """Validate one USDM file; batch work unit.
+
+    Writes the JSON report to `report_path` if given and returns the
+    per-study summary fields, plus the stage profile with `profile`.
+    """
+    with profiling(profile) as profiler:
+        report, cached = run_validation(input_path, cache_dir)
+        if report_path:
+            with profile_stage("write_report"):
+                write_json(report, report_path)
+    entry = {
+        "is_valid": report["is_valid"],
+        "error_count": report["error_count"],
+        "warning_count": report["warning_count"],
+        "report": report_path,
+        "cached": cached,
+    }
+    if profiler:
+        entry["profile"] = profiler.report()
+    return entry
+
+
+def run_batch_validation(args) -> int:
+    """Validate every study matched by --input across a process pool."""
+    inputs = expand_inputs(args.input)
+    if not inputs:
+        print(f"ERROR: no USDM JSON files match '{args.input}'")
+        return 2
+
+    output_dir = args.output_dir
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    names = batch_output_names(inputs)
+    items = [
+        (path, (os.path.join(output_dir, f"{names[path]}.validation.json") if output_dir else None,
+                bool(args.profile), resolve_cache_dir(args.cache, args.cache_dir)))
+        for path in inputs
+    ]
+
+    def report(entry: dict):
+        if entry["status"] != "ok":
+            print(f"  ✗ {entry['input']}: {entry['error']}")
+        else:
+            mark = "PASS" if entry["is_valid"] else "FAIL"
+            cached = ", cached" if entry["cached"] else ""
+            print(f"  {mark} {entry['input']} "
+                  f"({entry['error_count']} errors, {entry['warning_count']} warnings{cached})")
+
+    print(f"Validating {len(inputs)} stud(ies) with {args.jobs or os.cpu_count()} worker(s)")
+    results = run_batch(validate_file, items, jobs=args.jobs, on_result=report)
+
+    summary_path = args.summary or os.path.join(output_dir or ".", "validation_summary.json")
+    summary = write_batch_summary(results, summary_path, TOOL)
+    invalid = sum(1 for r in results if r["status"] == "ok" and not r["is_valid"])
+    print(f"\n{summary['succeeded']} validated ({invalid} with errors), "
+          f"{summary['failed']} failed to process")
+    print(f"Batch summary saved to: {summary_path}")
+    if args.profile:
+        write_json(summary.get("profile", {}), args.profile)
+        print(f"Profile report saved to: {args.profile}")
+    return 0 if summary["failed"] == 0 and invalid == 0 else 1
+
+
 def main():
     parser = argparse.ArgumentParser(description="Validate USDM v4.0.0 JSON structure")
-    parser.add_argument("--input", "-i", required=True, help="Path to USDM JSON file")
+    parser.add_argument("--input", "-i", required=True,
+                        help="Path to USDM JSON file, or a directory/glob for batch mode")
     parser.add_argument("--json-output", "-o", help="Optional: save report as JSON")
+    parser.add_argument("--output-dir", "-d",
+                        help="Batch mode: directory for per-study JSON reports")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="Batch mode: number of worker processes (default: CPU count)")
+    parser.add_argument("--summary",
+                        help="Batch mode: aggregate summary path "
+                             "(default: <output-dir>/validation_summary.json)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse the stored report when the input file is unchanged")
+    parser.add_argument("--cache-dir",
+                        help="Cache directory; implies --cache "
+                             "(default: $USDM_CACHE_DIR or ~/.cache/usdm-tools)")
+    parser.add_argument("--previous", metavar="OLD_JSON",
+                        help="Earlier version of the same study; only objects changed since "
+                             "then are re-checked (same report as a full run). OLD_JSON is "
+                             "validated in full first, so this is slower than a plain run; "
+                             "the saving needs IncrementalValidator kept in one process")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="Write a per-stage timing/allocation report as JSON "
+                             "(batch mode: aggregated over all studies)")
     args = parser.parse_args()
 
-    with open(args.input) as f:
-        data = json.load(f)
-
-    result = validate_study(data)
-    print(result.summary())
-
-    if args.json_output:
-        report = {
-            "is_valid": result.is_valid,
-            "error_count": len(result.errors),
-            "warning_count": len(result.warnings),
-            "errors": result.errors,
-            "warnings": result.warnings,
-            "info": result.info,
-        }
-        with open(args.json_output, "w") as f:
-            json.dump(report, f, indent=2)
-        print(f"\nJSON report saved to: {args.json_output}")
+    if is_batch_input(args.input):
+        if args.previous:
+            parser.error("--previous compares two single files and cannot be used in batch mode")
+        if args.json_output:
+            parser.error("--json-output names a single report; use --output-dir in batch mode")
+        sys.exit(run_batch_validation(args))
+
+    with profiling(bool(args.profile)) as profiler:
+        if args.previous:
+            validator = IncrementalValidator(load_usdm_file(args.previous))
+            result = validator.validate(load_usdm_file(args.input))
+            report = build_report(result)
+        else:
+            report, _cached = run_validation(args.input, resolve_cache_dir(args.cache, args.cache_dir))
+            result = ValidationResult.from_report(report)
+        print(result.summary())
+        if args.previous:
+            stats = validator.stats
+            print(f"\nIncremental: re-checked {stats['rechecked']} changed/new object(s), "
+                  f"reused {stats['reused']} unchanged subtree(s) from {args.previous}")
+
+        if args.json_output:
+            with profile_stage("write_report"):
+                write_json(report, args.json_output)
+            print(f"\nJSON report saved to: {args.json_output}")
+
+    if profiler:
+        write_json(profiler.report(tool=TOOL, input=args.input), args.profile)
+        print(f"Profile report saved to: {args.profile}")
 
     sys.exit(0 if result.is_valid else 1)
 